@@ -1,4 +1,3 @@
-import logging
 from datetime import datetime
 
 import Celery
@@ -26,11 +25,14 @@ from .extensions import (
     migrate,
     redis_client,
     socketio,
+    tiered_cache,
 )
 from .logger_and_error_handler import register_error_handlers
 from .loggers import security_logger, setup_logging
 from .middleware import check_staff_session, mfa_check_middleware, setup_middleware
 from .utils.input_sanitizer import init_app_middleware
+from .utils.metrics import InstrumentedJSONProvider
+from .utils.uploads import SpoolingRequest
 from .utils.vite import vite_asset
 
 # Configure extensions that need it before app context
@@ -41,6 +43,8 @@ celery = Celery(__name__, broker=config.Config.CELERY_BROKER_URL)
 
 def create_app(config_class=config.Config):
     app = Flask(__name__)
+    app.request_class = SpoolingRequest
+    app.json = InstrumentedJSONProvider(app)
 
     # Handle string configuration names
     if isinstance(config_class, str):
@@ -53,6 +57,11 @@ def create_app(config_class=config.Config):
 
     app.config.from_object(config_class)
 
+    # Email lookups go through blind indexes keyed by BLIND_INDEX_KEY; without
+    # it no stored index could ever be matched.
+    if not app.config.get("BLIND_INDEX_KEY"):
+        raise ValueError("BLIND_INDEX_KEY must be set in the environment.")
+
     # --- Content Security Policy (CSP) ---
     # This policy allows content (scripts, styles, etc.) from the app's own domain
     # and a placeholder for your future CDN. It's a critical security feature.
@@ -89,13 +98,6 @@ def create_app(config_class=config.Config):
     # Setup database security options and logging
     setup_database_security(app)
 
-    # Setup logging
-    if not app.debug:
-        # In production, you might want to log to a file
-        handler = logging.StreamHandler()
-        handler.setLevel(logging.INFO)
-        app.logger.addHandler(handler)
-
     # User loader for Flask-Login
     from backend.models import User
 
@@ -361,10 +363,20 @@ def create_app(config_class=config.Config):
 
     app.register_blueprint(contact_bp)
 
+    from .assets.routes import assets_bp
+
+    app.register_blueprint(assets_bp)
+
+    from .metrics.routes import metrics_bp
+
+    app.register_blueprint(metrics_bp)
+    limiter.exempt(metrics_bp)
+
     # Caching
     cache.init_app(app)
     limiter.init_app(app)
     redis_client.init_app(app)
+    tiered_cache.init_app(app)
     socketio.init_app(app, async_mode="eventlet")
 
     # Add a command to initialize the database
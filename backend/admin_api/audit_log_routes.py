@@ -3,6 +3,7 @@ from flask import Blueprint, jsonify, request
 from backend.models import AdminAuditLog
 from backend.schemas import AdminAuditLogSchema
 from backend.utils.decorators import admin_required
+from backend.utils.pagination import get_cursor_arg, keyset_paginate, wants_exact_total
 
 admin_audit_log_routes = Blueprint(
     "admin_audit_log_routes", __name__, url_prefix="/api/admin/audit-log"
@@ -16,6 +17,8 @@ def get_audit_logs():
     """
     Retrieves a paginated list of audit logs.
     Admins can filter by user_id or action.
+    Pass `cursor` (empty for the first page) for keyset pagination, and
+    `total=exact` to also count the matching rows.
     """
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 20, type=int)
@@ -31,6 +34,25 @@ def get_audit_logs():
     if action:
         logs_query = logs_query.filter_by(action=action)
 
+    cursor = get_cursor_arg()
+    if cursor is not None:
+        # Log IDs are assigned in timestamp order, so the primary key alone
+        # gives a stable newest-first keyset.
+        logs_page = keyset_paginate(
+            logs_query,
+            AdminAuditLog.id,
+            AdminAuditLog.id,
+            cursor=cursor,
+            per_page=per_page,
+            with_total=wants_exact_total(),
+        )
+        return jsonify(
+            {
+                "logs": AdminAuditLogSchema(many=True).dump(logs_page.items),
+                **logs_page.to_dict(),
+            }
+        )
+
     logs = logs_query.paginate(page=page, per_page=per_page, error_out=False)
 
     return jsonify(
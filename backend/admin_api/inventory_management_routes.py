@@ -5,6 +5,7 @@ from flask_jwt_extended import jwt_required
 
 from ..services.exceptions import NotFoundException, ServiceError, ValidationException
 from ..services.inventory_service import InventoryService
+from ..services.passport_asset_service import PassportAssetService
 from ..utils.decorators import roles_required
 
 # Assuming the blueprint is named this way. If it's different, I'll adapt.
@@ -70,6 +71,27 @@ def create_inventory_item_batch():
         return jsonify({"error": "An unexpected internal error occurred."}), 500
 
 
+@inventory_admin_bp.route("/batches/<string:batch_id>/progress", methods=["GET"])
+@jwt_required()
+@roles_required("Admin", "Manager", "Farmer")
+def get_batch_asset_progress(batch_id):
+    """
+    Admin endpoint reporting how far the passport assets (HTML, PDF, QR code)
+    of a stock batch have been rendered.
+    """
+    try:
+        progress = PassportAssetService.get_batch_progress(batch_id)
+        if progress["total"] == 0:
+            return jsonify({"error": f"Batch {batch_id} not found."}), 404
+        return jsonify(progress), 200
+    except Exception as e:
+        current_app.logger.error(
+            f"Unexpected error fetching progress of batch {batch_id}: {e}",
+            exc_info=True,
+        )
+        return jsonify({"error": "An unexpected internal error occurred."}), 500
+
+
 # --- NEW ROUTE FOR LISTING ALL ITEMS ---
 @inventory_admin_bp.route("/items", methods=["GET"])
 @jwt_required()
@@ -1,11 +1,16 @@
+from datetime import datetime
+
 from flask import Blueprint, jsonify, request
 
 from backend.services.monitoring_service import MonitoringService
+from backend.utils import sql_profiler
 from backend.utils.decorators import (
     roles_required,
 )
 
 monitoring_bp = Blueprint("monitoring_bp", __name__, url_prefix="/admin/monitoring")
+# Name under which create_app registers this blueprint.
+admin_monitoring_bp = monitoring_bp
 
 
 @monitoring_bp.route("/health", methods=["GET"])
@@ -32,15 +37,33 @@ def get_system_health():
         ), 500
 
 
+def _error_log_filters():
+    """Level, logger and time-range filters of the error log endpoints."""
+    filters = {
+        "level": request.args.get("level"),
+        "logger_name": request.args.get("logger"),
+    }
+    for name in ("since", "until"):
+        value = request.args.get(name)
+        # ISO 8601 timestamps; ValueError is turned into a 400 by the caller.
+        filters[name] = datetime.fromisoformat(value).timestamp() if value else None
+    return filters
+
+
 @monitoring_bp.route("/latest-errors", methods=["GET"])
 @roles_required("Admin", "Dev", "Manager")
 def get_latest_errors():
     """
-    Fetches the latest errors from the application's log file via the MonitoringService.
+    Fetches the latest ERROR and CRITICAL records via the MonitoringService,
+    optionally filtered by `level` and `logger`.
     """
     try:
-        limit = request.args.get("limit", 20, type=int)
-        errors = MonitoringService.get_latest_errors(limit=limit)
+        limit = min(request.args.get("limit", 20, type=int), 500)
+        errors = MonitoringService.get_latest_errors(
+            limit=limit,
+            level=request.args.get("level"),
+            logger_name=request.args.get("logger"),
+        )
         return jsonify(status="success", data=errors)
     except Exception as e:
         from flask import current_app
@@ -56,24 +79,31 @@ def get_latest_errors():
 @roles_required("Admin", "Dev", "Manager")
 def get_error_logs():
     """
-    Retrieve recent error logs from the system.
-    This is a simplified endpoint; a real system would use a dedicated logging service.
+    Retrieve ERROR and CRITICAL records, newest first, filtered by `level`,
+    `logger`, `since` and `until` (ISO 8601) and paginated.
     """
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", 50, type=int), 1), 200)
     try:
-        page = request.args.get("page", 1, type=int)
-        per_page = request.args.get("per_page", 50, type=int)
+        filters = _error_log_filters()
+    except ValueError:
+        return jsonify(
+            status="error", message="'since' and 'until' must be ISO 8601 dates."
+        ), 400
 
-        logs_pagination = MonitoringService.get_error_logs_paginated(
-            page=page, per_page=per_page
+    try:
+        logs = MonitoringService.get_error_logs_paginated(
+            page=page, per_page=per_page, **filters
         )
-
         return jsonify(
             {
                 "status": "success",
-                "data": [log.to_dict() for log in logs_pagination.items],
-                "total": logs_pagination.total,
-                "pages": logs_pagination.pages,
-                "current_page": logs_pagination.page,
+                "data": logs["items"],
+                "total": logs["total"],
+                "pages": logs["pages"],
+                "current_page": logs["page"],
+                "has_more": logs["has_more"],
+                "source": logs["source"],
             }
         ), 200
     except Exception:
@@ -81,6 +111,17 @@ def get_error_logs():
         return jsonify(status="error", message="Failed to retrieve error logs."), 500
 
 
+@monitoring_bp.route("/sql-profiles", methods=["GET"])
+@roles_required("Admin", "Dev", "Manager")
+def get_sql_profiles():
+    """
+    Recent requests and Celery tasks with possible N+1 queries or slow
+    statements, newest first (see utils/sql_profiler.py).
+    """
+    limit = min(request.args.get("limit", 50, type=int), 500)
+    return jsonify(status="success", data=sql_profiler.get_recent_profiles(limit))
+
+
 @monitoring_bp.route("/monitoring/celery-status", methods=["GET"])
 @roles_required("Admin", "Dev", "Manager")
 def get_celery_status():
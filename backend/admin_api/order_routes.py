@@ -10,6 +10,7 @@ from ..models import Order
 from ..schemas import OrderSchema, OrderUpdateSchema
 from ..services.order_service import OrderService
 from ..utils.decorators import api_resource_handler, roles_required
+from ..utils.pagination import get_cursor_arg, wants_exact_total
 
 # --- Blueprint Setup ---
 bp = Blueprint("order_management", __name__, url_prefix="/api/admin/orders")
@@ -26,14 +27,23 @@ def list_orders():
     per_page = request.args.get("per_page", 20, type=int)
     status_filter = request.args.get("status", None, type=str)
 
-    filters = {}
-    if status_filter:
-        filters["status"] = status_filter
-
-    paginated_orders = OrderService.get_all_orders_paginated(
-        page=page, per_page=per_page, filters=filters
+    cursor = get_cursor_arg()
+    paginated_orders = OrderService().get_all_orders_paginated(
+        page=page,
+        per_page=per_page,
+        status=status_filter,
+        cursor=cursor,
+        with_total=wants_exact_total(),
     )
 
+    if cursor is not None:
+        return jsonify(
+            {
+                "data": OrderSchema(many=True).dump(paginated_orders.items),
+                **paginated_orders.to_dict(),
+            }
+        )
+
     return jsonify(
         {
             "data": OrderSchema(many=True).dump(paginated_orders.items),
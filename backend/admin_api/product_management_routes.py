@@ -3,7 +3,7 @@ This module defines the API endpoints for product management in the admin panel.
 It leverages the @api_resource_handler to create clean, secure, and consistent CRUD endpoints.
 """
 
-from flask import Blueprint, g, jsonify, jwt_required, request
+from flask import Blueprint, current_app, g, jsonify, jwt_required, request
 
 from backend.services.exceptions import ServiceException
 
@@ -32,8 +32,13 @@ def get_all_products():
         per_page = request.args.get("per_page", 20, type=int)
         include_deleted = request.args.get("include_deleted", "false").lower() == "true"
 
-        paginated_products = ProductService.get_all_products_paginated(
-            page=page, per_page=per_page, include_deleted=include_deleted
+        paginated_products = ProductService(
+            current_app.logger
+        ).get_all_products_paginated(
+            filters={"include_deleted": include_deleted},
+            page=page,
+            per_page=per_page,
+            visible_only=False,
         )
 
         return jsonify(
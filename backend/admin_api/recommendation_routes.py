@@ -7,12 +7,16 @@ from ..services.exceptions import NotFoundException, ServiceError
 from ..services.recommendation_service import RecommendationService
 from ..utils.decorators import roles_required
 from ..utils.input_sanitizer import InputSanitizer
+from ..utils.pagination import get_cursor_arg, wants_exact_total
 
 # Create a Blueprint for admin recommendation routes
 admin_recommendation_bp = Blueprint(
     "admin_recommendation_bp", __name__, url_prefix="/api/admin/recommendations"
 )
 
+# Bulk requests are scored in batches, so campaign-sized lists are fine.
+MAX_BULK_USERS = 10000
+
 
 @admin_recommendation_bp.route("/summary", methods=["GET"])
 @jwt_required()
@@ -39,6 +43,8 @@ def get_all_customer_recommendations():
     - page: Page number (default: 1)
     - per_page: Items per page (default: 50, max: 100)
     - limit_per_user: Number of recommendations per user (default: 5, max: 10)
+    - cursor: Opt into keyset pagination (empty for the first page)
+    - total: Set to "exact" to count users in cursor mode
     """
     try:
         # Get and validate query parameters
@@ -56,7 +62,11 @@ def get_all_customer_recommendations():
         limit_per_user = max(1, limit_per_user)
 
         recommendations = RecommendationService.get_all_customer_recommendations(
-            limit_per_user=limit_per_user, page=page, per_page=per_page
+            limit_per_user=limit_per_user,
+            page=page,
+            per_page=per_page,
+            cursor=get_cursor_arg(),
+            with_total=wants_exact_total(),
         )
         return jsonify(recommendations), 200
     except ServiceError as e:
@@ -113,8 +123,10 @@ def bulk_generate_recommendations():
             return jsonify({"error": "user_ids must be a non-empty list"}), 400
 
         # Limit the number of users that can be processed at once
-        if len(user_ids) > 100:
-            return jsonify({"error": "Cannot process more than 100 users at once"}), 400
+        if len(user_ids) > MAX_BULK_USERS:
+            return jsonify(
+                {"error": f"Cannot process more than {MAX_BULK_USERS} users at once"}
+            ), 400
 
         # Validate and sanitize user IDs
         try:
@@ -264,9 +276,10 @@ def search_users_for_recommendations():
 
         from ..models import User
 
-        # Search users by email, name, or ID
+        # Search users by email, name, or ID. Emails are encrypted, so only an
+        # exact match can be resolved (through the blind index).
         search_filter = or_(
-            User.email.ilike(f"%{query}%"),
+            User.email == query,
             User.first_name.ilike(f"%{query}%"),
             User.last_name.ilike(f"%{query}%"),
         )
@@ -7,6 +7,7 @@ from backend.services.user_service import UserService
 from backend.utils.decorators import (
     roles_required,
 )
+from backend.utils.pagination import get_cursor_arg, wants_exact_total
 
 session_routes = Blueprint("session_routes", __name__, url_prefix="/api/admin/sessions")
 
@@ -21,8 +22,19 @@ def list_active_sessions():
     """
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 20, type=int)
+    cursor = get_cursor_arg()
 
-    sessions_page = SessionService.get_all_active_sessions(page=page, per_page=per_page)
+    sessions_page = SessionService.get_all_active_sessions(
+        page=page, per_page=per_page, cursor=cursor, with_total=wants_exact_total()
+    )
+
+    if cursor is not None:
+        return jsonify(
+            {
+                "sessions": [session.to_dict() for session in sessions_page.items],
+                **sessions_page.to_dict(),
+            }
+        )
 
     # The response is formatted for compatibility with the frontend data table,
     # including pagination details.
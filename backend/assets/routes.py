@@ -0,0 +1,98 @@
+"""
+Public routes serving content-addressed assets.
+
+URLs embed the SHA-256 digest of the stored file, so the bytes behind a URL
+never change and every response is cacheable forever by browsers and CDNs.
+"""
+
+from flask import Blueprint, jsonify, request, send_file
+
+from ..models.asset_models import Asset
+from ..services.asset_service import AssetService
+from ..utils.content_store import DERIVATIVES, FORMATS, ContentStore
+
+assets_bp = Blueprint("assets", __name__, url_prefix="/assets")
+
+ONE_YEAR = 365 * 24 * 3600
+
+# Preferred order when negotiating a format from the Accept header.
+NEGOTIATED_FORMATS = ("avif", "webp", "jpg")
+
+
+def _immutable(response):
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def _not_found(message="Asset not found."):
+    return jsonify({"message": message}), 404
+
+
+def _serve_derivative(digest, variant, fmt):
+    store = AssetService.get_content_store()
+    if not ContentStore.is_digest(digest) or not store.exists(digest):
+        return None
+    try:
+        path = store.derivative_path(digest, variant, fmt)
+    except KeyError:
+        return None
+    response = send_file(
+        path,
+        mimetype=FORMATS[fmt][1],
+        max_age=ONE_YEAR,
+        conditional=True,
+        etag=f"{digest}-{variant}.{fmt}",
+    )
+    return _immutable(response)
+
+
+@assets_bp.route("/<digest>/<variant>.<fmt>", methods=["GET"])
+def get_asset_derivative(digest, variant, fmt):
+    """Serves an image derivative in an explicit format, rendering it on first use."""
+    response = _serve_derivative(digest, variant, fmt)
+    return response if response is not None else _not_found()
+
+
+@assets_bp.route("/<digest>/<variant>", methods=["GET"])
+def get_asset_variant(digest, variant):
+    """Serves an image derivative in the best format the client accepts."""
+    if variant not in DERIVATIVES:
+        return _not_found()
+    supported = ContentStore.supported_formats()
+    fmt = next(
+        (
+            fmt
+            for fmt in NEGOTIATED_FORMATS
+            if fmt in supported and request.accept_mimetypes[FORMATS[fmt][1]]
+        ),
+        "jpg",
+    )
+    response = _serve_derivative(digest, variant, fmt)
+    if response is None:
+        return _not_found()
+    response.vary.add("Accept")
+    return response
+
+
+@assets_bp.route("/<digest>", methods=["GET"])
+def get_asset_file(digest):
+    """
+    Serves a stored file as uploaded. Images are only served as derivatives,
+    which are re-encoded and stripped of metadata.
+    """
+    if not ContentStore.is_digest(digest):
+        return _not_found()
+    asset = Asset.query.filter_by(content_hash=digest).first()
+    store = AssetService.get_content_store()
+    if not asset or asset.mime_type.startswith("image/") or not store.exists(digest):
+        return _not_found()
+    response = send_file(
+        store.blob_path(digest),
+        mimetype=asset.mime_type,
+        max_age=ONE_YEAR,
+        conditional=True,
+        etag=digest,
+        download_name=asset.filename,
+    )
+    return _immutable(response)
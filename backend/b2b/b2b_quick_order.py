@@ -1,10 +1,13 @@
-from flask import Blueprint, current_app, jsonify, request
+from flask import Blueprint, jsonify, request
 from flask_jwt_extended import get_jwt_identity
-from redis import Redis
-from rq import Queue
 
-from backend.database import db  # Assumer que db a une méthode get_connection
+from backend.database import db
+from backend.services.exceptions import ServiceException
 from backend.services.monitoring_service import MonitoringService
+from backend.services.quick_order_service import (
+    QuickOrderService,
+    read_quick_order_items,
+)
 from backend.utils.decorators import b2b_user_required
 from backend.utils.input_sanitizer import InputSanitizer
 
@@ -16,124 +19,94 @@ b2b_quick_order_bp = Blueprint("b2b_quick_order", __name__, url_prefix="/b2b")
 def create_b2b_quick_order():
     """
     Creates an order for a B2B user from a list of SKUs and quantities.
-    This performs full SKU validation and inventory checks within a transaction.
+    All SKUs are validated and their stock taken in one transaction; invalid
+    items are all reported, by position in the list.
     """
     user_id = get_jwt_identity()
     data = InputSanitizer.sanitize_input(request.get_json())
-    items = data.get("items")
+    items = data.get("items") if isinstance(data, dict) else None
 
     if not items or not isinstance(items, list):
         return jsonify({"error": "A list of 'items' is required."}), 400
 
-    conn = db.get_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        conn.begin()
-
-        validated_items = []
-        order_total = 0.0
-
-        # --- Phase 1: Validation and Inventory Check ---
-        for item in items:
-            sku = item.get("sku")
-            quantity = item.get("quantity")
-            if not sku or not isinstance(quantity, int) or quantity <= 0:
-                conn.rollback()
-                return jsonify(
-                    {
-                        "error": "Each item must have a valid SKU and a positive integer quantity."
-                    }
-                ), 400
-
-            # Lock the variant row to prevent race conditions
-            cursor.execute(
-                "SELECT id, price, inventory_count FROM product_variants WHERE sku = %s FOR UPDATE",
-                (sku,),
-            )
-            variant = cursor.fetchone()
-
-            # SKU Validation
-            if not variant:
-                conn.rollback()
-                return jsonify({"error": f"SKU not found: {sku}"}), 404
-
-            # Inventory Check
-            if variant["inventory_count"] < quantity:
-                conn.rollback()
-                return jsonify(
-                    {
-                        "error": f"Insufficient stock for SKU {sku}. Available: {variant['inventory_count']}"
-                    }
-                ), 409
-
-            item_total = float(variant["price"]) * quantity
-            order_total += item_total
-            validated_items.append(
-                {
-                    "variant_id": variant["id"],
-                    "quantity": quantity,
-                    "price_at_purchase": variant["price"],
-                }
-            )
-
-        # --- Phase 2: Order Creation and Inventory Update ---
-        if not validated_items:
-            return jsonify({"error": "No valid items to order."}), 400
-
-        # Create the main order record. Assume a default 'processing' status.
-        cursor.execute(
-            "INSERT INTO orders (user_id, total, status) VALUES (%s, %s, 'processing')",
-            (user_id, order_total),
-        )
-        order_id = cursor.lastrowid
-
-        # Insert order items and update inventory
-        for item in validated_items:
-            # Insert the item into order_items
-            cursor.execute(
-                """INSERT INTO order_items (order_id, product_variant_id, quantity, price_at_purchase)
-                   VALUES (%s, %s, %s, %s)""",
-                (
-                    order_id,
-                    item["variant_id"],
-                    item["quantity"],
-                    item["price_at_purchase"],
-                ),
-            )
-            # Decrement the inventory for the variant
-            cursor.execute(
-                "UPDATE product_variants SET inventory_count = inventory_count - %s WHERE id = %s",
-                (item["quantity"], item["variant_id"]),
-            )
-
-        conn.commit()
-
-        # --- Phase 3: Post-Order Tasks (optional, can be done by a worker) ---
-        # Queue a background job to allocate specific serialized items
-        # and generate the invoice.
-        redis_conn = Redis.from_url(
-            current_app.config.get("REDIS_URL", "redis://localhost:6379")
-        )
-        queue = Queue(connection=redis_conn)
-        queue.enqueue("worker.fulfill_order", order_id)
-
+    quantities, line_numbers, errors = read_quick_order_items(items)
+    if errors:
         return jsonify(
             {
-                "message": "Quick order created successfully.",
-                "order_id": order_id,
-                "total": order_total,
+                "error": "Each item must have a valid SKU and a positive integer quantity.",
+                "errors": errors,
             }
-        ), 201
+        ), 400
 
+    try:
+        order = QuickOrderService.create_order(
+            user_id, quantities, line_numbers, data.get("shipping_address_id")
+        )
+    except ServiceException as e:
+        return jsonify(e.to_dict()), e.status_code
     except Exception as e:
-        # Ensure rollback on any failure
-        if "conn" in locals() and conn.is_connected():
-            conn.rollback()
+        db.session.rollback()
         MonitoringService.log_error(f"B2B Quick Order failed for user {user_id}: {e}")
         return jsonify(
             {"error": "An internal error occurred during order creation."}
         ), 500
-    finally:
-        if "conn" in locals() and conn.is_connected():
-            cursor.close()
-            conn.close()
+
+    return jsonify(
+        {
+            "message": "Quick order created successfully.",
+            "order_id": str(order.id),
+            "total": float(order.total_amount),
+        }
+    ), 201
+
+
+@b2b_quick_order_bp.route("/pro/quick-order/upload", methods=["POST"])
+@b2b_user_required
+def upload_b2b_quick_order():
+    """
+    Accepts a CSV of "sku,quantity" lines and creates its order in the
+    background. The file is stored and the task given its id; poll the
+    returned status URL for the result.
+    """
+    from backend.tasks import process_b2b_quick_order_task
+
+    user_id = get_jwt_identity()
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify({"error": "A CSV 'file' is required."}), 400
+
+    upload_id = QuickOrderService.store_upload(upload.stream)
+    task = process_b2b_quick_order_task.delay(
+        user_id, upload_id, request.form.get("shipping_address_id")
+    )
+    QuickOrderService.set_task_owner(task.id, user_id)
+    return jsonify(
+        {
+            "message": "Quick order accepted for processing.",
+            "task_id": task.id,
+            "status_url": f"{request.path}/{task.id}",
+        }
+    ), 202
+
+
+@b2b_quick_order_bp.route("/pro/quick-order/upload/<task_id>", methods=["GET"])
+@b2b_user_required
+def get_b2b_quick_order_upload(task_id):
+    """Returns the state of an uploaded quick order, and its result once done."""
+    from backend.tasks import process_b2b_quick_order_task
+
+    # Unknown ids and other users' tasks look alike, whatever their state.
+    if not QuickOrderService.is_task_owner(task_id, get_jwt_identity()):
+        return jsonify({"error": "Quick order not found."}), 404
+
+    result = process_b2b_quick_order_task.AsyncResult(task_id)
+    if not result.ready():
+        return jsonify({"status": result.state.lower()}), 200
+    if result.failed():
+        return jsonify(
+            {"status": "failed", "error": "The quick order could not be processed."}
+        ), 200
+
+    outcome = result.result or {}
+    status = "created" if "order_id" in outcome else "rejected"
+    return jsonify({"status": status, **outcome}), 200
@@ -53,10 +53,27 @@ def setup_periodic_tasks(sender, **kwargs):
         name="Update B2B loyalty tiers daily",
     )
 
-    # Periodic Cache Clear Task
+    # Hourly "customers also bought" matrix update (incremental)
     sender.add_periodic_task(
-        crontab(hour="*/6"),  # Executes every 6 hours
-        "tasks.clear_application_cache",
-        name="Clear application cache every 6 hours",
+        crontab(minute=15),
+        "tasks.update_co_purchase_matrix",
+        name="Update co-purchase recommendations hourly",
     )
+
+    # Write stock reserved in Redis for hot products back to the database
+    sender.add_periodic_task(
+        float(os.environ.get("HOT_STOCK_RECONCILE_SECONDS", 5)),
+        "tasks.reconcile_hot_stock",
+        name="Reconcile hot stock counters",
+    )
+
+    # Return the units of expired cart reservations to available stock
+    sender.add_periodic_task(
+        crontab(minute="*"),
+        "tasks.expire_inventory_reservations",
+        name="Expire inventory reservations every minute",
+    )
+
+    # Note: there is no periodic cache flush. Writes in the service layer bump
+    # only the affected cache tags (see utils/cache_helpers.py).
     logger.info("Periodic tasks set up.")
@@ -37,12 +37,70 @@ class Config:
     LOG_DIR = os.environ.get("LOG_DIR", "logs")
     LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
     USE_JSON_LOGS = os.environ.get("USE_JSON_LOGS", "false").lower() in ["true", "1"]
+    # The log file is always JSON lines; USE_JSON_LOGS also applies to stderr.
+    LOG_FILE_PATH = os.environ.get(
+        "LOG_FILE_PATH", os.path.join(LOG_DIR, "backend_app.log")
+    )
+    LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", 5))
+    # Records waiting for the writer thread; below WARNING they are dropped
+    # when it is full.
+    LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+    # Records per write, and seconds before an incomplete batch is written.
+    LOG_BATCH_SIZE = int(os.environ.get("LOG_BATCH_SIZE", 100))
+    LOG_FLUSH_INTERVAL = float(os.environ.get("LOG_FLUSH_INTERVAL", 1.0))
+    # Share of high-volume events (e.g. the access log) kept, by level.
+    LOG_SAMPLE_RATES = os.environ.get("LOG_SAMPLE_RATES", "DEBUG=0.01,INFO=0.1")
+    # Errors kept in Redis for the admin monitoring pages.
+    ERROR_LOG_MAX_ENTRIES = int(os.environ.get("ERROR_LOG_MAX_ENTRIES", 5000))
 
     # --- IMPLEMENTATION: File Upload Validation ---
     # Max file size: 25 MB
     MAX_CONTENT_LENGTH = 25 * 1024 * 1024
     ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "svg", "pdf"}
     UPLOAD_FOLDER = os.path.join(basedir, "uploads")
+    # Content-addressed asset blobs and their cached image derivatives
+    ASSET_STORE_PATH = os.environ.get(
+        "ASSET_STORE_PATH", os.path.join(UPLOAD_FOLDER, "assets")
+    )
+    # Uploaded files above this size are spooled to UPLOAD_SPOOL_DIR instead of
+    # being held in memory. Point the directory at real disk, not tmpfs.
+    UPLOAD_SPOOL_THRESHOLD = int(os.environ.get("UPLOAD_SPOOL_THRESHOLD", 512 * 1024))
+    UPLOAD_SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR")
+    # B2B quick-order CSVs awaiting their Celery task. Must be shared by the
+    # web and worker hosts.
+    QUICK_ORDER_UPLOAD_DIR = os.environ.get(
+        "QUICK_ORDER_UPLOAD_DIR", os.path.join(UPLOAD_FOLDER, "quick_orders")
+    )
+    # Largest image accepted, in pixels (checked from the header, not decoded).
+    MAX_UPLOAD_IMAGE_PIXELS = int(os.environ.get("MAX_UPLOAD_IMAGE_PIXELS", 40_000_000))
+
+    # Memory-mapped "customers also bought" matrix, updated by a Celery job.
+    # Defaults to the Flask instance folder when unset. Normalization is one
+    # of "count", "cosine" or "lift".
+    CO_PURCHASE_MATRIX_PATH = os.environ.get("CO_PURCHASE_MATRIX_PATH")
+    CO_PURCHASE_NORMALIZATION = os.environ.get("CO_PURCHASE_NORMALIZATION", "cosine")
+    CO_PURCHASE_TOP_K = int(os.environ.get("CO_PURCHASE_TOP_K", 20))
+    CO_PURCHASE_MIN_COUNT = int(os.environ.get("CO_PURCHASE_MIN_COUNT", 1))
+
+    # Rendered passport assets of serialized items, written by Celery workers
+    PASSPORT_HTML_STORAGE_PATH = os.environ.get(
+        "PASSPORT_HTML_STORAGE_PATH", os.path.join(basedir, "passports", "html")
+    )
+    PASSPORT_PDF_STORAGE_PATH = os.environ.get(
+        "PASSPORT_PDF_STORAGE_PATH", os.path.join(basedir, "passports", "pdf")
+    )
+    QR_CODE_STORAGE_PATH = os.environ.get(
+        "QR_CODE_STORAGE_PATH", os.path.join(basedir, "passports", "qr")
+    )
+    PASSPORT_ASSET_CHUNK_SIZE = int(os.environ.get("PASSPORT_ASSET_CHUNK_SIZE", 50))
+
+    # Pooled headless Chromium used to render PDFs (see utils/pdf_renderer.py).
+    # The pool size caps concurrent renders per worker process.
+    PDF_BROWSER_POOL_SIZE = int(os.environ.get("PDF_BROWSER_POOL_SIZE", 2))
+    PDF_RENDER_TIMEOUT = int(os.environ.get("PDF_RENDER_TIMEOUT", 60))
+    PDF_PAGE_MAX_USES = int(os.environ.get("PDF_PAGE_MAX_USES", 50))
+    PDF_BROWSER_MAX_USES = int(os.environ.get("PDF_BROWSER_MAX_USES", 500))
 
     # --- IMPLEMENTATION: Password Policy ---
     PASSWORD_MIN_LENGTH = 8
@@ -55,6 +113,60 @@ class Config:
     CACHE_TYPE = "redis"
     CACHE_DEFAULT_TIMEOUT = 3600  # Cache for 1 hour by default
     CACHE_REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+    # Per-process tier in front of Redis for hot keys (see utils/tiered_cache.py)
+    TIERED_CACHE_LOCAL_TIMEOUT = int(os.environ.get("TIERED_CACHE_LOCAL_TIMEOUT", 5))
+    TIERED_CACHE_MAX_ENTRIES = int(os.environ.get("TIERED_CACHE_MAX_ENTRIES", 2048))
+
+    # Hot products keep their stock in Redis (services/hot_stock_service.py).
+    # The reconciler runs every HOT_STOCK_RECONCILE_SECONDS (read from the
+    # environment by the Celery beat schedule); a counter drifting from the
+    # database by more than HOT_STOCK_MAX_DRIFT units is logged as an error.
+    HOT_STOCK_RECONCILE_SECONDS = float(
+        os.environ.get("HOT_STOCK_RECONCILE_SECONDS", 5)
+    )
+    HOT_STOCK_MAX_DRIFT = int(os.environ.get("HOT_STOCK_MAX_DRIFT", 0))
+
+    # Transactional outbox (services/outbox_service.py), drained by
+    # `flask outbox dispatch`. Nothing is dispatched while the broker queue
+    # holds OUTBOX_MAX_QUEUE_DEPTH messages (0: no limit).
+    OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", 500))
+    OUTBOX_POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", 1.0))
+    OUTBOX_MAX_QUEUE_DEPTH = int(os.environ.get("OUTBOX_MAX_QUEUE_DEPTH", 10000))
+    OUTBOX_RETENTION_HOURS = float(os.environ.get("OUTBOX_RETENTION_HOURS", 24))
+
+    # SQL profiler (utils/sql_profiler.py). Set SQL_PROFILER_FAIL_THRESHOLD in
+    # test runs to fail any request or task repeating one statement that often.
+    SQL_PROFILER_ENABLED = os.environ.get("SQL_PROFILER_ENABLED", "1") in ("1", "true")
+    SQL_PROFILER_SLOW_MS = int(os.environ.get("SQL_PROFILER_SLOW_MS", 100))
+    SQL_PROFILER_N_PLUS_ONE_THRESHOLD = int(
+        os.environ.get("SQL_PROFILER_N_PLUS_ONE_THRESHOLD", 10)
+    )
+    SQL_PROFILER_BUFFER_SIZE = int(os.environ.get("SQL_PROFILER_BUFFER_SIZE", 200))
+    SQL_PROFILER_FAIL_THRESHOLD = (
+        int(os.environ["SQL_PROFILER_FAIL_THRESHOLD"])
+        if os.environ.get("SQL_PROFILER_FAIL_THRESHOLD")
+        else None
+    )
+
+    # Bearer token Prometheus must send to scrape /metrics. Without one, only
+    # the networks listed in METRICS_ALLOWED_NETWORKS (comma-separated CIDRs,
+    # e.g. "10.0.5.0/24") may scrape, or loopback addresses in debug mode.
+    # The client address is the socket peer: behind a proxy, use the token.
+    METRICS_AUTH_TOKEN = os.environ.get("METRICS_AUTH_TOKEN")
+    METRICS_ALLOWED_NETWORKS = os.environ.get("METRICS_ALLOWED_NETWORKS", "")
+
+    # Seconds a user's role names stay cached for permission checks; role
+    # changes made through the RBAC service invalidate them immediately.
+    RBAC_ROLES_CACHE_TIMEOUT = int(os.environ.get("RBAC_ROLES_CACHE_TIMEOUT", 300))
+
+    # Rate limiting (Flask-Limiter). Counters live in Redis so limits hold
+    # across all workers; while Redis is down, limits are kept per process.
+    RATELIMIT_STORAGE_URI = os.environ.get(
+        "RATELIMIT_STORAGE_URI", os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+    )
+    RATELIMIT_STRATEGY = "moving-window"
+    RATELIMIT_IN_MEMORY_FALLBACK_ENABLED = True
+    RATELIMIT_KEY_PREFIX = "flask_limiter"
 
     # --- Celery Configuration ---
     # The broker URL specifies the connection to your message broker instance (Redis).
@@ -105,6 +217,11 @@ class Config:
     # Encryption Key
     ENCRYPTION_KEY = os.environ.get("ENCRYPTION_KEY") or Fernet.generate_key().decode()
 
+    # Key for the deterministic HMAC blind indexes stored next to encrypted
+    # columns (e.g. users.email_hash). Required: the app refuses to start
+    # without it. Changing it requires a backfill.
+    BLIND_INDEX_KEY = os.environ.get("BLIND_INDEX_KEY")
+
     # Vite Development Server URL
     VITE_DEV_SERVER = os.environ.get("VITE_DEV_SERVER", "http://localhost:5173")
 
@@ -124,8 +241,10 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = os.environ.get("TEST_DATABASE_URL", "sqlite:///:memory:")
     WTF_CSRF_ENABLED = False  # Disable CSRF forms in tests for convenience
+    RATELIMIT_STORAGE_URI = "memory://"
     SESSION_COOKIE_SECURE = False
     LOG_FILE_PATH = None  # Disable file logging for tests
+    BLIND_INDEX_KEY = os.environ.get("BLIND_INDEX_KEY", "test-blind-index-key")
 
 
 class ProductionConfig(Config):
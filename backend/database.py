@@ -1,8 +1,7 @@
-from flask import request
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 
-from backend.loggers import database_logger as db_logger
+from backend.utils import sql_profiler
 
 db = SQLAlchemy()
 migrate = Migrate()
@@ -11,11 +10,8 @@ migrate = Migrate()
 def setup_database_security(app):
     """Setup database security configurations."""
 
-    @app.before_request
-    def log_db_queries():
-        """Log database queries for monitoring."""
-        if app.config.get("DEBUG"):
-            db_logger.debug(f"Database query from {request.endpoint}")
+    # Statement counts, N+1 candidates and slow queries per request and task.
+    sql_profiler.init_app(app)
 
     # Configure SQLAlchemy engine options for security
     app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
@@ -135,3 +135,84 @@ CREATE TABLE exclusive_rewards (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+
+-- Deterministic blind index for encrypted user emails (users.email holds Fernet
+-- ciphertext, which cannot be probed by equality). Populate existing rows with
+-- `flask backfill-email-index` before relying on it for lookups.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS email_hash VARCHAR(64);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email_hash ON users(email_hash);
+
+
+-- Serialized item batches: rows are bulk-inserted first and their passport
+-- assets (HTML, PDF, QR code) rendered afterwards by Celery workers.
+ALTER TABLE serialized_items ADD COLUMN IF NOT EXISTS batch_id VARCHAR(32);
+CREATE INDEX IF NOT EXISTS ix_serialized_items_batch_id ON serialized_items(batch_id);
+ALTER TABLE product_passports ADD COLUMN IF NOT EXISTS html_file_path VARCHAR(512);
+ALTER TABLE product_passports ADD COLUMN IF NOT EXISTS pdf_file_path VARCHAR(512);
+ALTER TABLE product_passports ADD COLUMN IF NOT EXISTS qr_code_file_path VARCHAR(512);
+ALTER TABLE product_passports ADD COLUMN IF NOT EXISTS assets_generated_at TIMESTAMP;
+ALTER TABLE product_passports ADD COLUMN IF NOT EXISTS asset_error TEXT;
+
+
+-- Content-addressed assets: files are stored once under their SHA-256 digest
+-- and image derivatives are rendered on first request.
+ALTER TABLE assets ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+ALTER TABLE assets ADD COLUMN IF NOT EXISTS size_bytes INTEGER;
+CREATE UNIQUE INDEX IF NOT EXISTS ix_assets_content_hash ON assets(content_hash);
+
+
+-- Maintained reserved stock: inventories.reserved_quantity is the sum of the
+-- row's reservations, updated with them, and available_quantity is computed
+-- from it, so availability reads are a single column. Expired reservations are
+-- deleted in batches by the tasks.expire_inventory_reservations sweeper.
+ALTER TABLE inventories ADD COLUMN IF NOT EXISTS reserved_quantity INTEGER NOT NULL DEFAULT 0;
+UPDATE inventories i SET reserved_quantity = r.total
+FROM (
+    SELECT inventory_id, SUM(quantity) AS total
+    FROM inventory_reservations
+    GROUP BY inventory_id
+) r
+WHERE r.inventory_id = i.id;
+ALTER TABLE inventories ADD COLUMN IF NOT EXISTS available_quantity INTEGER
+    GENERATED ALWAYS AS (COALESCE(quantity, 0) - reserved_quantity) STORED;
+CREATE INDEX IF NOT EXISTS ix_inventory_reservations_expires_at ON inventory_reservations(expires_at);
+CREATE INDEX IF NOT EXISTS ix_inventory_reservations_inventory_id ON inventory_reservations(inventory_id);
+
+
+-- Transactional outbox: Celery tasks written in the same transaction as the
+-- order they belong to, published by `flask outbox dispatch`.
+CREATE TABLE IF NOT EXISTS outbox_messages (
+    id BIGSERIAL PRIMARY KEY,
+    task_name VARCHAR(255) NOT NULL,
+    args JSON NOT NULL,
+    kwargs JSON NOT NULL,
+    dedup_key VARCHAR(255) UNIQUE,
+    created_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc'),
+    available_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc'),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    dispatched_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS ix_outbox_messages_pending ON outbox_messages(id) WHERE dispatched_at IS NULL;
+CREATE INDEX IF NOT EXISTS ix_outbox_messages_dispatched_at ON outbox_messages(dispatched_at);
+
+
+-- Asset blobs: a content-addressed file is shared by every asset with its
+-- digest, one per usage tag, and removed from the store with the last one.
+CREATE TABLE IF NOT EXISTS asset_blobs (
+    content_hash VARCHAR(64) PRIMARY KEY,
+    size_bytes BIGINT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO asset_blobs (content_hash, size_bytes)
+SELECT content_hash, MAX(COALESCE(size_bytes, 0)) FROM assets
+WHERE content_hash IS NOT NULL
+GROUP BY content_hash
+ON CONFLICT (content_hash) DO NOTHING;
+DROP INDEX IF EXISTS ix_assets_content_hash;
+CREATE INDEX IF NOT EXISTS ix_assets_content_hash ON assets(content_hash);
+ALTER TABLE assets DROP CONSTRAINT IF EXISTS uq_assets_content_hash_usage_tag;
+ALTER TABLE assets ADD CONSTRAINT uq_assets_content_hash_usage_tag UNIQUE (content_hash, usage_tag);
+ALTER TABLE assets DROP CONSTRAINT IF EXISTS fk_assets_content_hash;
+ALTER TABLE assets ADD CONSTRAINT fk_assets_content_hash
+    FOREIGN KEY (content_hash) REFERENCES asset_blobs(content_hash);
@@ -1,5 +1,4 @@
 from argon2 import PasswordHasher
-from flask_caching import Cache
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_limiter import Limiter
@@ -12,6 +11,9 @@ from flask_socketio import SocketIO
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf.csrf import CSRFProtect
 
+from .utils.metrics import InstrumentedCache
+from .utils.tiered_cache import TieredCache
+
 # Initialize extensions
 db = SQLAlchemy()
 migrate = Migrate()
@@ -20,10 +22,13 @@ login_manager = LoginManager()
 csrf = CSRFProtect()
 mail = Mail()
 cors = CORS()
-cache = Cache()
+# Counts hits and misses per key family (see utils/metrics.py).
+cache = InstrumentedCache()
 jwt = JWTManager()
 limiter = Limiter(
     key_func=get_remote_address, default_limits=["200 per day", "50 per hour"]
 )
 redis_client = FlaskRedis()
+# Per-process LRU in front of `cache`, invalidated over `redis_client` pub/sub.
+tiered_cache = TieredCache(cache, redis_client)
 socketio = SocketIO()
@@ -1,63 +1,435 @@
+"""
+Application logging.
+
+Logging never does I/O on the thread that logs. Every record goes to the root
+logger's `RequestQueueHandler`, which stamps it with the current request id,
+drops sampled-out records and puts it on an in-memory queue. A single
+`QueueListener` thread per process formats the records as JSON lines and
+writes them in batches: a batch is written when it is full, when an ERROR is
+logged, or after LOG_FLUSH_INTERVAL seconds without new records.
+
+The request id is kept in a context variable, set once per request (from a
+well-formed `X-Request-ID` header, or a new UUID) and once per Celery task
+(the task id), so one filter serves every request and thread.
+
+High-volume events (such as the access log) are logged with
+`extra={"sampled": True}`; only that share of them given for their level by
+LOG_SAMPLE_RATES (e.g. "DEBUG=0.01,INFO=0.1") is kept, and kept records carry
+`sample_rate` so counts can be scaled back up. Other records are never
+sampled.
+
+Errors are also added to the store read by the admin monitoring pages (see
+`utils/error_log.py`).
+
+Settings (see `config.py`):
+    LOG_LEVEL, LOG_FILE_PATH, LOG_MAX_BYTES, LOG_BACKUP_COUNT, USE_JSON_LOGS,
+    LOG_QUEUE_SIZE, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL, LOG_SAMPLE_RATES,
+    ERROR_LOG_MAX_ENTRIES
+"""
+
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import os
+import queue
+import random
+import re
 import uuid
-from logging.handlers import RotatingFileHandler
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-from flask import g, jsonify, request
+from celery import signals
+from flask import default_handler, g, jsonify, request
 from werkzeug.exceptions import HTTPException
 
+from backend.utils.error_log import ErrorLogHandler, error_log_store
 
-def setup_logging(app):
+app_logger = logging.getLogger("backend")
+security_logger = logging.getLogger("security")
+database_logger = logging.getLogger("database")
+api_logger = logging.getLogger("api")
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+# Incoming ids are echoed into logs and headers, so only plain tokens are kept.
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+# Attributes every LogRecord has; anything else was passed through `extra`.
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {
+    "message",
+    "asctime",
+    "request_id",
+    "sampled",
+}
+
+_listener = None
+_listener_pid = None
+
+
+def get_request_id():
+    return request_id_var.get()
+
+
+# --- Filters and formatters ---
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the request (or Celery task) id of the context."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
     """
-    Configures application-wide logging, including request correlation IDs.
+    Keeps a share of the records logged with `extra={"sampled": True}`, by
+    level. Levels without a rate, and unflagged records, are always kept.
     """
-    # Remove default handlers to avoid duplicate logs
-    for handler in app.logger.handlers:
-        app.logger.removeHandler(handler)
 
-    # Configure formatter
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - RequestID: %(request_id)s - %(message)s [in %(pathname)s:%(lineno)d]"
-    )
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = rates or {}
 
-    # File handler
-    file_handler = RotatingFileHandler("backend_app.log", maxBytes=10000, backupCount=3)
-    file_handler.setFormatter(formatter)
+    def filter(self, record):
+        if not getattr(record, "sampled", False):
+            return True
+        rate = self.rates.get(record.levelno)
+        if rate is None or rate >= 1:
+            return True
+        record.sample_rate = rate
+        return random.random() < rate  # noqa: S311 - not security sensitive
 
-    # Console handler
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(formatter)
 
-    # Add handlers to the app's logger
-    app.logger.addHandler(file_handler)
-    app.logger.addHandler(stream_handler)
-    app.logger.setLevel(logging.INFO)
+def parse_sample_rates(value):
+    """Parses "DEBUG=0.01,INFO=0.1" (or a dict) into {levelno: rate}."""
+    if isinstance(value, dict):
+        items = value.items()
+    else:
+        items = (part.split("=", 1) for part in (value or "").split(",") if "=" in part)
+    rates = {}
+    for level, rate in items:
+        levelno = logging.getLevelName(str(level).strip().upper())
+        if isinstance(levelno, int):
+            rates[levelno] = min(1.0, max(0.0, float(rate)))
+    return rates
 
-    @app.before_request
-    def before_request_logging():
-        """
-        Log before each request and assign a unique request ID.
-        """
-        # FIX: Added import for 'uuid'
-        g.request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
 
-        # Add a filter to inject the request_id into all log records
-        class RequestIdFilter(logging.Filter):
-            def filter(self, record):
-                record.request_id = g.get("request_id", "N/A")
-                return True
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line."""
 
-        app.logger.addFilter(RequestIdFilter())
-        app.logger.info(f"Request started: {request.method} {request.path}")
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, UTC).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", None),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+            "process": record.process,
+        }
+        if isinstance(record.msg, dict):
+            entry.update(record.msg)
+        else:
+            entry["message"] = record.getMessage()
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = record.stack_info
+        return json.dumps(entry, default=str)
 
-    @app.after_request
-    def after_request_logging(response):
-        """
-        Log after each request.
-        """
-        app.logger.info(
-            f"Request finished: {request.method} {request.path} - Status: {response.status_code}"
+
+TEXT_FORMAT = (
+    "%(asctime)s - %(name)s - %(levelname)s - RequestID: %(request_id)s - "
+    "%(message)s [in %(pathname)s:%(lineno)d]"
+)
+
+
+# --- Handlers ---
+
+
+class RequestQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread. Records below WARNING are dropped
+    when the queue is full rather than blocking the request; warnings and
+    errors wait for room.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Unlike the default, keeps the traceback apart from the message so
+        # the formatter can put it in its own field.
+        record = copy.copy(record)
+        if not isinstance(record.msg, dict):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno >= logging.WARNING:
+                self.queue.put(record)
+            else:
+                self.dropped += 1
+
+
+class _BatchingMixin:
+    """Buffers formatted records and writes them with a single `write`."""
+
+    def _init_batching(self, capacity):
+        self.capacity = capacity
+        self.buffer = []
+
+    def emit(self, record):
+        try:
+            self.buffer.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        if len(self.buffer) >= self.capacity or record.levelno >= logging.ERROR:
+            self.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.buffer:
+                data = self.terminator.join(self.buffer) + self.terminator
+                self.buffer.clear()
+                try:
+                    self._write(data)
+                except Exception:
+                    self.handleError(None)
+            if self.stream is not None:
+                self.stream.flush()
+        finally:
+            self.release()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+class BatchingStreamHandler(_BatchingMixin, logging.StreamHandler):
+    def __init__(self, stream=None, capacity=100):
+        super().__init__(stream)
+        self._init_batching(capacity)
+
+    def _write(self, data):
+        self.stream.write(data)
+
+
+class BatchingFileHandler(_BatchingMixin, RotatingFileHandler):
+    """A size-rotated log file written in batches."""
+
+    def __init__(self, filename, max_bytes, backup_count, capacity=100):
+        super().__init__(
+            filename,
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding="utf-8",
+            delay=True,
+        )
+        self._init_batching(capacity)
+
+    def _write(self, data):
+        if self.stream is None:
+            self.stream = self._open()
+        if self.maxBytes and self.stream.tell() + len(data) >= self.maxBytes:
+            self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+        self.stream.write(data)
+
+
+class BatchingQueueListener(QueueListener):
+    """
+    A `QueueListener` that flushes its handlers whenever the queue has been
+    idle for `flush_interval` seconds, so batches never wait indefinitely.
+    """
+
+    def __init__(self, log_queue, *handlers, flush_interval=1.0):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.flush_interval = flush_interval
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block, self.flush_interval)
+            except queue.Empty:
+                if not block:
+                    raise
+                self.flush()
+
+    def flush(self):
+        for handler in self.handlers:
+            handler.flush()
+
+    def stop(self):
+        super().stop()
+        self.flush()
+
+
+def _build_handlers(config, level):
+    batch_size = config.get("LOG_BATCH_SIZE", 100)
+    json_formatter = JsonFormatter()
+
+    console = BatchingStreamHandler(capacity=batch_size)
+    console.setFormatter(
+        json_formatter
+        if config.get("USE_JSON_LOGS")
+        else logging.Formatter(TEXT_FORMAT)
+    )
+    console.setLevel(level)
+    handlers = [console]
+
+    log_file = config.get("LOG_FILE_PATH")
+    if log_file:
+        directory = os.path.dirname(log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = BatchingFileHandler(
+            log_file,
+            max_bytes=config.get("LOG_MAX_BYTES", 10 * 1024 * 1024),
+            backup_count=config.get("LOG_BACKUP_COUNT", 5),
+            capacity=batch_size,
         )
-        return response
+        file_handler.setFormatter(json_formatter)
+        file_handler.setLevel(level)
+        handlers.append(file_handler)
+
+    # ERROR and CRITICAL records, indexed for the admin monitoring pages.
+    error_log_store.max_entries = config.get("ERROR_LOG_MAX_ENTRIES", 5000)
+    error_handler = ErrorLogHandler(error_log_store)
+    error_handler.setFormatter(json_formatter)
+    handlers.append(error_handler)
+    return handlers
+
+
+def _start_listener(log_queue, handlers, flush_interval):
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+    _listener = BatchingQueueListener(
+        log_queue, *handlers, flush_interval=flush_interval
+    )
+    _listener.start()
+    _listener_pid = os.getpid()
+
+
+def _restart_listener_after_fork():
+    # Threads do not survive a fork (e.g. Gunicorn with --preload): the child
+    # starts its own listener on the same handlers, with a new queue, since
+    # the inherited one may have been locked by the parent's listener.
+    global _listener, _listener_pid
+    if _listener is None:
+        return
+    log_queue = queue.Queue(maxsize=_listener.queue.maxsize)
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, RequestQueueHandler):
+            handler.queue = log_queue
+    _listener = BatchingQueueListener(
+        log_queue, *_listener.handlers, flush_interval=_listener.flush_interval
+    )
+    _listener.start()
+    _listener_pid = os.getpid()
+
+
+def stop_logging():
+    """Writes out the buffered records; runs at exit."""
+    global _listener
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+    _listener = None
+
+
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
+atexit.register(stop_logging)
+
+
+# --- Request and task ids ---
+
+
+def _bind_request_id():
+    supplied = request.headers.get("X-Request-ID", "")
+    g.request_id = supplied if _REQUEST_ID_RE.match(supplied) else str(uuid.uuid4())
+    g._request_id_token = request_id_var.set(g.request_id)
+
+
+def _unbind_request_id(exc):
+    token = g.pop("_request_id_token", None)
+    if token is not None:
+        request_id_var.reset(token)
+
+
+_task_tokens = {}
+
+
+@signals.task_prerun.connect
+def _bind_task_id(task_id=None, **kwargs):
+    _task_tokens[task_id] = request_id_var.set(task_id)
+
+
+@signals.task_postrun.connect
+def _unbind_task_id(task_id=None, **kwargs):
+    token = _task_tokens.pop(task_id, None)
+    if token is not None:
+        request_id_var.reset(token)
+
+
+def setup_logging(app):
+    """
+    Routes all logging through the queue and starts this process's listener.
+    """
+    config = app.config
+    level = logging.getLevelName(str(config.get("LOG_LEVEL", "INFO")).upper())
+    if not isinstance(level, int):
+        level = logging.INFO
+
+    log_queue = queue.Queue(maxsize=config.get("LOG_QUEUE_SIZE", 10000))
+    queue_handler = RequestQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+    queue_handler.addFilter(
+        SamplingFilter(parse_sample_rates(config.get("LOG_SAMPLE_RATES")))
+    )
+
+    # Replace any handler of an earlier setup, and Flask's default one, so
+    # records are written exactly once.
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, RequestQueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    for handler in list(app.logger.handlers):
+        app.logger.removeHandler(handler)
+    app.logger.removeHandler(default_handler)
+    app.logger.setLevel(level)
+
+    _start_listener(
+        log_queue, _build_handlers(config, level), config.get("LOG_FLUSH_INTERVAL", 1.0)
+    )
+
+    # First in, so every other hook logs with the request id.
+    app.before_request_funcs.setdefault(None, []).insert(0, _bind_request_id)
+    app.teardown_request(_unbind_request_id)
 
     @app.errorhandler(Exception)
     def handle_exception(e):
@@ -0,0 +1,65 @@
+import functools
+import hmac
+import ipaddress
+import os
+
+from flask import Blueprint, Response, current_app, jsonify, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+def _scrape_allowed():
+    """
+    With METRICS_AUTH_TOKEN set, the scraper must present it. Otherwise only
+    METRICS_ALLOWED_NETWORKS may scrape, plus loopback in debug mode: a
+    private peer address is no proof of an internal client behind a proxy.
+    """
+    config = current_app.config
+    token = config.get("METRICS_AUTH_TOKEN")
+    if token:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        return hmac.compare_digest(supplied.encode(), token.encode())
+    try:
+        address = ipaddress.ip_address(request.remote_addr or "")
+    except ValueError:
+        return False
+    if current_app.debug and address.is_loopback:
+        return True
+    return any(
+        address in network
+        for network in _allowed_networks(config.get("METRICS_ALLOWED_NETWORKS"))
+    )
+
+
+@functools.cache
+def _allowed_networks(setting):
+    return tuple(
+        ipaddress.ip_network(cidr.strip(), strict=False)
+        for cidr in (setting or "").split(",")
+        if cidr.strip()
+    )
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Prometheus scrape endpoint. With PROMETHEUS_MULTIPROC_DIR set, samples of
+    every Gunicorn worker and Celery process are aggregated; otherwise only
+    this process's are returned.
+    """
+    if not _scrape_allowed():
+        return jsonify({"message": "Forbidden."}), 403
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
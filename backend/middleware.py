@@ -1,38 +1,23 @@
+import logging
 import os
-import time
-import uuid
 from datetime import datetime
 from functools import wraps
 
 from flask import Flask, current_app, g, jsonify, redirect, request, session
 from flask_compress import Compress
 from flask_cors import CORS
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 from flask_login import current_user
-from prometheus_client import Counter, Histogram
 from werkzeug.exceptions import default_exceptions
 
 from backend.loggers import app_logger as logger
 from backend.loggers import security_logger
 from backend.services.rbac_service import rbac_service
 from backend.utils.input_sanitizer import InputSanitizer
-
-# Prometheus metrics
-REQUEST_LATENCY = Histogram(
-    "request_latency_seconds", "Request latency", ["method", "endpoint"]
-)
-REQUEST_COUNT = Counter(
-    "request_count", "Request count", ["method", "endpoint", "http_status"]
-)
-
+from backend.utils.metrics import finish_request, start_request
 
 # --- Global Flask Extensions Initialization ---
-limiter = Limiter(
-    key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://",
-)
+# Rate limiting uses the shared `backend.extensions.limiter`, initialised in
+# create_app; a second Limiter here would count every request twice.
 compress = Compress()
 
 
@@ -138,25 +123,22 @@ def setup_middleware(app: Flask) -> None:
     Setup global middleware for the Flask application.
     """
 
-    @app.before_request
-    def before_request():
-        g.start_time = time.time()
-        g.request_id = str(uuid.uuid4())
+    # `g.request_id` is set by `loggers.setup_logging`, before any other hook.
+
+    # Metrics start before every other hook, so the SQL and cache work of
+    # session and permission checks is attributed to the request too.
+    app.before_request_funcs.setdefault(None, []).insert(0, start_request)
 
     @app.after_request
     def after_request(response):
-        if hasattr(g, "start_time"):
-            latency = time.time() - g.start_time
-            REQUEST_LATENCY.labels(request.method, request.path).observe(latency)
-
-        REQUEST_COUNT.labels(request.method, request.path, response.status_code).inc()
+        # Labelled by URL rule, so slugs and UUIDs do not create new series.
+        finish_request(response)
 
         if hasattr(g, "request_id"):
             response.headers["X-Request-ID"] = g.request_id
 
         return response
 
-    limiter.init_app(app)
     compress.init_app(app)
 
     allowed_origins = os.getenv("CORS_ALLOWED_ORIGINS", "http://localhost:5173").split(
@@ -168,18 +150,6 @@ def setup_middleware(app: Flask) -> None:
         supports_credentials=True,
     )
 
-    @app.before_request
-    def log_request_started():
-        logger.info(
-            {
-                "event": "request_started",
-                "request_id": g.request_id,
-                "method": request.method,
-                "path": request.path,
-                "ip": request.remote_addr,
-            }
-        )
-
     @app.before_request
     def check_suspicious_request_path():
         if any(
@@ -202,7 +172,8 @@ def setup_middleware(app: Flask) -> None:
     @app.before_request
     def check_payload_size_limit():
         MAX_SIZE_USER = 1 * 1024 * 1024  # 1 MB
-        MAX_SIZE_STAFF = 25 * 1024 * 1024  # 25 MB
+        # Staff uploads are spooled to disk, so they may use the app-wide cap.
+        MAX_SIZE_STAFF = current_app.config["MAX_CONTENT_LENGTH"]
 
         if request.method not in ["POST", "PUT", "PATCH"]:
             return
@@ -242,12 +213,18 @@ def setup_middleware(app: Flask) -> None:
 
     @app.after_request
     def log_request_finished(response):
-        logger.info(
+        # One access log line per request, sampled at the rates of
+        # LOG_SAMPLE_RATES; server errors are logged as warnings.
+        logger.log(
+            logging.WARNING if response.status_code >= 500 else logging.INFO,
             {
                 "event": "request_finished",
-                "request_id": g.request_id,
+                "method": request.method,
+                "path": request.path,
                 "status_code": response.status_code,
-            }
+                "ip": request.remote_addr,
+            },
+            extra={"sampled": True},
         )
         return response
 
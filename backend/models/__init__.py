@@ -30,6 +30,7 @@ from .newsletter_models import (
     NewsletterSubscriber,
 )  # Corrected: Import NewsletterSubscriber
 from .order_models import Invoice, Order, OrderItem, OrderStatusEnum
+from .outbox_models import OutboxMessage
 from .passport_models import PassportEntry, ProductPassport, SerializedItem
 from .product_models import (
     Category,
@@ -16,6 +16,22 @@ class Asset(BaseModel):
     mime_type = db.Column(db.String(100), nullable=False)
     # Could be 'product_image', 'blog_post_hero', 'logo', etc.
     usage_tag = db.Column(db.String(50), index=True)
+    # SHA-256 of the file; the blob is stored once under this digest and
+    # shared by every asset with the same content (see AssetBlob).
+    content_hash = db.Column(
+        db.String(64),
+        db.ForeignKey("asset_blobs.content_hash"),
+        index=True,
+        nullable=True,
+    )
+    size_bytes = db.Column(db.Integer, nullable=True)
+
+    __table_args__ = (
+        # A file uploaded twice for the same usage is one asset.
+        db.UniqueConstraint(
+            "content_hash", "usage_tag", name="uq_assets_content_hash_usage_tag"
+        ),
+    )
 
     def to_dict(self):
         return {
@@ -24,8 +40,30 @@ class Asset(BaseModel):
             "url": self.url,
             "mime_type": self.mime_type,
             "usage_tag": self.usage_tag,
+            "content_hash": self.content_hash,
+            "size_bytes": self.size_bytes,
             "created_at": self.created_at.isoformat(),
         }
 
     def __repr__(self):
         return f"<Asset {self.filename}>"
+
+
+class AssetBlob(db.Model):
+    """
+    A file in the content store, shared by the assets having its digest.
+
+    Uploads and deletions lock this row before adding or removing an asset of
+    the digest, so a blob is only removed from the store once no asset
+    references it.
+    """
+
+    __tablename__ = "asset_blobs"
+    content_hash = db.Column(db.String(64), primary_key=True)
+    size_bytes = db.Column(db.BigInteger, nullable=False)
+    created_at = db.Column(
+        db.DateTime, default=db.func.current_timestamp(), nullable=False
+    )
+
+    def __repr__(self):
+        return f"<AssetBlob {self.content_hash}>"
@@ -90,6 +90,16 @@ class Inventory(BaseModel):
         db.Integer, db.ForeignKey("products.id"), nullable=False, unique=True
     )
     quantity = db.Column(db.Integer, default=0)
+    # Sum of the reservations on this row, kept in step with them by
+    # InventoryService in the same transaction (expired ones until swept).
+    reserved_quantity = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    # Computed by the database on every write, so reads need no aggregate.
+    available_quantity = db.Column(
+        db.Integer,
+        db.Computed("COALESCE(quantity, 0) - reserved_quantity", persisted=True),
+    )
     low_stock_threshold = db.Column(db.Integer, default=10)
     product = db.relationship("Product", back_populates="inventory")
     reservations = db.relationship(
@@ -105,18 +115,13 @@ class Inventory(BaseModel):
             "product_name": self.product.name,
             "sku": self.product.sku,
             "quantity": self.quantity,
+            "reserved_quantity": self.reserved_quantity,
+            "available_quantity": self.available_quantity,
         }
 
-    @property
-    def available_quantity(self):
-        """Calculates the quantity available for purchase (total - reserved)."""
-        reserved = (
-            db.session.query(db.func.sum(InventoryReservation.quantity))
-            .filter_by(inventory_id=self.id)
-            .scalar()
-            or 0
-        )
-        return self.quantity - reserved
+    def get_available_stock(self):
+        """The quantity available for purchase (total - reserved)."""
+        return self.available_quantity or 0
 
     def __repr__(self):
         return f"<Inventory for Product {self.product_id}>"
@@ -157,7 +162,9 @@ class StockMovement(BaseModel, SoftDeleteMixin):
 class InventoryReservation(db.Model):
     __tablename__ = "inventory_reservations"
     id = db.Column(db.Integer, primary_key=True)
-    inventory_id = db.Column(db.Integer, db.ForeignKey("inventory.id"), nullable=False)
+    inventory_id = db.Column(
+        db.Integer, db.ForeignKey("inventories.id"), nullable=False, index=True
+    )
     # Use session_id for guests and user_id for logged-in users.
     session_id = db.Column(db.String(255), nullable=True, index=True)
     user_id = db.Column(
@@ -165,7 +172,8 @@ class InventoryReservation(db.Model):
     )
     quantity = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    expires_at = db.Column(db.DateTime, nullable=False)
+    # Indexed for the expiry sweeper (InventoryService.expire_reservations).
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
 
     def __repr__(self):
         return f"<Reservation {self.id} for Inventory {self.inventory_id}>"
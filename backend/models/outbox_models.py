@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from backend.database import db
+
+
+class OutboxMessage(db.Model):
+    """
+    A Celery task to publish once the transaction that wrote it commits.
+
+    Rows are added in the same transaction as the order (or stock batch) they
+    belong to and published by the outbox dispatcher
+    (see services/outbox_service.py), so a task is never sent for a rolled
+    back order nor lost when the broker is unreachable at commit time.
+    """
+
+    __tablename__ = "outbox_messages"
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    task_name = db.Column(db.String(255), nullable=False)
+    args = db.Column(db.JSON, nullable=False, default=list)
+    kwargs = db.Column(db.JSON, nullable=False, default=dict)
+    # Messages sharing a key are enqueued once (e.g. "order-confirmation:42").
+    dedup_key = db.Column(db.String(255), nullable=True, unique=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Publishing is retried after a broker error, with a growing delay.
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    last_error = db.Column(db.Text, nullable=True)
+    dispatched_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # Only pending messages are indexed: the dispatcher's scan stays small
+        # however many published rows await the purge.
+        db.Index(
+            "ix_outbox_messages_pending",
+            "id",
+            postgresql_where=db.text("dispatched_at IS NULL"),
+            sqlite_where=db.text("dispatched_at IS NULL"),
+        ),
+        db.Index("ix_outbox_messages_dispatched_at", "dispatched_at"),
+    )
+
+    def __repr__(self):
+        return f"<OutboxMessage {self.id} {self.task_name}>"
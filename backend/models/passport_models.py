@@ -34,6 +34,8 @@ class SerializedItem(BaseModel, SoftDeleteMixin):
     order_item_id = db.Column(
         pgUUID(as_uuid=True), db.ForeignKey("order_items.id"), nullable=True
     )  # Link when sold
+    # Stock batch the item was created in, used to track its asset rendering.
+    batch_id = db.Column(db.String(32), nullable=True, index=True)
 
     # --- Relationships ---
     product = db.relationship("Product", back_populates="serialized_items")
@@ -72,6 +74,13 @@ class ProductPassport(BaseModel, SoftDeleteMixin):
         unique=True,
     )
 
+    # --- Rendered assets (filled in asynchronously after creation) ---
+    html_file_path = db.Column(db.String(512), nullable=True)
+    pdf_file_path = db.Column(db.String(512), nullable=True)
+    qr_code_file_path = db.Column(db.String(512), nullable=True)
+    assets_generated_at = db.Column(db.DateTime, nullable=True)
+    asset_error = db.Column(db.Text, nullable=True)
+
     # --- Relationships ---
     serialized_item = db.relationship("SerializedItem", back_populates="passport")
     entries = db.relationship(
@@ -123,6 +123,10 @@ class Product(BaseModel, SoftDeleteMixin):
         backref=db.backref("visible_products", lazy="dynamic"),
     )
 
+    def get_available_stock(self):
+        """Units that can still be bought, read from the inventory row."""
+        return self.inventory.get_available_stock() if self.inventory else 0
+
     @property
     def is_active(self):
         """A product is active if it's not deleted and is published."""
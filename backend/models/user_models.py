@@ -9,17 +9,35 @@ from sqlalchemy import (
 from sqlalchemy import (
     Enum as SQLAlchemyEnum,
 )
-from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.ext.hybrid import Comparator, hybrid_property
 from sqlalchemy.orm import relationship
 from werkzeug.security import check_password_hash, generate_password_hash
 
 from backend.extensions import db
-from backend.utils.encryption import decrypt_data, encrypt_data
+from backend.utils.encryption import decrypt_data, email_blind_index, encrypt_data
 
 from .base import BaseModel, SoftDeleteMixin
 from .enums import NotificationFrequency, RoleType, UserStatus, UserType
 
 
+class EmailBlindIndexComparator(Comparator):
+    """
+    Routes SQL equality on `User.email` through the `email_hash` blind index,
+    so `filter_by(email=...)` becomes a single probe on a unique index.
+    """
+
+    def __eq__(self, other):
+        return self.__clause_element__() == email_blind_index(other)
+
+    def __ne__(self, other):
+        return self.__clause_element__() != email_blind_index(other)
+
+    def in_(self, other):
+        return self.__clause_element__().in_(
+            [email_blind_index(value) for value in other]
+        )
+
+
 class User(BaseModel, SoftDeleteMixin):
     """
     Represents a user of the application, storing authentication, personal,
@@ -35,6 +53,8 @@ class User(BaseModel, SoftDeleteMixin):
     _first_name = Column("first_name", String(256), nullable=False)
     _last_name = Column("last_name", String(256), nullable=False)
     _email = Column("email", String(256), unique=True, nullable=False)
+    # Keyed HMAC of the normalized email; maintained by the `email` setter.
+    email_hash = Column(String(64), unique=True, index=True, nullable=True)
     _phone_number = Column("phone_number", String(256), nullable=True)
 
     password_hash = Column(String(256), nullable=False)
@@ -100,6 +120,11 @@ class User(BaseModel, SoftDeleteMixin):
     @email.setter
     def email(self, value):
         self._email = encrypt_data(value)
+        self.email_hash = email_blind_index(value)
+
+    @email.comparator
+    def email(cls):
+        return EmailBlindIndexComparator(cls.email_hash)
 
     @hybrid_property
     def first_name(self):
@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify
 
+from backend.services.passport_asset_service import PassportAssetService
 from backend.services.passport_service import PassportService
 from backend.utils.input_sanitizer import InputSanitizer
 
@@ -27,3 +28,16 @@ def get_public_passport(token_id):
             status="error",
             message="An error occurred while fetching the product passport.",
         ), 500
+
+
+# READ the passport page of a serialized item (public access)
+@passport_bp.route("/item/<string:uid>", methods=["GET"])
+def get_public_passport_page(uid):
+    """
+    Serves the HTML passport page of a serialized item by its UID. This is the
+    URL printed in passport QR codes, so it must stay stable.
+    """
+    page = PassportAssetService.get_passport_page(uid)
+    if page is None:
+        return jsonify(status="error", message="Product passport not found."), 404
+    return page, 200, {"Content-Type": "text/html; charset=utf-8"}
@@ -1,11 +1,11 @@
 import logging
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from marshmallow import ValidationError
 
 from backend.extensions import cache
-from backend.models.product_models import Product, Review
+from backend.models.product_models import Review
 from backend.schemas import ProductSchema, ProductSearchSchema, ReviewSchema
 from backend.services.exceptions import NotFoundException, ValidationException
 from backend.services.inventory_service import InventoryService
@@ -13,6 +13,7 @@ from backend.services.product_service import ProductService
 from backend.services.review_service import ReviewService
 from backend.utils.decorators import api_resource_handler
 from backend.utils.input_sanitizer import InputSanitizer
+from backend.utils.pagination import get_cursor_arg
 
 # --- Blueprint and Service Initialization ---
 products_bp = Blueprint("products", __name__, url_prefix="/api/products")
@@ -23,7 +24,7 @@ inventory_service = InventoryService(logger)
 
 
 # --- Product Routes ---
-@products_bp.route("/<uuid:product_id>/recommendations", methods=["GET"])
+@products_bp.route("/<int:product_id>/recommendations", methods=["GET"])
 def get_recommendations(product_id):
     """Gets co-purchased product recommendations for a given product."""
     recommendations = product_service.get_product_recommendations(product_id)
@@ -42,7 +43,7 @@ def search_products():
 
 
 @products_bp.route("/", methods=["GET"])
-@cache.cached(timeout=300)  # Cache for 5 minutes
+@cache.cached(timeout=300, query_string=True)  # Cache for 5 minutes, per page/cursor
 def get_products():
     """Get a list of all available products with filtering and pagination."""
     try:
@@ -60,11 +61,21 @@ def get_products():
         )
 
     try:
+        cursor = get_cursor_arg()
         products_pagination = product_service.get_all_products_paginated(
             page=validated_params.get("page", 1),
             per_page=validated_params.get("per_page", 24),
             filters=validated_params,
+            cursor=cursor,
         )
+        if cursor is not None:
+            return jsonify(
+                {
+                    "status": "success",
+                    "data": ProductSchema(many=True).dump(products_pagination.items),
+                    **products_pagination.to_dict(),
+                }
+            )
         return jsonify(
             {
                 "status": "success",
@@ -88,15 +99,16 @@ def get_products():
 
 
 @products_bp.route("/<slug>", methods=["GET"])
-@api_resource_handler(
-    model=Product,
-    response_schema=ProductSchema,
-    lookup_field="slug",
-    eager_loads=["category", "collections", "reviews"],
-)
-def get_product_by_slug(instance):
-    """Get detailed information for a single product by its slug."""
-    return instance
+def get_product_by_slug(slug):
+    """
+    Get detailed information for a single product by its slug, as serialized
+    by `ProductSchema`. The cached JSON payload is sent as-is, without loading
+    or serializing the product.
+    """
+    payload_json = product_service.get_product_by_slug_cached(slug)
+    if payload_json is None:
+        return jsonify({"status": "error", "message": "Product not found."}), 404
+    return current_app.response_class(payload_json, mimetype="application/json")
 
 
 @products_bp.route("/<int:product_id>/notify-me", methods=["POST"])
@@ -1,23 +1,26 @@
-import io
 import logging
 import os
 
 import magic
-from flask import current_app
+from flask import current_app, url_for
 from PIL import Image
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
 
 from backend.database import db
-from backend.models.asset_models import Asset
+from backend.models.asset_models import Asset, AssetBlob
 from backend.services.exceptions import (
     NotFoundException,
     ServiceError,
     ValidationException,
 )
 from backend.services.monitoring_service import MonitoringService
+from backend.utils.content_store import ContentStore
 
 # --- Constants for File Validation ---
 MAX_FILE_SIZE_BYTES = 25 * 1024 * 1024  # 25 MB
+MAX_IMAGE_PIXELS = 40_000_000
 ALLOWED_MIMETYPES = {
     "image/jpeg",
     "image/png",
@@ -28,6 +31,9 @@ ALLOWED_MIMETYPES = {
 
 logger = logging.getLogger(__name__)
 
+# INSERT ... ON CONFLICT DO NOTHING, for the shared blob rows.
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
 
 def _allowed_file(filename):
     """Helper function to check if the file extension is in the allowed list."""
@@ -48,11 +54,23 @@ class AssetService:
         os.makedirs(upload_folder, exist_ok=True)
         return upload_folder
 
+    @staticmethod
+    def get_content_store():
+        """Returns the content-addressed store holding asset blobs."""
+        return ContentStore(
+            current_app.config.get("ASSET_STORE_PATH")
+            or os.path.join(AssetService.get_upload_folder(), "assets")
+        )
+
     @staticmethod
     def _validate_and_sanitize_upload(file_storage):
         """
-        Validates the file's true MIME type and size, and sanitizes images.
-        Returns a sanitized, in-memory buffer of the file and its MIME type.
+        Validates the file's true MIME type and size, and checks image integrity.
+        Returns the file's stream and its MIME type.
+
+        Images are not re-encoded here: they are only ever served as derivatives,
+        which are rendered from decoded pixels (see `utils.content_store`), so
+        the original is never sent to clients as-is.
         """
         # 1. Check file size
         file_storage.seek(0, os.SEEK_END)
@@ -73,80 +91,167 @@ class AssetService:
                 f"Invalid file type '{mime_type}'. Allowed types are: {', '.join(ALLOWED_MIMETYPES)}"
             )
 
-        # 3. Sanitize image files to remove potential threats
+        # 3. Check image dimensions and integrity without decoding the bitmap:
+        # the size comes from the header, and verify() only walks the chunks.
         if mime_type.startswith("image/"):
+            max_pixels = current_app.config.get(
+                "MAX_UPLOAD_IMAGE_PIXELS", MAX_IMAGE_PIXELS
+            )
             try:
                 with Image.open(file_storage) as img:
-                    img.verify()  # Check for basic integrity
-
-                file_storage.seek(0)
-                with Image.open(file_storage) as img:
-                    sanitized_buffer = io.BytesIO()
-                    img_format = img.format or "JPEG"
-                    img.save(sanitized_buffer, format=img_format)
-                    sanitized_buffer.seek(0)
-
-                logger.info(f"Successfully sanitized image with MIME type {mime_type}.")
-                return sanitized_buffer, mime_type
+                    width, height = img.size
+                    if width * height > max_pixels:
+                        raise ValidationException(
+                            f"Image is too large ({width}x{height}). "
+                            f"Max {max_pixels // 1_000_000} megapixels."
+                        )
+                    img.verify()
+            except ValidationException:
+                raise
             except Exception as e:
-                logger.error(f"Failed to process or sanitize image: {e}", exc_info=True)
+                logger.error(f"Failed to validate image: {e}", exc_info=True)
                 raise ValidationException(
                     "The uploaded image file appears to be corrupted or invalid."
                 ) from e
+            finally:
+                file_storage.seek(0)
 
-        # For non-image files like PDFs, return the original buffer
         return file_storage.stream, mime_type
 
     @staticmethod
     def upload_asset(file_storage, folder="general"):
         """
-        Uploads a validated and sanitized asset to the configured storage.
+        Uploads a validated asset to the content-addressed store.
+
+        Identical files are stored once and shared by their assets: uploading
+        a file already known for the same `folder` returns the existing asset.
         """
         if not file_storage or not file_storage.filename:
             raise ValidationException("No file provided or file has no name.")
 
-        sanitized_buffer, mime_type = AssetService._validate_and_sanitize_upload(
-            file_storage
-        )
-        filename = secure_filename(file_storage.filename)
+        stream, mime_type = AssetService._validate_and_sanitize_upload(file_storage)
+        store = AssetService.get_content_store()
+        digest, size, _ = store.put(stream)
+
+        # Deletions of the digest's last asset remove the blob under this
+        # lock; once held, the blob cannot disappear before our commit.
+        AssetService._lock_blob(digest, size)
+        if not store.exists(digest):
+            stream.seek(0)
+            store.put(stream)
 
-        # Placeholder for storage logic (e.g., saving to S3 or local disk)
-        # MUST use the 'sanitized_buffer' from this point on.
-        mock_url = f"https://cdn.maison-truvra.com/{folder}/{filename}"
-        logger.info(
-            f"Successfully processed and 'uploaded' file {filename} to {mock_url}"
+        existing = Asset.query.filter_by(content_hash=digest, usage_tag=folder).first()
+        if existing:
+            db.session.commit()
+            logger.info(f"Upload of {file_storage.filename} deduplicated to {digest}.")
+            return existing
+
+        filename = secure_filename(file_storage.filename)
+        asset = Asset(
+            filename=f"{digest[:12]}-{secure_filename(folder)}-{filename}",
+            url=AssetService.get_asset_url(digest, mime_type),
+            mime_type=mime_type,
+            usage_tag=folder,
+            content_hash=digest,
+            size_bytes=size,
         )
-        return {"url": mock_url}
+        try:
+            db.session.add(asset)
+            db.session.commit()
+        except IntegrityError as e:
+            # A concurrent upload of the same file won the race.
+            db.session.rollback()
+            existing = Asset.query.filter_by(
+                content_hash=digest, usage_tag=folder
+            ).first()
+            if existing:
+                return existing
+            raise ServiceError("Could not save asset.") from e
+        except Exception as e:
+            # The blob is left in place: other assets may share it.
+            db.session.rollback()
+            raise ServiceError("Could not save asset.") from e
+
+        logger.info(f"Stored asset {filename} as {digest} ({size} bytes).")
+        return asset
+
+    @staticmethod
+    def get_asset_url(digest, mime_type, variant="full", fmt=None):
+        """
+        Public URL of an asset. Images are served as derivatives (`variant` is
+        one of thumb, card, zoom or full; without `fmt` the best format the
+        browser accepts is picked), other files as stored.
+        """
+        if not mime_type.startswith("image/"):
+            return url_for("assets.get_asset_file", digest=digest)
+        if fmt:
+            return url_for(
+                "assets.get_asset_derivative", digest=digest, variant=variant, fmt=fmt
+            )
+        return url_for("assets.get_asset_variant", digest=digest, variant=variant)
 
     @staticmethod
     def delete_asset(asset_id):
-        """Deletes an asset from the filesystem and database."""
+        """
+        Deletes an asset, and its file once no other asset shares the blob.
+        """
         asset = Asset.query.get(asset_id)
         if not asset:
             raise NotFoundException("Asset not found.")
 
-        upload_folder = AssetService.get_upload_folder()
-        file_path = os.path.join(upload_folder, asset.filename)
+        filename = asset.filename
+        file_path = os.path.join(AssetService.get_upload_folder(), filename)
+        digest = asset.content_hash
 
         try:
-            if os.path.exists(file_path):
+            blob = AssetService._lock_blob(digest) if digest else None
+            db.session.delete(asset)
+            db.session.flush()
+            if digest:
+                shared = db.session.query(
+                    Asset.query.filter_by(content_hash=digest).exists()
+                ).scalar()
+                if not shared:
+                    if blob is not None:
+                        db.session.delete(blob)
+                        db.session.flush()
+                    # Still under the blob lock: no upload can reference it.
+                    AssetService.get_content_store().delete(digest)
+            elif os.path.exists(file_path):
                 os.remove(file_path)
 
-            db.session.delete(asset)
             db.session.commit()
-            MonitoringService.log_info(
-                f"Deleted asset: {asset.filename}", "AssetService"
-            )
+            MonitoringService.log_info(f"Deleted asset: {filename}", "AssetService")
             return True
         except Exception as e:
             db.session.rollback()
             MonitoringService.log_error(
-                f"Failed to delete asset {asset.filename}: {e}",
+                f"Failed to delete asset {filename}: {e}",
                 "AssetService",
                 exc_info=True,
             )
             raise ServiceError("Could not delete asset.") from e
 
+    @staticmethod
+    def _lock_blob(digest, size=None):
+        """
+        Locks the AssetBlob row of `digest` until the end of the transaction,
+        creating it first when `size` is given. Returns the row, or None.
+        """
+        if size is not None:
+            dialect = db.session.get_bind().dialect.name
+            db.session.execute(
+                _UPSERT_INSERTS[dialect](AssetBlob)
+                .values(content_hash=digest, size_bytes=size)
+                .on_conflict_do_nothing(index_elements=["content_hash"])
+            )
+        return (
+            db.session.query(AssetBlob)
+            .filter_by(content_hash=digest)
+            .with_for_update()
+            .first()
+        )
+
     @staticmethod
     def get_all_assets():
         """Retrieves all assets from the database."""
@@ -5,6 +5,7 @@ from backend.database import db
 from backend.models.admin_audit_models import AdminAuditLog
 from backend.models.user_models import User
 from backend.services.monitoring_service import MonitoringService
+from backend.utils.pagination import keyset_paginate
 
 
 class AuditLogService:
@@ -42,9 +43,13 @@ class AuditLogService:
             )
 
     @staticmethod
-    def get_logs(page=1, per_page=20, date_filter=None):
+    def get_logs(page=1, per_page=20, date_filter=None, cursor=None, with_total=False):
         """
         Retrieves paginated audit log entries, optionally filtering by date.
+
+        Passing a `cursor` (an empty string for the first page) uses keyset
+        pagination instead of OFFSET; the total is then only counted when
+        `with_total` is set.
         """
         try:
             query = (
@@ -62,6 +67,20 @@ class AuditLogService:
                 except ValueError:
                     pass
 
+            if cursor is not None:
+                logs_page = keyset_paginate(
+                    query,
+                    AdminAuditLog.id,
+                    AdminAuditLog.id,
+                    cursor=cursor,
+                    per_page=per_page,
+                    with_total=with_total,
+                )
+                return {
+                    "logs": [log.to_dict() for log in logs_page.items],
+                    **logs_page.to_dict(),
+                }
+
             paginated_logs = query.paginate(
                 page=page, per_page=per_page, error_out=False
             )
@@ -4,6 +4,7 @@ from sqlalchemy.exc import SQLAlchemyError
 from backend.database import db
 from backend.models import B2BAccount, Tier, User
 from backend.services.exceptions import ServiceError, ServiceException
+from backend.utils.cache_helpers import clear_cart_cache
 
 
 class B2BService:
@@ -212,6 +213,7 @@ class B2BService:
 
         user.tier_id = tier_id
         db.session.commit()
+        clear_cart_cache(user_id)
         current_app.logger.info(f"Assigned tier '{tier.name}' to user {user.email}.")
         return user
 
@@ -242,5 +244,6 @@ class B2BService:
             )
             user.tier_id = applicable_tier.id
             db.session.commit()
+            clear_cart_cache(user_id)
 
         return user
@@ -10,7 +10,7 @@ import bleach
 from flask import current_app
 from sqlalchemy.orm import Session
 
-from ..extensions import cache, db
+from ..extensions import cache, db, tiered_cache
 from ..models import BlogCategory, BlogPost
 from ..services.exceptions import NotFoundException, ValidationException
 from ..utils.cache_helpers import (
@@ -147,16 +147,17 @@ class BlogService:
 
     def get_all_articles(self):
         """Retrieves all blog posts, using cache."""
-        cache_key = get_blog_post_list_key()
-        posts = cache.get(cache_key)
-        if posts is None:
-            posts = (
+
+        def load_posts():
+            return (
                 self.db.session.query(BlogPost)
                 .order_by(BlogPost.created_at.desc())
                 .all()
             )
-            cache.set(cache_key, posts, timeout=3600)
-        return posts
+
+        return tiered_cache.get_or_set(
+            get_blog_post_list_key(), load_posts, timeout=3600
+        )
 
     def get_article_by_id(self, article_id: int) -> BlogPost:
         """
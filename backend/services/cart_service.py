@@ -5,6 +5,7 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
 
 from backend.database import db
+from backend.extensions import cache
 from backend.models import (
     Cart,
     CartItem,
@@ -21,6 +22,16 @@ from backend.services.exceptions import (
     ValidationException,
 )
 from backend.services.inventory_service import InventoryService
+from backend.utils.cache_helpers import (
+    PRODUCTS_TAG,
+    clear_cart_cache,
+    get_cart_snapshot_key,
+    get_tag_generations,
+    product_tag,
+)
+
+# Seconds a priced cart snapshot is kept; changes invalidate it before then.
+CART_SNAPSHOT_TIMEOUT = 3600
 
 
 class CartService:
@@ -28,6 +39,7 @@ class CartService:
 
     def __init__(self, logger=None):
         self.logger = logger or logging.getLogger(__name__)
+        self.inventory_service = InventoryService(self.logger)
 
     def _get_or_create_cart(self, user_id: int) -> Cart:
         """Private helper to retrieve a user's cart, creating one if it doesn't exist."""
@@ -46,7 +58,36 @@ class CartService:
         """
         Retrieves full cart details for a user, applying B2B tiered pricing if applicable.
         This is the primary method for fetching the current state of a user's cart.
+
+        The priced result is cached per cart version (see `clear_cart_cache`),
+        along with the generations of its products' cache tags, so a price
+        change also invalidates it. Only the first read after a change pays
+        for loading and pricing.
         """
+        key = get_cart_snapshot_key(user_id)
+        snapshot = cache.get(key)
+        if snapshot is not None and (
+            get_tag_generations(*snapshot["tags"]) == snapshot["generations"]
+        ):
+            return snapshot["details"]
+
+        details = self._price_cart(user_id)
+        tags = [PRODUCTS_TAG] + [
+            product_tag(item["product_id"]) for item in details["items"]
+        ]
+        cache.set(
+            key,
+            {
+                "details": details,
+                "tags": tags,
+                "generations": get_tag_generations(*tags),
+            },
+            timeout=CART_SNAPSHOT_TIMEOUT,
+        )
+        return details
+
+    def _price_cart(self, user_id: int) -> dict:
+        """Loads the user's active cart and prices each line."""
         user = User.query.options(
             joinedload(User.tier),
             joinedload(User.carts).joinedload(Cart.items).joinedload(CartItem.product),
@@ -132,7 +173,7 @@ class CartService:
         cart = self._get_or_create_cart(user_id)
 
         # Reserve stock before making changes
-        InventoryService.reserve_stock(product_id, quantity, user_id)
+        self.inventory_service.reserve_stock(product_id, quantity, user_id)
 
         try:
             cart_item = CartItem.query.filter_by(
@@ -151,6 +192,7 @@ class CartService:
                 db.session.add(cart_item)
 
             db.session.commit()
+            clear_cart_cache(user_id)
             self.logger.info(
                 f"Added {quantity} of product {product_id} to cart for user {user_id}."
             )
@@ -158,7 +200,7 @@ class CartService:
         except Exception as e:
             db.session.rollback()
             # Release stock if cart operation fails
-            InventoryService.release_stock(product_id, quantity, user_id)
+            self.inventory_service.release_stock(product_id, quantity, user_id)
             self.logger.error(
                 f"Failed to add item to cart for user {user_id}: {e}", exc_info=True
             )
@@ -186,16 +228,17 @@ class CartService:
 
         try:
             if quantity_diff > 0:
-                InventoryService.reserve_stock(
+                self.inventory_service.reserve_stock(
                     cart_item.product_id, quantity_diff, user_id
                 )
             else:  # quantity_diff < 0
-                InventoryService.release_stock(
+                self.inventory_service.release_stock(
                     cart_item.product_id, -quantity_diff, user_id
                 )
 
             cart_item.quantity = new_quantity
             db.session.commit()
+            clear_cart_cache(user_id)
             self.logger.info(
                 f"Updated cart item {item_id} to quantity {new_quantity} for user {user_id}."
             )
@@ -225,8 +268,11 @@ class CartService:
 
         try:
             db.session.delete(cart_item)
-            InventoryService.release_stock(product_id, quantity_to_release, user_id)
+            self.inventory_service.release_stock(
+                product_id, quantity_to_release, user_id
+            )
             db.session.commit()
+            clear_cart_cache(user_id)
             self.logger.info(f"Removed item {item_id} from cart for user {user_id}.")
             return cart
         except Exception as e:
@@ -248,6 +294,7 @@ class CartService:
             )
             CartItem.query.filter_by(cart_id=cart.id).delete(synchronize_session=False)
             db.session.commit()
+            clear_cart_cache(user_id)
             self.logger.info(f"Cart and reservations cleared for user {user_id}.")
             return True
         except Exception as e:
@@ -277,6 +324,7 @@ class CartService:
             )
             db.session.add(new_item)
             db.session.commit()
+            clear_cart_cache(user_id)
             self.logger.info(f"Added reward {reward_id} to cart for user {user_id}.")
             return cart
         except IntegrityError as e:
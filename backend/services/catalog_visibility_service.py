@@ -0,0 +1,209 @@
+"""
+Service layer for the precomputed catalog visibility index.
+
+Which products a shopper may see depends only on their audience (B2C or B2B)
+and their loyalty tier. Instead of re-evaluating the visibility flags and the
+`product_tier_visibility` restrictions for every single-product check, the
+set of visible product IDs is computed once per (audience, tier) pair and
+stored in Redis as a set, which answers a check with one SISMEMBER.
+
+When a product's visibility changes, the cached sets are patched: the product
+is added to or removed from each of them by a Lua script. SADD and SREM are
+atomic, so concurrent refreshes of different products never overwrite each
+other, unlike a read-modify-write of a cached array. Sets that are not
+built yet are left alone; each set holds the `BUILT_MARKER` member once built.
+
+Listings filter with `visibility_filter`, an EXISTS subquery evaluated by the
+database next to the listing's other filters and pagination, rather than an
+IN list that would grow with the catalog.
+"""
+
+from flask import current_app
+from sqlalchemy import and_, exists, or_
+
+from ..extensions import db, redis_client
+from ..models.b2b_loyalty_models import LoyaltyTier
+from ..models.product_models import Product, product_tier_visibility
+from ..utils.cache_helpers import get_catalog_visibility_key
+
+AUDIENCE_B2C = "b2c"
+AUDIENCE_B2B = "b2b"
+
+# The sets are patched on writes; the timeout is only a safety net against
+# drift from writes that bypass the service layer.
+VISIBILITY_INDEX_TIMEOUT = 86400
+
+# Member of every built set; product IDs start at 1.
+BUILT_MARKER = 0
+
+# KEYS: visibility sets; ARGV[1]: product ID; ARGV[i + 1]: "1" if the product
+# is visible in KEYS[i]. Sets that are not built are skipped.
+PATCH_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    if redis.call('SISMEMBER', key, '0') == 1 then
+        if ARGV[i + 1] == '1' then
+            redis.call('SADD', key, ARGV[1])
+        else
+            redis.call('SREM', key, ARGV[1])
+        end
+    end
+end
+return 0
+"""
+
+
+class CatalogVisibilityService:
+    """
+    Maintains and queries the per-audience catalog visibility index.
+    """
+
+    _patch_script = None
+
+    @staticmethod
+    def get_audience(user=None):
+        """
+        Returns the (audience, tier_id) pair that determines what `user` can see.
+        Anonymous users are treated as B2C shoppers without a tier.
+        """
+        audience = AUDIENCE_B2B if getattr(user, "is_b2b", False) else AUDIENCE_B2C
+        loyalty = getattr(user, "loyalty", None) if user else None
+        tier_id = str(loyalty.tier_id) if loyalty and loyalty.tier_id else None
+        return audience, tier_id
+
+    @staticmethod
+    def is_visible(product_id: int, user=None) -> bool:
+        """
+        Checks a single product against the visibility index, building the
+        index of the user's audience on a miss.
+        """
+        audience, tier_id = CatalogVisibilityService.get_audience(user)
+        cache_key = get_catalog_visibility_key(audience, tier_id)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.sismember(cache_key, BUILT_MARKER)
+        pipe.sismember(cache_key, product_id)
+        built, visible = pipe.execute()
+        if built:
+            return bool(visible)
+
+        current_app.logger.debug(
+            f"Cache miss for catalog visibility ({audience}, {tier_id})."
+        )
+        product_ids = CatalogVisibilityService._build_index(audience, tier_id)
+        pipe = redis_client.pipeline()
+        pipe.delete(cache_key)
+        pipe.sadd(cache_key, BUILT_MARKER, *product_ids)
+        pipe.expire(cache_key, VISIBILITY_INDEX_TIMEOUT)
+        pipe.execute()
+        return product_id in product_ids
+
+    @staticmethod
+    def visibility_filter(user=None):
+        """
+        Returns the SQL condition selecting the products visible to `user`,
+        for listing queries.
+        """
+        audience, tier_id = CatalogVisibilityService.get_audience(user)
+        flag = (
+            Product.is_b2b_visible
+            if audience == AUDIENCE_B2B
+            else Product.is_b2c_visible
+        )
+        restricted = exists().where(product_tier_visibility.c.product_id == Product.id)
+        allowed = ~restricted
+        if tier_id is not None:
+            allowed = or_(
+                allowed,
+                exists().where(
+                    product_tier_visibility.c.product_id == Product.id,
+                    product_tier_visibility.c.tier_id == tier_id,
+                ),
+            )
+        return and_(flag.is_(True), Product.is_deleted.is_(False), allowed)
+
+    @staticmethod
+    def refresh_product(product_id: int):
+        """
+        Patches every built index after a product's visibility flags, tier
+        restrictions or deletion state changed. Call after the commit.
+        """
+        product = db.session.get(Product, product_id)
+        restricted_tiers = set()
+        if product is not None:
+            restricted_tiers = {
+                str(tier_id)
+                for (tier_id,) in db.session.query(
+                    product_tier_visibility.c.tier_id
+                ).filter(product_tier_visibility.c.product_id == product_id)
+            }
+
+        keys, flags = [], []
+        for audience, tier_id in CatalogVisibilityService._all_audiences():
+            keys.append(get_catalog_visibility_key(audience, tier_id))
+            visible = product is not None and CatalogVisibilityService._is_visible_to(
+                product, restricted_tiers, audience, tier_id
+            )
+            flags.append(1 if visible else 0)
+        CatalogVisibilityService._get_patch_script()(
+            keys=keys, args=[product_id, *flags]
+        )
+
+    # --- Internal helpers ---
+
+    @staticmethod
+    def _get_patch_script():
+        if CatalogVisibilityService._patch_script is None:
+            CatalogVisibilityService._patch_script = redis_client.register_script(
+                PATCH_SCRIPT
+            )
+        return CatalogVisibilityService._patch_script
+
+    @staticmethod
+    def _all_audiences():
+        """Yields every (audience, tier_id) pair an index may exist for."""
+        tier_ids = [None] + [
+            str(tier_id) for (tier_id,) in db.session.query(LoyaltyTier.id)
+        ]
+        for audience in (AUDIENCE_B2C, AUDIENCE_B2B):
+            for tier_id in tier_ids:
+                yield audience, tier_id
+
+    @staticmethod
+    def _is_visible_to(product, restricted_tiers, audience, tier_id) -> bool:
+        if product.is_deleted:
+            return False
+        flag = (
+            product.is_b2b_visible
+            if audience == AUDIENCE_B2B
+            else product.is_b2c_visible
+        )
+        if not flag:
+            return False
+        return not restricted_tiers or tier_id in restricted_tiers
+
+    @staticmethod
+    def _build_index(audience, tier_id):
+        """Computes the set of visible product IDs with two queries."""
+        flag = (
+            Product.is_b2b_visible
+            if audience == AUDIENCE_B2B
+            else Product.is_b2c_visible
+        )
+        candidate_ids = [
+            product_id
+            for (product_id,) in db.session.query(Product.id).filter(
+                flag.is_(True), Product.is_deleted.is_(False)
+            )
+        ]
+
+        # Group tier restrictions per product so each product is decided in memory.
+        restrictions = {}
+        for product_id, restricted_tier_id in db.session.query(
+            product_tier_visibility.c.product_id, product_tier_visibility.c.tier_id
+        ):
+            restrictions.setdefault(product_id, set()).add(str(restricted_tier_id))
+
+        return {
+            product_id
+            for product_id in candidate_ids
+            if product_id not in restrictions or tier_id in restrictions[product_id]
+        }
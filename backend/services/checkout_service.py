@@ -14,27 +14,29 @@ from backend.models import (
     DiscountType,
     Order,
     OrderItem,
-    Product,
     db,
 )
 from backend.models.cart_models import Cart, CartItem
 from backend.models.delivery_models import DeliveryOption
 from backend.models.order_models import Order, OrderItem
-from backend.models.product_models import Product
 from backend.models.user_models import UserType
 from backend.services.address_service import AddressService
-from backend.services.background_task_service import BackgroundTaskService
 from backend.services.discount_service import DiscountService
 from backend.services.email_service import EmailService
-from backend.services.inventory_service import InventoryService
+from backend.services.inventory_service import (
+    InventoryService,
+    quantities_by_product,
+)
 from backend.services.loyalty_service import (
     LoyaltyService,
 )
+from backend.services.outbox_service import OutboxService
 
 # from backend.services.payment_service import PaymentService
 from backend.services.pdf_service import PDFService
 from backend.services.referral_service import ReferralService
 from backend.services.user_service import UserService
+from backend.utils.cache_helpers import clear_cart_cache
 
 from .exceptions import (
     CartEmptyError,
@@ -55,7 +57,6 @@ class CheckoutService:
         self.discount_service = DiscountService(logger)
         #        self.payment_service = PaymentService(logger)
         self.pdf_service = PDFService(logger)
-        self.background_task_service = BackgroundTaskService(logger)
         self.user_service = UserService(logger)
         self.address_service = AddressService(logger)
         self.referral_service = ReferralService(logger)
@@ -105,14 +106,13 @@ class CheckoutService:
 
         # Core order creation logic
         try:
-            # Stock Validation
-            for item in cart.items:
-                if not self.inventory_service.check_stock(
-                    item.product_id, item.quantity
-                ):
-                    raise InsufficientStockError(
-                        f"Insufficient stock for product: {item.product.name}"
-                    )
+            # Lock and take the stock of every line at once, before payment
+            self.inventory_service.reserve_many(
+                quantities_by_product(
+                    (item.product_id, item.quantity) for item in cart.items
+                ),
+                user_id=user.id,
+            )
 
             # Payment Processing
             total_price = self.loyalty_service.calculate_total(cart)
@@ -150,7 +150,6 @@ class CheckoutService:
                     price=price,
                 )
                 db.session.add(order_item)
-                self.inventory_service.decrease_stock(item.product_id, item.quantity)
 
             if cart.discount_id:
                 self.discount_service.record_discount_usage(cart.discount_id)
@@ -158,18 +157,18 @@ class CheckoutService:
             if not user.is_guest:
                 self.loyalty_service.add_points(user.id, total_price)
                 if is_first_order:
-                    self.background_task_service.submit_task(
-                        self.referral_service.complete_referral_after_first_order,
+                    OutboxService.enqueue(
+                        "tasks.complete_referral",
                         user.id,
+                        dedup_key=f"complete-referral:{user.id}",
                     )
 
             # Clear the cart
             db.session.delete(cart)
+            self._enqueue_order_confirmation(order)
             db.session.commit()
+            clear_cart_cache(user.id)
 
-            self.background_task_service.submit_task(
-                self.send_order_confirmation, order.id
-            )
             self.logger.info(
                 f"Order {order.id} created successfully for user {user.id}."
             )
@@ -185,6 +184,15 @@ class CheckoutService:
             self.logger.error(f"Checkout failed for user {user.id}: {e}")
             raise CheckoutError(f"Checkout failed: {e}") from e
 
+    @staticmethod
+    def _enqueue_order_confirmation(order):
+        """Queues the confirmation email in the order's transaction."""
+        OutboxService.enqueue(
+            "tasks.send_checkout_confirmation",
+            str(order.id),
+            dedup_key=f"order-confirmation:{order.id}",
+        )
+
     def send_order_confirmation(self, order_id):
         # This method remains largely the same, but now correctly handles all user types
         try:
@@ -284,15 +292,13 @@ class CheckoutService:
             if not cart or not cart.items:
                 raise CartEmptyError("Cannot create an order from an empty cart.")
 
-            # Validate stock before creating the order
-            for item in cart.items:
-                if not self.inventory_service.check_stock(
-                    item.product_id, item.quantity
-                ):
-                    product = db.session.query(Product).get(item.product_id)
-                    raise InsufficientStockError(
-                        f"Insufficient stock for product: {product.name}"
-                    )
+            # Lock and take the stock of every line at once, before payment
+            self.inventory_service.reserve_many(
+                quantities_by_product(
+                    (item.product_id, item.quantity) for item in cart.items
+                ),
+                user_id=user_id,
+            )
 
             # Process payment
             total_price = self.calculate_total(cart)
@@ -316,7 +322,7 @@ class CheckoutService:
             db.session.add(order)
             db.session.flush()
 
-            # Create order items and update inventory
+            # Create order items
             for item in cart.items:
                 order_item = OrderItem(
                     order_id=order.id,
@@ -325,7 +331,6 @@ class CheckoutService:
                     price=item.product.price,
                 )
                 db.session.add(order_item)
-                self.inventory_service.decrease_stock(item.product_id, item.quantity)
 
             if cart.discount_id:
                 self.discount_service.record_discount_usage(cart.discount_id)
@@ -339,12 +344,10 @@ class CheckoutService:
             for item in cart.items:
                 db.session.delete(item)
             db.session.delete(cart)
+            self._enqueue_order_confirmation(order)
 
             db.session.commit()
-
-            self.background_task_service.submit_task(
-                self.send_order_confirmation, order.id
-            )
+            clear_cart_cache(user_id)
 
             self.logger.info(
                 f"Order {order.id} created successfully for user {user_id}."
@@ -392,15 +395,13 @@ class CheckoutService:
             if not cart or not cart.items:
                 raise CartEmptyError("Cannot create an order from an empty cart.")
 
-            # Validate stock before creating the order
-            for item in cart.items:
-                if not self.inventory_service.check_stock(
-                    item.product_id, item.quantity
-                ):
-                    product = db.session.query(Product).get(item.product_id)
-                    raise InsufficientStockError(
-                        f"Insufficient stock for product: {product.name}"
-                    )
+            # Lock and take the stock of every line at once, before payment
+            self.inventory_service.reserve_many(
+                quantities_by_product(
+                    (item.product_id, item.quantity) for item in cart.items
+                ),
+                user_id=user_id,
+            )
 
             # Process payment
             total_price = self.calculate_total(cart)
@@ -424,7 +425,7 @@ class CheckoutService:
             db.session.add(order)
             db.session.flush()  # Flush to get the order ID
 
-            # Create order items and update inventory
+            # Create order items
             for item in cart.items:
                 order_item = OrderItem(
                     order_id=order.id,
@@ -433,7 +434,6 @@ class CheckoutService:
                     price=item.product.price,
                 )
                 db.session.add(order_item)
-                self.inventory_service.decrease_stock(item.product_id, item.quantity)
 
             # Record discount usage and add loyalty points
             if cart.discount_id:
@@ -443,12 +443,10 @@ class CheckoutService:
 
             # Clear the cart
             db.session.delete(cart)
+            # Send order confirmation email once the order is committed
+            self._enqueue_order_confirmation(order)
             db.session.commit()
-
-            # Send order confirmation email
-            self.background_task_service.submit_task(
-                self.send_order_confirmation, order.id
-            )
+            clear_cart_cache(user_id)
 
             self.logger.info(
                 f"Order {order.id} created successfully for user {user_id}."
@@ -524,6 +522,7 @@ class CheckoutService:
 
             cart.discount_id = discount.id
             db.session.commit()
+            clear_cart_cache(cart.user_id)
             self.logger.info(f"Discount '{discount_code}' applied to cart {cart_id}.")
             return cart
         except (SQLAlchemyError, ValueError) as e:
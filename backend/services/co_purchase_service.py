@@ -0,0 +1,143 @@
+"""
+Service layer for the offline "customers also bought" co-purchase matrix.
+
+A Celery job folds the orders placed since the last watermark into the matrix,
+precomputes every product's neighbours and publishes a memory-mapped snapshot.
+Web workers open the snapshot lazily and reopen it when the shared version
+counter moves, so serving recommendations never touches the database.
+"""
+
+import os
+import threading
+import uuid
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import and_, or_
+
+from ..extensions import cache, db, tiered_cache
+from ..models.order_models import Order, OrderItem
+from ..utils.cache_helpers import get_co_purchase_version_key
+from ..utils.co_purchase_matrix import CoPurchaseMatrix
+
+# Orders are read in batches of this many rows while folding them in.
+ORDER_BATCH_SIZE = 5000
+
+
+class CoPurchaseService:
+    """
+    Builds, incrementally updates and queries the co-purchase matrix.
+    """
+
+    _matrix = None
+    _version = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_neighbours(product_id: int, limit: int = 5):
+        """
+        Returns the IDs of the products most often bought with `product_id`,
+        best first, or None if no matrix has been built yet.
+        """
+        matrix = CoPurchaseService._get_matrix()
+        if matrix is None:
+            return None
+        return [
+            neighbour_id for neighbour_id, _ in matrix.neighbours(product_id, limit)
+        ]
+
+    @staticmethod
+    def update(full: bool = False):
+        """
+        Folds the orders placed since the last watermark into the matrix,
+        recomputes neighbours and publishes a new snapshot.
+
+        Args:
+            full: Ignore the existing snapshot and rebuild from every order.
+        """
+        path = CoPurchaseService._snapshot_path()
+        matrix = None if full else CoPurchaseMatrix.load(path, mmap=False)
+        normalization = current_app.config.get("CO_PURCHASE_NORMALIZATION", "cosine")
+        if matrix is None:
+            matrix = CoPurchaseMatrix.empty(normalization=normalization)
+
+        baskets, watermark = CoPurchaseService._baskets_since(matrix.watermark)
+        matrix = matrix.add_baskets(baskets, watermark=watermark)
+        matrix = matrix.with_neighbours(
+            k=current_app.config.get("CO_PURCHASE_TOP_K", 20),
+            normalization=normalization,
+            min_count=current_app.config.get("CO_PURCHASE_MIN_COUNT", 1),
+        )
+        matrix.save(path)
+        cache.inc(get_co_purchase_version_key())
+        tiered_cache.invalidate(get_co_purchase_version_key())
+        current_app.logger.info(
+            f"Co-purchase matrix updated: {len(matrix)} products, "
+            f"{matrix.n_orders} orders."
+        )
+        return matrix
+
+    # --- Internal helpers ---
+
+    @staticmethod
+    def _baskets_since(watermark):
+        """
+        Returns the baskets of orders after `watermark` in (created_at, id)
+        order, and the watermark of the last one.
+        """
+        query = (
+            db.session.query(Order.created_at, Order.id, OrderItem.product_id)
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .filter(Order.is_deleted.is_(False))
+        )
+        if watermark:
+            last_created_at = datetime.fromisoformat(watermark["created_at"])
+            last_id = uuid.UUID(watermark["order_id"])
+            query = query.filter(
+                or_(
+                    Order.created_at > last_created_at,
+                    and_(Order.created_at == last_created_at, Order.id > last_id),
+                )
+            )
+        rows = query.order_by(Order.created_at, Order.id).yield_per(ORDER_BATCH_SIZE)
+
+        baskets = []
+        current_order = None
+        for created_at, order_id, product_id in rows:
+            if order_id != current_order:
+                baskets.append([])
+                current_order = order_id
+                watermark = {
+                    "created_at": created_at.isoformat(),
+                    "order_id": str(order_id),
+                }
+            baskets[-1].append(product_id)
+        return baskets, watermark
+
+    @staticmethod
+    def _snapshot_path() -> str:
+        return current_app.config.get("CO_PURCHASE_MATRIX_PATH") or os.path.join(
+            current_app.instance_path, "co_purchase_matrix"
+        )
+
+    @staticmethod
+    def _get_matrix():
+        """
+        Returns this worker's memory-mapped matrix, reopening the snapshot when
+        a newer one was published.
+        """
+        remote_version = tiered_cache.get(get_co_purchase_version_key())
+        matrix = CoPurchaseService._matrix
+        if matrix is not None and remote_version == CoPurchaseService._version:
+            return matrix
+
+        with CoPurchaseService._lock:
+            if (
+                CoPurchaseService._matrix is None
+                or remote_version != CoPurchaseService._version
+            ):
+                CoPurchaseService._matrix = CoPurchaseMatrix.load(
+                    CoPurchaseService._snapshot_path()
+                )
+                CoPurchaseService._version = remote_version
+            return CoPurchaseService._matrix
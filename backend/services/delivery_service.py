@@ -3,7 +3,7 @@ Service layer for managing delivery methods, including caching and audit logging
 """
 
 from .. import db
-from ..extensions import cache
+from ..extensions import tiered_cache
 from ..models.b2b_loyalty_models import LoyaltyTier
 from ..models.delivery_models import DeliveryMethod
 from ..models.user_models import User
@@ -35,17 +35,18 @@ class DeliveryService:
         This is ideal for public-facing parts of the site where performance
         is key and data changes infrequently.
         """
-        cache_key = get_delivery_methods_key()
-        methods = cache.get(cache_key)
-        if methods is None:
-            methods = (
+
+        def load_methods():
+            return (
                 DeliveryMethod.query.filter_by(is_active=True)
                 .order_by(DeliveryMethod.price)
                 .all()
             )
-            # Cache for 24 hours as this data is not expected to change often.
-            cache.set(cache_key, methods, timeout=86400)
-        return methods
+
+        # Cache for 24 hours as this data is not expected to change often.
+        return tiered_cache.get_or_set(
+            get_delivery_methods_key(), load_methods, timeout=86400
+        )
 
     @staticmethod
     def get_available_methods_for_user(user_id: int):
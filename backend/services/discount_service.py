@@ -10,6 +10,7 @@ from backend.services.exceptions import (
     DiscountInvalidException,
     NotFoundException,
 )
+from backend.utils.cache_helpers import clear_cart_cache
 
 logger = logging.getLogger(__name__)
 CACHE_TTL_SECONDS = 600
@@ -219,6 +220,7 @@ class DiscountService:
         user.tier = tier
         user.tier_override = True  # Manual assignment overrides automated logic
         db.session.commit()
+        clear_cart_cache(user_id)  # Cart prices depend on the tier
         return user
 
     # --- Custom Discount Management (Now for all users) ---
@@ -0,0 +1,520 @@
+"""
+Redis-resident stock counters for hot products (limited drops, flash sales).
+
+Reserving stock normally locks the product's `Inventory` row, so during a drop
+every add-to-cart for that product waits on the same row. In hot mode the
+product's claimable stock lives in Redis instead and reservations are atomic
+Lua scripts, which never touch Postgres:
+
+    hot_stock:{<product_id>}:available   units that can still be reserved
+    hot_stock:{<product_id>}:holds       hash, holder -> units in their cart
+    hot_stock:{<product_id>}:expiry      zset, holder -> hold deadline (epoch
+                                         seconds)
+    hot_stock:{<product_id>}:delta       units reserved (net of releases) and
+                                         not yet written to the database
+
+Reserved units are taken out of `Inventory.quantity` by the reconciler, a
+Celery task that writes the deltas of all hot products back in one
+transaction, with one `StockMovement` per product. Like database
+reservations, a hold lasts RESERVATION_LIFETIME_MINUTES from the holder's
+last reservation; the reconciler returns expired holds to the counter first. Checkout consumes the
+buyer's hold (see `InventoryService.reserve_many`) and decrements the row
+itself, so a consumed hold leaves the delta.
+
+With the rows locked, the reconciler also checks that the row's
+`available_quantity`, less the delta, equals the Redis counter. A
+difference (a restock, or a checkout rolled back after consuming a hold) is
+logged and the Redis counter is corrected: the database remains the source of
+truth.
+
+Any Redis error sends callers back to the database path. Until the next
+reconciliation, that path does not see the units reserved in Redis since the
+last one, so keep HOT_STOCK_RECONCILE_SECONDS short.
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from redis.exceptions import RedisError
+from sqlalchemy import bindparam, insert, update
+
+from ..database import db
+from ..extensions import cache, redis_client
+from ..models import Inventory, InventoryReservation, StockMovement
+
+logger = logging.getLogger(__name__)
+
+HOT_PRODUCTS_KEY = "hot_stock:products"
+RESERVE_REASON = "Hot stock reservations"
+# Errors a Redis call can raise; AttributeError: the client is not initialised.
+REDIS_ERRORS = (RedisError, OSError, AttributeError)
+
+# KEYS: available, holds, delta, expiry. ARGV[1]: holder, ARGV[2]: units,
+# ARGV[3]: the hold's new deadline.
+# Returns -1 if the product is not hot, 0 if there is not enough stock, else 1.
+RESERVE_SCRIPT = """
+local available = redis.call("GET", KEYS[1])
+if not available then
+    return -1
+end
+local units = tonumber(ARGV[2])
+if tonumber(available) < units then
+    return 0
+end
+redis.call("DECRBY", KEYS[1], units)
+redis.call("HINCRBY", KEYS[2], ARGV[1], units)
+redis.call("ZADD", KEYS[4], ARGV[3], ARGV[1])
+redis.call("INCRBY", KEYS[3], units)
+return 1
+"""
+
+# KEYS: available, holds, delta, expiry. ARGV[1]: holder, ARGV[2]: units, or
+# -1 for the whole hold. Returns -1 if the product is not hot, else the units released.
+RELEASE_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return -1
+end
+local held = tonumber(redis.call("HGET", KEYS[2], ARGV[1]) or "0")
+local units = tonumber(ARGV[2])
+if units < 0 or units > held then
+    units = held
+end
+if units == 0 then
+    return 0
+end
+if held > units then
+    redis.call("HINCRBY", KEYS[2], ARGV[1], -units)
+else
+    redis.call("HDEL", KEYS[2], ARGV[1])
+    redis.call("ZREM", KEYS[4], ARGV[1])
+end
+redis.call("INCRBY", KEYS[1], units)
+redis.call("DECRBY", KEYS[3], units)
+return units
+"""
+
+# Checkout. KEYS: available, holds, delta, expiry. ARGV[1]: holder,
+# ARGV[2]: units.
+# Takes the units from the holder's hold first, then from the available stock.
+# Returns {-1} if the product is not hot, {0, units the holder could take} if
+# there is not enough stock, else {1, units taken from the hold}.
+CONSUME_SCRIPT = """
+local available = redis.call("GET", KEYS[1])
+if not available then
+    return {-1}
+end
+local units = tonumber(ARGV[2])
+local held = tonumber(redis.call("HGET", KEYS[2], ARGV[1]) or "0")
+local from_hold = math.min(held, units)
+local extra = units - from_hold
+if extra > tonumber(available) then
+    return {0, held + tonumber(available)}
+end
+if held > from_hold then
+    redis.call("HINCRBY", KEYS[2], ARGV[1], -from_hold)
+elseif from_hold > 0 then
+    redis.call("HDEL", KEYS[2], ARGV[1])
+    redis.call("ZREM", KEYS[4], ARGV[1])
+end
+if extra > 0 then
+    redis.call("DECRBY", KEYS[1], extra)
+end
+-- The checkout decrements the row itself, so the held units leave the delta.
+redis.call("DECRBY", KEYS[3], from_hold)
+return {1, from_hold}
+"""
+
+# KEYS: available, holds, delta, expiry. ARGV[1]: now. Returns the units of
+# the holds past their deadline to the counter; returns the units released.
+EXPIRE_SCRIPT = """
+local expired = redis.call("ZRANGEBYSCORE", KEYS[4], "-inf", ARGV[1])
+local released = 0
+for _, holder in ipairs(expired) do
+    local held = tonumber(redis.call("HGET", KEYS[2], holder) or "0")
+    redis.call("HDEL", KEYS[2], holder)
+    redis.call("ZREM", KEYS[4], holder)
+    released = released + held
+end
+if released > 0 and redis.call("EXISTS", KEYS[1]) == 1 then
+    redis.call("INCRBY", KEYS[1], released)
+    redis.call("DECRBY", KEYS[3], released)
+end
+return released
+"""
+
+# KEYS: available, delta. Atomically takes the pending delta and reads the
+# counter. Returns {-1} if the product is not hot, else {delta, available}.
+SNAPSHOT_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return {-1}
+end
+local delta = tonumber(redis.call("GET", KEYS[2]) or "0")
+redis.call("SET", KEYS[2], 0)
+return {delta, tonumber(redis.call("GET", KEYS[1]))}
+"""
+
+
+def _keys(product_id):
+    tag = f"hot_stock:{{{product_id}}}"
+    return [f"{tag}:available", f"{tag}:holds", f"{tag}:delta", f"{tag}:expiry"]
+
+
+def _holder(user_id):
+    return "-" if user_id is None else str(user_id)
+
+
+def _hold_deadline():
+    from .inventory_service import RESERVATION_LIFETIME_MINUTES
+
+    return int(time.time()) + RESERVATION_LIFETIME_MINUTES * 60
+
+
+class HotStockService:
+    """
+    Reservations of hot products against Redis counters, and their
+    reconciliation with the database.
+    """
+
+    _scripts = {}
+
+    @staticmethod
+    def _script(source):
+        script = HotStockService._scripts.get(source)
+        if script is None:
+            script = redis_client.register_script(source)
+            HotStockService._scripts[source] = script
+        return script
+
+    # --- Reservations ---
+
+    @staticmethod
+    def reserve(product_id: int, quantity: int, user_id) -> bool | None:
+        """
+        Reserves units of a hot product for a user's cart.
+
+        Returns:
+            True if reserved, False if there is not enough stock, or None if
+            the product is not hot or Redis failed: use the database path.
+        """
+        try:
+            result = HotStockService._script(RESERVE_SCRIPT)(
+                keys=_keys(product_id),
+                args=[_holder(user_id), quantity, _hold_deadline()],
+            )
+        except REDIS_ERRORS as e:
+            logger.warning(f"Hot stock unavailable, using the database: {e}")
+            return None
+        if result < 0:
+            return None
+        cache.delete(f"product_stock_{product_id}")
+        return bool(result)
+
+    @staticmethod
+    def release(product_id: int, quantity: int, user_id) -> int | None:
+        """
+        Releases up to `quantity` units (all if negative) of a user's hold.
+
+        Returns:
+            The units released, or None if the product is not hot or Redis
+            failed.
+        """
+        try:
+            released = HotStockService._script(RELEASE_SCRIPT)(
+                keys=_keys(product_id), args=[_holder(user_id), quantity]
+            )
+        except REDIS_ERRORS as e:
+            logger.warning(f"Hot stock unavailable, using the database: {e}")
+            return None
+        if released < 0:
+            return None
+        if released:
+            cache.delete(f"product_stock_{product_id}")
+        return released
+
+    @staticmethod
+    def release_all(user_id) -> int:
+        """Releases a user's holds on every hot product; returns the units."""
+        try:
+            product_ids = redis_client.smembers(HOT_PRODUCTS_KEY)
+            if not product_ids:
+                return 0
+            script = HotStockService._script(RELEASE_SCRIPT)
+            pipe = redis_client.pipeline()
+            for product_id in product_ids:
+                script(
+                    keys=_keys(int(product_id)),
+                    args=[_holder(user_id), -1],
+                    client=pipe,
+                )
+            released = pipe.execute()
+        except REDIS_ERRORS as e:
+            logger.warning(f"Could not release hot stock of user {user_id}: {e}")
+            return 0
+        return sum(units for units in released if units > 0)
+
+    @staticmethod
+    def consume_many(quantities: dict[int, int], user_id):
+        """
+        Checkout: takes the hot products among `quantities` from Redis, the
+        buyer's holds first. Must be called with the inventory rows locked.
+
+        Returns:
+            (taken, short): {product_id: units taken from the hold} for the hot
+            products consumed, and {product_id: units available} for the hot
+            products lacking stock. If any are short nothing is consumed.
+            Products absent from both are not hot (or Redis failed) and go
+            through the database.
+        """
+        if not quantities:
+            return {}, {}
+        product_ids = list(quantities)
+        try:
+            script = HotStockService._script(CONSUME_SCRIPT)
+            pipe = redis_client.pipeline()
+            for product_id in product_ids:
+                script(
+                    keys=_keys(product_id),
+                    args=[_holder(user_id), quantities[product_id]],
+                    client=pipe,
+                )
+            results = pipe.execute()
+        except REDIS_ERRORS as e:
+            logger.warning(f"Hot stock unavailable, using the database: {e}")
+            return {}, {}
+
+        taken = {
+            product_id: result[1]
+            for product_id, result in zip(product_ids, results, strict=True)
+            if result[0] == 1
+        }
+        short = {
+            product_id: result[1]
+            for product_id, result in zip(product_ids, results, strict=True)
+            if result[0] == 0
+        }
+        if short:
+            HotStockService.restore_many(quantities, taken, user_id)
+            return {}, short
+        return taken, {}
+
+    @staticmethod
+    def restore_many(quantities: dict[int, int], taken: dict[int, int], user_id):
+        """Undoes `consume_many` when the checkout fails before writing."""
+        if not taken:
+            return
+        holder = _holder(user_id)
+        deadline = _hold_deadline()
+        try:
+            pipe = redis_client.pipeline()
+            for product_id, from_hold in taken.items():
+                available, holds, delta, expiry = _keys(product_id)
+                if from_hold:
+                    pipe.hincrby(holds, holder, from_hold)
+                    pipe.zadd(expiry, {holder: deadline})
+                    pipe.incrby(delta, from_hold)
+                if quantities[product_id] > from_hold:
+                    pipe.incrby(available, quantities[product_id] - from_hold)
+            pipe.execute()
+        except REDIS_ERRORS as e:
+            # The reconciler's drift check restores the counters.
+            logger.warning(f"Could not restore hot stock: {e}")
+
+    # --- Hot mode ---
+
+    @staticmethod
+    def enable(product_id: int) -> int:
+        """
+        Puts a product in hot mode; returns the units available in Redis.
+        """
+        inventory = (
+            db.session.query(Inventory)
+            .filter_by(product_id=product_id)
+            .with_for_update()
+            .first()
+        )
+        if inventory is None:
+            raise ValueError(f"Product {product_id} has no inventory.")
+        available = inventory.available_quantity or 0
+
+        available_key, _, delta_key, _ = _keys(product_id)
+        pipe = redis_client.pipeline()
+        pipe.set(available_key, available, nx=True)
+        pipe.setnx(delta_key, 0)
+        pipe.sadd(HOT_PRODUCTS_KEY, product_id)
+        pipe.execute()
+        db.session.commit()
+        return int(redis_client.get(available_key))
+
+    @staticmethod
+    def disable(product_id: int) -> None:
+        """
+        Leaves hot mode: writes back the pending delta, then turns the holds
+        back into database reservations (crediting their units back).
+        """
+        HotStockService.reconcile([product_id])
+        available_key, holds_key, delta_key, expiry_key = _keys(product_id)
+        redis_client.srem(HOT_PRODUCTS_KEY, product_id)
+        # Removing the counter first makes the scripts treat it as not hot.
+        pipe = redis_client.pipeline()
+        pipe.delete(available_key)
+        pipe.hgetall(holds_key)
+        pipe.delete(holds_key)
+        pipe.get(delta_key)
+        pipe.delete(delta_key)
+        pipe.delete(expiry_key)
+        _, holds, _, delta, _, _ = pipe.execute()
+
+        from .inventory_service import RESERVATION_LIFETIME_MINUTES
+
+        inventory = (
+            db.session.query(Inventory)
+            .filter_by(product_id=product_id)
+            .with_for_update()
+            .first()
+        )
+        returned = sum(int(units) for units in holds.values()) - int(delta or 0)
+        inventory.quantity += returned
+        expires_at = datetime.utcnow() + timedelta(minutes=RESERVATION_LIFETIME_MINUTES)
+        for holder, units in holds.items():
+            holder = holder.decode() if isinstance(holder, bytes) else holder
+            if holder != "-":
+                inventory.reserved_quantity += int(units)
+                db.session.add(
+                    InventoryReservation(
+                        inventory_id=inventory.id,
+                        user_id=int(holder),
+                        quantity=int(units),
+                        expires_at=expires_at,
+                    )
+                )
+        if returned:
+            db.session.add(
+                StockMovement(
+                    product_id=product_id,
+                    quantity_change=returned,
+                    reason="Hot stock disabled",
+                )
+            )
+        db.session.commit()
+        cache.delete(f"product_stock_{product_id}")
+
+    @staticmethod
+    def hot_products() -> list[int]:
+        return sorted(int(pid) for pid in redis_client.smembers(HOT_PRODUCTS_KEY))
+
+    # --- Reconciliation ---
+
+    @staticmethod
+    def reconcile(product_ids=None) -> dict:
+        """
+        Releases expired holds, writes the pending deltas of hot products back
+        to the database in one transaction, then corrects any drift of the
+        Redis counters.
+
+        Returns:
+            {"products", "units", "expired", "drift"}: products reconciled,
+            units written back, units of expired holds released and total
+            absolute correction applied to the counters.
+        """
+        if product_ids is None:
+            product_ids = HotStockService.hot_products()
+        if not product_ids:
+            return {"products": 0, "units": 0, "expired": 0, "drift": 0}
+
+        # Locked first: checkouts consuming holds commit before the snapshot.
+        rows = (
+            db.session.query(
+                Inventory.id,
+                Inventory.product_id,
+                Inventory.quantity,
+                Inventory.reserved_quantity,
+            )
+            .filter(Inventory.product_id.in_(product_ids))
+            .order_by(Inventory.product_id)
+            .with_for_update()
+            .all()
+        )
+        expire = HotStockService._script(EXPIRE_SCRIPT)
+        snapshot = HotStockService._script(SNAPSHOT_SCRIPT)
+        now = int(time.time())
+        pipe = redis_client.pipeline()
+        for row in rows:
+            keys = _keys(row.product_id)
+            expire(keys=keys, args=[now], client=pipe)
+            snapshot(keys=[keys[0], keys[2]], client=pipe)
+        results = pipe.execute()
+        expired = sum(results[0::2])
+        snapshots = {
+            row.product_id: result
+            for row, result in zip(rows, results[1::2], strict=True)
+            if result[0] != -1
+        }
+        deltas = {pid: s[0] for pid, s in snapshots.items() if s[0]}
+
+        try:
+            HotStockService._write_deltas(rows, deltas)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Hand the deltas back so the next run writes them.
+            pipe = redis_client.pipeline()
+            for product_id, delta in deltas.items():
+                pipe.incrby(_keys(product_id)[2], delta)
+            pipe.execute()
+            raise
+
+        drift_total = 0
+        max_drift = current_app.config.get("HOT_STOCK_MAX_DRIFT", 0)
+        pipe = redis_client.pipeline()
+        for row in rows:
+            if row.product_id not in snapshots:
+                continue
+            expected = (
+                (row.quantity or 0)
+                - deltas.get(row.product_id, 0)
+                - row.reserved_quantity
+            )
+            drift = expected - snapshots[row.product_id][1]
+            if drift:
+                drift_total += abs(drift)
+                log = logger.error if abs(drift) > max_drift else logger.warning
+                log(
+                    f"Hot stock of product {row.product_id} drifted by {drift} "
+                    f"units from the database; correcting."
+                )
+                pipe.incrby(_keys(row.product_id)[0], drift)
+        pipe.execute()
+
+        if deltas or expired or drift_total:
+            cache.delete_many(*(f"product_stock_{pid}" for pid in snapshots))
+        return {
+            "products": len(snapshots),
+            "units": sum(deltas.values()),
+            "expired": expired,
+            "drift": drift_total,
+        }
+
+    @staticmethod
+    def _write_deltas(rows, deltas):
+        if not deltas:
+            return
+        ids = {row.product_id: row.id for row in rows}
+        table = Inventory.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam("inventory_id"))
+            .values(quantity=table.c.quantity - bindparam("units")),
+            [
+                {"inventory_id": ids[pid], "units": delta}
+                for pid, delta in deltas.items()
+            ],
+        )
+        db.session.execute(
+            insert(StockMovement),
+            [
+                {"product_id": pid, "quantity_change": -delta, "reason": RESERVE_REASON}
+                for pid, delta in deltas.items()
+            ],
+        )
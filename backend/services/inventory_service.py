@@ -1,10 +1,9 @@
 import logging
-import os
 import uuid
+from collections import Counter
 from datetime import datetime, timedelta
 
-import qrcode
-from flask import current_app, render_template, url_for
+from sqlalchemy import bindparam, delete, insert, update
 
 # FIX: Consolidated all imports into a single, clean block.
 # This resolves all F811 (redefinition) and E402 (import not at top) errors.
@@ -20,16 +19,30 @@ from backend.models import (
     StockMovement,
 )
 from backend.services.exceptions import (
-    InsufficientStockException,
+    InsufficientStockError,
     NotFoundException,
     ServiceError,
     ValidationException,
 )
+from backend.services.hot_stock_service import HotStockService
 from backend.services.notification_service import NotificationService
-from backend.services.pdf_service import PDFService  # Assuming a PDF service exists
+from backend.services.passport_asset_service import PassportAssetService
 
 # CONSTANTS
 RESERVATION_LIFETIME_MINUTES = 60
+# Expired reservations deleted per transaction by the sweeper.
+EXPIRY_SWEEP_BATCH_SIZE = 1000
+
+
+def quantities_by_product(lines) -> dict[int, int]:
+    """
+    Sums `(product_id, quantity)` pairs per product, e.g. the lines of a cart,
+    into the mapping taken by `InventoryService.reserve_many`.
+    """
+    quantities = Counter()
+    for product_id, quantity in lines:
+        quantities[product_id] += quantity
+    return dict(quantities)
 
 
 class InventoryService:
@@ -40,12 +53,19 @@ class InventoryService:
     def __init__(self, logger=None):
         self.logger = logger or logging.getLogger(__name__)
         self.session = db.session
-        self.pdf_service = PDFService()  # Initialize any dependent services
 
     def add_new_stock_batch(self, product_id: int, quantity: int, item_details: dict):
         """
         Adds a batch of new serialized items to the inventory for a given product.
-        This is a transactional operation.
+
+        Only the rows are created in the transaction: items, passports and their
+        "CREATED" entries are bulk-inserted with precomputed IDs and UIDs, so the
+        product row stays locked for a few statements regardless of batch size.
+        Passport assets (HTML, PDF, QR code) are rendered afterwards by Celery
+        workers; poll `PassportAssetService.get_batch_progress(batch_id)`.
+
+        Returns:
+            A dict with the `batch_id` and the `uids` of the created items.
         """
         if quantity <= 0:
             raise ValidationException("Quantity must be a positive integer.")
@@ -56,11 +76,13 @@ class InventoryService:
 
         try:
             was_out_of_stock = product.get_available_stock() <= 0
-            created_items = []
-
-            for _ in range(quantity):
-                item = self._create_serialized_item_and_passport(product, item_details)
-                created_items.append(item)
+            batch_id = uuid.uuid4().hex
+            item_rows, passport_rows, entry_rows = self._build_batch_rows(
+                product, quantity, item_details, batch_id
+            )
+            self.session.execute(insert(SerializedItem), item_rows)
+            self.session.execute(insert(ProductPassport), passport_rows)
+            self.session.execute(insert(PassportEntry), entry_rows)
 
             # Increment general stock and log movement
             inventory = self._get_or_create_inventory(product.id)
@@ -70,19 +92,18 @@ class InventoryService:
             )
             self.session.add(log)
 
-            self.session.commit()
-            self.logger.info(
-                f"Successfully created {quantity} items for product {product_id}."
-            )
-
             if was_out_of_stock:
+                # Queued with the batch, so subscribers hear of committed stock only.
                 self.logger.info(
                     f"Product {product.name} is back in stock. Triggering notifications."
                 )
-                notification_service = NotificationService()
-                notification_service.notify_users_of_restock(product.id)
+                NotificationService(self.session).notify_users_of_restock(product.id)
 
-            return created_items
+            self.session.commit()
+            self.logger.info(
+                f"Successfully created {quantity} items for product {product_id} "
+                f"(batch {batch_id})."
+            )
         except Exception as e:
             self.session.rollback()
             self.logger.error(
@@ -92,8 +113,21 @@ class InventoryService:
             # FIX: Correctly raise exception with 'from e'
             raise ServiceError("Failed to create the batch of items.") from e
 
+        PassportAssetService.enqueue_batch(
+            batch_id, [row["id"] for row in passport_rows]
+        )
+
+        return {"batch_id": batch_id, "uids": [row["uid"] for row in item_rows]}
+
     def reserve_stock(self, product_id: int, quantity: int, user_id: int):
         """Reserves stock for a user, preventing overselling. Called when adding to cart."""
+        # Hot products are reserved in Redis, without locking the row.
+        reserved = HotStockService.reserve(product_id, quantity, user_id)
+        if reserved is not None:
+            if not reserved:
+                raise InsufficientStockError("Not enough stock available to reserve.")
+            return None
+
         inventory = (
             self.session.query(Inventory)
             .filter_by(product_id=product_id)
@@ -101,7 +135,7 @@ class InventoryService:
             .first()
         )
         if not inventory or inventory.get_available_stock() < quantity:
-            raise InsufficientStockException("Not enough stock available to reserve.")
+            raise InsufficientStockError("Not enough stock available to reserve.")
 
         reservation = (
             self.session.query(InventoryReservation)
@@ -121,14 +155,174 @@ class InventoryService:
                 expires_at=expires_at,
             )
             self.session.add(reservation)
+        inventory.reserved_quantity += quantity
 
         cache.delete(f"product_stock_{product_id}")
         self.session.commit()
         return reservation
 
+    def reserve_many(
+        self,
+        quantities: dict[int, int],
+        user_id: int = None,
+        reason: str = "Order Fulfillment",
+    ) -> dict[int, int]:
+        """
+        Takes stock for several products at once, e.g. every line of an order.
+
+        The inventory rows are locked with a single `SELECT ... FOR UPDATE`
+        ordered by product, so concurrent checkouts always lock in the same
+        order and cannot deadlock. Availability is checked in memory: the
+        row's available quantity plus what `user_id` holds, since the buyer's
+        reservations on these products are consumed by the sale. Hot products (see
+        `HotStockService`) are checked and taken from their Redis counters
+        instead, the buyer's hold first. The decrements and the
+        `StockMovement` rows are then written with one executemany each, so
+        the number of statements does not grow with the number of lines.
+
+        Does not commit: the rows stay locked until the caller's transaction,
+        which should also create the order, commits or rolls back.
+
+        Args:
+            quantities: {product_id: quantity} to take.
+            user_id: The buyer, whose cart reservations are consumed.
+            reason: Reason recorded on the stock movements.
+
+        Returns:
+            {product_id: quantity left in stock}.
+
+        Raises:
+            InsufficientStockError: If any product lacks stock; its payload
+                lists every shortage and nothing is changed.
+        """
+        quantities = {pid: qty for pid, qty in quantities.items() if qty}
+        if any(qty < 0 for qty in quantities.values()):
+            raise ValidationException("Quantities must be positive integers.")
+        if not quantities:
+            return {}
+
+        rows = (
+            self.session.query(
+                Inventory.id,
+                Inventory.product_id,
+                Inventory.quantity,
+                Inventory.reserved_quantity,
+            )
+            .filter(Inventory.product_id.in_(quantities))
+            .order_by(Inventory.product_id)
+            .with_for_update()
+            .all()
+        )
+        inventories = {row.product_id: row for row in rows}
+        # Hot products are checked and taken in Redis, with the rows locked.
+        taken, hot_shortages = HotStockService.consume_many(quantities, user_id)
+
+        own = {}
+        if user_id is not None:
+            own = dict(
+                self.session.query(
+                    InventoryReservation.inventory_id,
+                    db.func.sum(InventoryReservation.quantity),
+                )
+                .filter(
+                    InventoryReservation.inventory_id.in_([row.id for row in rows]),
+                    InventoryReservation.user_id == user_id,
+                )
+                .group_by(InventoryReservation.inventory_id)
+                .all()
+            )
+
+        shortages = [
+            {
+                "product_id": product_id,
+                "requested": quantities[product_id],
+                "available": available,
+            }
+            for product_id, available in hot_shortages.items()
+        ]
+        for product_id, quantity in quantities.items():
+            if product_id in taken or product_id in hot_shortages:
+                continue
+            row = inventories.get(product_id)
+            available = (
+                (row.quantity or 0) - row.reserved_quantity + own.get(row.id, 0)
+                if row is not None
+                else 0
+            )
+            if available < quantity:
+                shortages.append(
+                    {
+                        "product_id": product_id,
+                        "requested": quantity,
+                        "available": max(0, available),
+                    }
+                )
+        if shortages:
+            HotStockService.restore_many(quantities, taken, user_id)
+            names = dict(
+                self.session.query(Product.id, Product.name)
+                .filter(Product.id.in_([s["product_id"] for s in shortages]))
+                .all()
+            )
+            raise InsufficientStockError(
+                "Insufficient stock for product(s): "
+                + ", ".join(
+                    names.get(s["product_id"], str(s["product_id"])) for s in shortages
+                ),
+                payload={"shortages": shortages},
+            )
+
+        table = Inventory.__table__
+        self.session.execute(
+            update(table)
+            .where(table.c.id == bindparam("inventory_id"))
+            .values(
+                quantity=table.c.quantity - bindparam("amount"),
+                reserved_quantity=table.c.reserved_quantity - bindparam("own"),
+            ),
+            [
+                {
+                    "inventory_id": inventories[pid].id,
+                    "amount": qty,
+                    "own": own.get(inventories[pid].id, 0),
+                }
+                for pid, qty in quantities.items()
+            ],
+        )
+        self.session.execute(
+            insert(StockMovement),
+            [
+                {"product_id": pid, "quantity_change": -qty, "reason": reason}
+                for pid, qty in quantities.items()
+            ],
+        )
+        if own:
+            InventoryReservation.query.filter(
+                InventoryReservation.inventory_id.in_(own),
+                InventoryReservation.user_id == user_id,
+            ).delete(synchronize_session=False)
+
+        cache.delete_many(*(f"product_stock_{pid}" for pid in quantities))
+        return {
+            pid: (inventories[pid].quantity or 0) - qty
+            for pid, qty in quantities.items()
+        }
+
     def release_stock(self, product_id: int, quantity: int, user_id: int):
         """Releases a user's stock reservation. Called when removing from cart."""
-        inventory = self.session.query(Inventory).get(product_id)
+        released = HotStockService.release(product_id, quantity, user_id)
+        if released is not None:
+            # Units reserved before the product went hot are in the database.
+            quantity -= released
+            if quantity <= 0:
+                return
+
+        inventory = (
+            self.session.query(Inventory)
+            .filter_by(product_id=product_id)
+            .with_for_update()
+            .first()
+        )
         if not inventory:
             return
 
@@ -139,7 +333,9 @@ class InventoryService:
         )
 
         if reservation:
-            reservation.quantity -= quantity
+            released = min(quantity, reservation.quantity)
+            reservation.quantity -= released
+            inventory.reserved_quantity -= released
             if reservation.quantity <= 0:
                 self.session.delete(reservation)
 
@@ -148,10 +344,9 @@ class InventoryService:
 
     def release_all_reservations_for_user(self, user_id: int):
         """Clears all reservations for a user. Called by CartService.clear_cart."""
+        HotStockService.release_all(user_id)
         try:
-            InventoryReservation.query.filter_by(user_id=user_id).delete(
-                synchronize_session=False
-            )
+            self._delete_reservations(InventoryReservation.user_id == user_id)
             self.logger.info(f"Released all reservations for user {user_id}.")
         except Exception as e:
             self.logger.error(
@@ -163,8 +358,92 @@ class InventoryService:
                 f"Could not release all inventory reservations for user {user_id}."
             ) from e
 
+    def expire_reservations(self, batch_size: int = EXPIRY_SWEEP_BATCH_SIZE) -> int:
+        """
+        Deletes expired reservations and credits their units back, one batch
+        per transaction, oldest first (`expires_at` is indexed). Run
+        periodically by `tasks.expire_inventory_reservations`.
+
+        Returns:
+            The number of units released.
+        """
+        released = 0
+        while True:
+            now = datetime.utcnow()
+            ids = [
+                reservation_id
+                for (reservation_id,) in self.session.query(InventoryReservation.id)
+                .filter(InventoryReservation.expires_at <= now)
+                .order_by(InventoryReservation.expires_at)
+                .limit(batch_size)
+            ]
+            if not ids:
+                break
+            # Rechecked once the rows are locked: a cart may have renewed one.
+            units = self._delete_reservations(
+                InventoryReservation.id.in_(ids),
+                InventoryReservation.expires_at <= now,
+            )
+            self.session.commit()
+            released += sum(units.values())
+            if len(ids) < batch_size:
+                break
+        if released:
+            self.logger.info(f"Expired reservations released {released} units.")
+        return released
+
     # --- Private Helper Methods ---
 
+    def _delete_reservations(self, *criteria) -> dict[int, int]:
+        """
+        Deletes the reservations matching `criteria` and takes their units off
+        `Inventory.reserved_quantity`, with one executemany. The inventory
+        rows are locked first, in product order as in `reserve_many`.
+
+        Returns:
+            {product_id: units released}. Does not commit.
+        """
+        inventory_ids = [
+            inventory_id
+            for (inventory_id,) in self.session.query(InventoryReservation.inventory_id)
+            .filter(*criteria)
+            .distinct()
+        ]
+        if not inventory_ids:
+            return {}
+        products = dict(
+            self.session.query(Inventory.id, Inventory.product_id)
+            .filter(Inventory.id.in_(inventory_ids))
+            .order_by(Inventory.product_id)
+            .with_for_update()
+            .all()
+        )
+
+        released = Counter()
+        deleted = self.session.execute(
+            delete(InventoryReservation)
+            .where(InventoryReservation.inventory_id.in_(products), *criteria)
+            .returning(InventoryReservation.inventory_id, InventoryReservation.quantity)
+            .execution_options(synchronize_session=False)
+        )
+        for inventory_id, quantity in deleted:
+            released[inventory_id] += quantity
+        if not released:
+            return {}
+
+        table = Inventory.__table__
+        self.session.execute(
+            update(table)
+            .where(table.c.id == bindparam("inventory_id"))
+            .values(reserved_quantity=table.c.reserved_quantity - bindparam("units")),
+            [
+                {"inventory_id": inventory_id, "units": units}
+                for inventory_id, units in released.items()
+            ],
+        )
+        cache.delete_many(*(f"product_stock_{products[i]}" for i in released))
+        return {products[i]: units for i, units in released.items()}
+
     def _get_or_create_inventory(self, product_id: int) -> Inventory:
         """Internal helper to get or create the main inventory record for a product."""
         inventory = (
@@ -176,73 +455,35 @@ class InventoryService:
             self.session.flush()  # Flush to get ID
         return inventory
 
-    def _create_serialized_item_and_passport(
-        self, product: Product, item_details: dict
-    ) -> SerializedItem:
-        """Private helper to handle the 'birth' of a single item and its digital assets."""
-        try:
-            uid = f"{product.sku or 'SKU'}-{uuid.uuid4().hex[:8].upper()}"
-            new_item = SerializedItem(
-                product_id=product.id, uid=uid, status="in_stock", **item_details
-            )
-            self.session.add(new_item)
-            self.session.flush()
-
-            passport_url = url_for(
-                "passport_bp.view_passport", item_uid=uid, _external=True
-            )
-            html_path, pdf_path, qr_path = self._generate_passport_assets(
-                new_item, passport_url
-            )
-
-            new_passport = ProductPassport(
-                serialized_item=new_item,
-                html_file_path=html_path,
-                pdf_file_path=pdf_path,
-                qr_code_file_path=qr_path,
+    def _build_batch_rows(
+        self, product: Product, quantity: int, item_details: dict, batch_id: str
+    ) -> tuple:
+        """
+        Private helper to prepare the 'birth' of a batch of items: the rows of
+        every item, its passport and its first passport entry, with their IDs
+        generated up front so they can be inserted in three bulk statements.
+        """
+        prefix = product.base_sku or "SKU"
+        item_rows, passport_rows, entry_rows = [], [], []
+        for _ in range(quantity):
+            item_id, passport_id = uuid.uuid4(), uuid.uuid4()
+            item_rows.append(
+                {
+                    **item_details,
+                    "id": item_id,
+                    "product_id": product.id,
+                    "uid": f"{prefix}-{uuid.uuid4().hex[:8].upper()}",
+                    "status": "in_stock",
+                    "batch_id": batch_id,
+                }
             )
-            self.session.add(new_passport)
-
-            entry = PassportEntry(
-                passport=new_passport,
-                event_type="CREATED",
-                details="Item manufactured.",
+            passport_rows.append({"id": passport_id, "serialized_item_id": item_id})
+            entry_rows.append(
+                {
+                    "id": uuid.uuid4(),
+                    "passport_id": passport_id,
+                    "event_type": "CREATED",
+                    "details": "Item manufactured.",
+                }
             )
-            self.session.add(entry)
-
-            return new_item
-        except Exception as e:
-            self.logger.error(
-                f"Error during sub-process of creating item for product {product.id}: {e}",
-                exc_info=True,
-            )
-            # FIX: Correctly raise exception with 'from e'
-            raise ServiceException("An error occurred during item creation.") from e
-
-    def _generate_passport_assets(self, item: SerializedItem, url: str) -> tuple:
-        """Generates and saves the HTML, PDF, and QR code for a passport."""
-        html_dir = current_app.config["PASSPORT_HTML_STORAGE_PATH"]
-        pdf_dir = current_app.config["PASSPORT_PDF_STORAGE_PATH"]
-        qr_dir = current_app.config["QR_CODE_STORAGE_PATH"]
-        os.makedirs(html_dir, exist_ok=True)
-        os.makedirs(pdf_dir, exist_ok=True)
-        os.makedirs(qr_dir, exist_ok=True)
-
-        html_path = os.path.join(html_dir, f"{item.uid}.html")
-        pdf_path = os.path.join(pdf_dir, f"{item.uid}.pdf")
-        qr_path = os.path.join(qr_dir, f"{item.uid}.png")
-
-        # Generate HTML
-        rendered_html = render_template(
-            "non-email/product_passport.html", item=item, passport_url=url
-        )
-        with open(html_path, "w", encoding="utf-8") as f:
-            f.write(rendered_html)
-
-        # Generate PDF
-        self.pdf_service.generate_from_html(html_path, pdf_path)
-
-        # Generate QR Code
-        qrcode.make(url).save(qr_path)
-
-        return html_path, pdf_path, qr_path
+        return item_rows, passport_rows, entry_rows
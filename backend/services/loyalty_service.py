@@ -9,6 +9,7 @@ from ..models import (
     UserLoyalty,
 )
 from ..models.loyalty_account import LoyaltyAccount
+from ..utils.cache_helpers import clear_tier_cache
 
 
 class LoyaltyService:
@@ -78,6 +79,7 @@ class LoyaltyService:
                 if hasattr(tier, key):
                     setattr(tier, key, value)
             db.session.commit()
+            clear_tier_cache(tier.id)
             return tier, None
         except Exception as e:
             db.session.rollback()
@@ -100,6 +102,7 @@ class LoyaltyService:
         try:
             db.session.delete(tier)
             db.session.commit()
+            clear_tier_cache(tier_id)
             return True, "Loyalty tier deleted successfully."
         except Exception as e:
             db.session.rollback()
@@ -1,13 +1,14 @@
 # This service contains the logic to read and parse the log file.
 # It also provides centralized logging functionality for all services.
 
-import os
 from functools import wraps
 from typing import Any
 
 from flask import current_app
+from redis.exceptions import RedisError
 
 from backend.loggers import api_logger, app_logger, database_logger, security_logger
+from backend.utils.error_log import error_log_store, read_error_log_files
 
 
 class MonitoringService:
@@ -218,59 +219,50 @@ class MonitoringService:
         return decorator
 
     @staticmethod
-    def get_latest_errors(limit: int = 20):
+    def get_latest_errors(
+        limit: int = 20, level: str = None, logger_name: str = None
+    ) -> list[dict]:
         """
-        Reads the application's log file and returns the last `limit` lines
-        that contain "ERROR" or "CRITICAL".
+        Returns the `limit` most recent ERROR and CRITICAL records, newest first.
+        """
+        return MonitoringService.get_error_logs_paginated(
+            page=1, per_page=limit, level=level, logger_name=logger_name
+        )["items"]
 
-        This provides a basic, file-based error monitoring view for the admin dashboard.
+    @staticmethod
+    def get_error_logs_paginated(
+        page: int = 1,
+        per_page: int = 50,
+        level: str = None,
+        logger_name: str = None,
+        since: float = None,
+        until: float = None,
+    ) -> dict:
         """
-        log_file_path = current_app.config.get("LOG_FILE_PATH")
-        if not log_file_path or not os.path.exists(log_file_path):
-            MonitoringService.log_warning(
-                f"Log file not found at path: {log_file_path}. Cannot fetch error logs.",
-                "MonitoringService",
-            )
-            return []
+        Returns a page of ERROR and CRITICAL records, newest first, filtered by
+        level, logger and time range (epoch seconds).
 
+        Records come from the indexed error store in Redis; if it cannot be
+        read, the JSON log files are scanned from their end instead.
+        """
+        filters = {
+            "level": level.upper() if level else None,
+            "logger_name": logger_name,
+            "since": since,
+            "until": until,
+            "page": page,
+            "per_page": per_page,
+        }
         try:
-            with open(log_file_path, encoding="utf-8") as f:
-                lines = f.readlines()
-
-            error_logs = []
-            # Iterate backwards through the file to find the most recent errors
-            for line in reversed(lines):
-                if len(error_logs) >= limit:
-                    break
-
-                # Check for error keywords
-                if "ERROR" in line or "CRITICAL" in line:
-                    # A simple parser for the default log format:
-                    # [YYYY-MM-DD HH:MM:SS,ms] LEVEL: Message [in /path/to/file:line]
-                    try:
-                        timestamp = line.split("]")[0][1:]
-                        level = line.split("]")[1].strip().split(":")[0]
-                        message = line.split(":", 2)[-1].strip()
-
-                        error_logs.append(
-                            {"timestamp": timestamp, "level": level, "message": message}
-                        )
-                    except IndexError:
-                        # Fallback for log lines that don't match the expected format
-                        error_logs.append(
-                            {
-                                "timestamp": "N/A",
-                                "level": "UNKNOWN",
-                                "message": line.strip(),
-                            }
-                        )
-
-            return error_logs
-
-        except Exception as e:
-            MonitoringService.log_error(
-                f"Failed to read or parse log file: {e}",
+            return error_log_store.query(**filters)
+        except (RedisError, OSError, AttributeError) as e:
+            MonitoringService.log_warning(
+                f"Error log store unavailable, reading the log files: {e}",
                 "MonitoringService",
-                exc_info=True,
             )
-            return []  # Return an empty list on failure
+
+        return read_error_log_files(
+            current_app.config.get("LOG_FILE_PATH"),
+            backup_count=current_app.config.get("LOG_BACKUP_COUNT", 5),
+            **filters,
+        )
@@ -7,6 +7,7 @@ from backend.models.utility_models import StockNotification
 
 from .exceptions import ValidationException
 from .monitoring_service import MonitoringService
+from .outbox_service import OutboxService
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +45,8 @@ class NotificationService:
     def notify_users_of_restock(self, product_id):
         """
         Finds all subscribed users and queues a task to notify them of a restock.
+        The task is added to the outbox in the caller's transaction, together
+        with the `notified` flags; does not commit.
         """
         subscribers = (
             self.session.query(StockNotificationRequest)
@@ -55,13 +58,14 @@ class NotificationService:
             return
 
         user_ids = [sub.user_id for sub in subscribers]
-        send_back_in_stock_notifications_task.delay(
-            user_ids=user_ids, product_id=product_id
+        OutboxService.enqueue(
+            "tasks.send_back_in_stock_notifications",
+            user_ids=user_ids,
+            product_id=product_id,
         )
 
         for sub in subscribers:
             sub.notified = True
-        self.session.commit()
         self.logger.info(
             f"Queued back-in-stock notifications for {len(user_ids)} users for product {product_id}."
         )
@@ -14,6 +14,8 @@ from ..models import (
     OrderStatusEnum,
     Product,
 )
+from ..utils.cache_helpers import clear_cart_cache
+from ..utils.pagination import keyset_paginate
 from .email_service import EmailService
 from .exceptions import (
     BusinessRuleException,
@@ -21,12 +23,13 @@ from .exceptions import (
     ServiceException,
     ValidationException,
 )
-from .inventory_service import InventoryService
+from .inventory_service import InventoryService, quantities_by_product
 from .invoice_service import InvoiceService
 from .loyalty_service import LoyaltyService
 
 # Note: NotificationService is no longer imported here to prevent circular dependency
 from .monitoring_service import MonitoringService
+from .outbox_service import OutboxService
 
 # Configure a logger for this service
 logger = logging.getLogger(__name__)
@@ -75,26 +78,22 @@ class OrderService:
         try:
             # --- Transaction Start ---
 
-            # 1. Lock inventory rows for products in the cart to prevent race conditions
+            # 1. Lock the inventory rows of the cart's products, in product
+            # order, and take their stock in one go
+            self.inventory_service.reserve_many(
+                quantities_by_product(
+                    (item.product_id, item.quantity) for item in cart.items
+                ),
+                user_id=user_id,
+            )
+
+            # 2. Load the products for their prices
             product_ids = [item.product_id for item in cart.items]
             products = (
-                self.session.query(Product)
-                .filter(Product.id.in_(product_ids))
-                .with_for_update()
-                .all()
+                self.session.query(Product).filter(Product.id.in_(product_ids)).all()
             )
             product_map = {p.id: p for p in products}
 
-            # 2. Pre-check stock availability
-            for item in cart.items:
-                product = product_map.get(item.product_id)
-                if not product or not self.inventory_service.is_stock_sufficient(
-                    product.id, item.quantity
-                ):
-                    raise ValidationException(
-                        f"Not enough stock for {getattr(product, 'name', 'Unknown Product')}."
-                    )
-
             # 3. Create the initial Order record
             new_order = Order(
                 user_id=user_id,
@@ -108,7 +107,7 @@ class OrderService:
             )
             self.session.add(new_order)
 
-            # 4. Create OrderItems, calculate total, and decrease stock
+            # 4. Create OrderItems and calculate total
             total_amount = 0
             for item in cart.items:
                 product = product_map[item.product_id]
@@ -118,7 +117,6 @@ class OrderService:
                     quantity=item.quantity,
                     price_at_purchase=product.price,
                 )
-                self.inventory_service.decrease_stock(product.id, item.quantity)
                 total_amount += order_item.price_at_purchase * order_item.quantity
                 self.session.add(order_item)
 
@@ -136,10 +134,19 @@ class OrderService:
             self.session.query(CartItem).filter_by(cart_id=cart.id).delete()
             self.session.delete(cart)
 
+            # 7. Queue the confirmation email, with its invoice PDF, with the order
+            self.session.flush()
+            OutboxService.enqueue(
+                "tasks.send_checkout_confirmation",
+                str(new_order.id),
+                dedup_key=f"order-confirmation:{new_order.id}",
+            )
+
             self.session.commit()
+            clear_cart_cache(user_id)
             # --- Transaction End ---
 
-            # 7. --- Post-Transaction Asynchronous Tasks ---
+            # 8. --- Post-Transaction Asynchronous Tasks ---
             self._execute_post_order_tasks(new_order)
 
             return new_order
@@ -201,9 +208,14 @@ class OrderService:
         status: str = None,
         sort_by: str = "created_at",
         sort_direction: str = "desc",
+        cursor: str = None,
+        with_total: bool = False,
     ):
         """
         Gets all orders for an admin view, with optional filtering and sorting.
+
+        Passing a `cursor` (an empty string for the first page) uses keyset
+        pagination over (sort_by, id) and returns a `CursorPage`.
         """
         query = self.session.query(Order).options(joinedload(Order.user))
 
@@ -215,6 +227,17 @@ class OrderService:
                 self.logger.warning(f"Invalid status filter '{status}' provided.")
 
         order_by_attr = getattr(Order, sort_by, Order.created_at)
+        if cursor is not None:
+            return keyset_paginate(
+                query,
+                order_by_attr,
+                Order.id,
+                cursor=cursor,
+                per_page=per_page,
+                descending=sort_direction == "desc",
+                with_total=with_total,
+            )
+
         if sort_direction == "desc":
             query = query.order_by(db.desc(order_by_attr))
         else:
@@ -245,21 +268,16 @@ class OrderService:
             if tracking_number:
                 order.tracking_number = tracking_number
 
+            # Notify the customer once the new status is committed
+            OutboxService.enqueue(
+                "tasks.send_order_status_update", str(order.id), new_status_str
+            )
+
             self.session.commit()
             self.logger.info(
                 f"Order {order_id} status updated from '{original_status}' to '{new_status_str}'."
             )
 
-            # ** FIX: Import NotificationService here **
-            from .notification_service import NotificationService
-
-            notification_service = NotificationService()
-
-            # Trigger notification task
-            notification_service.send_order_status_update.delay(
-                order_id=order.id, new_status=new_status_str
-            )
-
             return order
         except SQLAlchemyError as e:
             self.session.rollback()
@@ -304,13 +322,9 @@ class OrderService:
         """
         Offloads non-critical, post-transaction tasks to background workers (Celery).
         This ensures the user gets a fast response and failures here don't block the order.
+        The confirmation email is queued in the order's transaction.
         """
         try:
-            # ** FIX: Import NotificationService here **
-            from .notification_service import NotificationService
-
-            notification_service = NotificationService()
-
             # Notify admin dashboard of the new order via WebSockets
             socketio.emit(
                 "new_order",
@@ -322,8 +336,6 @@ class OrderService:
             self.loyalty_service.add_points_for_purchase.delay(
                 user_id=order.user_id, order_id=order.id
             )
-            notification_service.send_order_confirmation.delay(order_id=order.id)
-            self.invoice_service.generate_invoice_pdf.delay(order_id=order.id)
 
             self.monitoring_service.log_info(
                 f"Successfully queued post-order tasks for order {order.id}",
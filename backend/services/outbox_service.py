@@ -0,0 +1,274 @@
+"""
+Transactional outbox for Celery tasks.
+
+Instead of calling `.delay()` after commit (one broker round trip on the
+request path, and a lost task if the broker is unreachable at that moment),
+services add an `OutboxMessage` in the transaction that produced the work:
+
+    OutboxService.enqueue(
+        "tasks.send_checkout_confirmation",
+        str(order.id),
+        dedup_key=f"order-confirmation:{order.id}",
+    )
+    db.session.commit()
+
+The message exists if and only if the order does. The dispatcher
+(`flask outbox dispatch`, one or more processes) drains pending messages in
+batches:
+
+    * a batch is claimed with FOR UPDATE SKIP LOCKED, so dispatchers never
+      publish the same rows, and marked dispatched in the same transaction;
+    * its messages are published through one broker connection and producer;
+    * it is capped by the room left in the broker queue under
+      OUTBOX_MAX_QUEUE_DEPTH, and nothing is claimed while the queue is full
+      or the broker unreachable;
+    * messages that fail to publish are retried with a growing delay.
+
+Delivery is at least once: a message published just before its batch failed
+to commit is published again. Messages sharing a `dedup_key` are only
+enqueued once. Published rows are purged after OUTBOX_RETENTION_HOURS.
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from ..celery_worker import celery_app
+from ..database import db
+from ..models import OutboxMessage
+from .exceptions import ServiceError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_POLL_INTERVAL = 1.0
+# Seconds before publishing a message again after a broker error, doubling
+# with each attempt up to MAX_RETRY_DELAY.
+RETRY_DELAY = 5
+MAX_RETRY_DELAY = 300
+PURGE_INTERVAL = 60
+PURGE_BATCH_SIZE = 10000
+
+# INSERT ... ON CONFLICT DO NOTHING, for deduplicated messages.
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+class OutboxService:
+    @staticmethod
+    def enqueue(task_name: str, *args, dedup_key: str = None, **kwargs) -> None:
+        """
+        Adds a Celery task to the current transaction; it is published once
+        the transaction commits. Does not commit.
+
+        Args:
+            task_name: The registered Celery task name.
+            dedup_key: Optional key; a message with the same key is only
+                enqueued once.
+        """
+        values = {
+            "task_name": task_name,
+            "args": list(args),
+            "kwargs": kwargs,
+            "dedup_key": dedup_key,
+        }
+        if dedup_key is None:
+            db.session.execute(insert(OutboxMessage).values(**values))
+            return
+        dialect = db.session.get_bind().dialect.name
+        if dialect not in _UPSERT_INSERTS:
+            raise ServiceError(
+                f"Deduplicated outbox messages are not supported on {dialect}."
+            )
+        statement = (
+            _UPSERT_INSERTS[dialect](OutboxMessage)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=["dedup_key"])
+        )
+        db.session.execute(statement)
+
+    # --- Dispatcher ---
+
+    @staticmethod
+    def dispatch_batch(batch_size: int = None) -> int:
+        """
+        Publishes one batch of pending messages.
+
+        Returns:
+            The number of messages published.
+        """
+        config = current_app.config
+        batch_size = batch_size or config.get("OUTBOX_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+        limit = min(batch_size, OutboxService._broker_room(batch_size))
+        if limit <= 0:
+            return 0
+
+        now = datetime.utcnow()
+        messages = (
+            db.session.query(OutboxMessage)
+            .filter(
+                OutboxMessage.dispatched_at.is_(None),
+                OutboxMessage.available_at <= now,
+            )
+            .order_by(OutboxMessage.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not messages:
+            db.session.commit()
+            return 0
+
+        published = []
+        error = None
+        try:
+            with celery_app.producer_or_acquire() as producer:
+                for message in messages:
+                    celery_app.send_task(
+                        message.task_name,
+                        args=message.args,
+                        kwargs=message.kwargs,
+                        task_id=f"outbox-{message.id}",
+                        producer=producer,
+                    )
+                    published.append(message.id)
+        except Exception as e:
+            # The broker is failing: the rest of the batch is retried later.
+            error = e
+
+        if published:
+            db.session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(published))
+                .values(dispatched_at=now)
+                .execution_options(synchronize_session=False)
+            )
+        if error is not None:
+            OutboxService._schedule_retry(messages[len(published) :], now, error)
+        db.session.commit()
+        return len(published)
+
+    @staticmethod
+    def run(poll_interval: float = None, once: bool = False) -> None:
+        """
+        Dispatches pending messages until interrupted. Full batches are sent
+        back to back; otherwise the dispatcher waits `poll_interval` seconds.
+        """
+        config = current_app.config
+        batch_size = config.get("OUTBOX_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+        if poll_interval is None:
+            poll_interval = config.get("OUTBOX_POLL_INTERVAL", DEFAULT_POLL_INTERVAL)
+        purged_at = 0.0
+        while True:
+            try:
+                published = OutboxService.dispatch_batch(batch_size)
+                if time.monotonic() - purged_at >= PURGE_INTERVAL:
+                    OutboxService.purge()
+                    purged_at = time.monotonic()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Outbox dispatch failed: {e}", exc_info=True)
+                published = 0
+            if once:
+                return
+            if published < batch_size:
+                time.sleep(poll_interval)
+
+    @staticmethod
+    def purge(retention_hours: float = None) -> int:
+        """Deletes messages published more than `retention_hours` ago."""
+        if retention_hours is None:
+            retention_hours = current_app.config.get("OUTBOX_RETENTION_HOURS", 24)
+        cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+        deleted = 0
+        while True:
+            ids = (
+                select(OutboxMessage.id)
+                .where(OutboxMessage.dispatched_at < cutoff)
+                .limit(PURGE_BATCH_SIZE)
+                .scalar_subquery()
+            )
+            result = db.session.execute(
+                delete(OutboxMessage)
+                .where(OutboxMessage.id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            deleted += result.rowcount
+            if result.rowcount < PURGE_BATCH_SIZE:
+                return deleted
+
+    @staticmethod
+    def stats() -> dict:
+        """Pending and failing message counts, and the age of the oldest."""
+        pending = OutboxMessage.dispatched_at.is_(None)
+        count, failing, oldest = (
+            db.session.query(
+                db.func.count(OutboxMessage.id),
+                db.func.count(OutboxMessage.id).filter(OutboxMessage.attempts > 0),
+                db.func.min(OutboxMessage.created_at),
+            )
+            .filter(pending)
+            .one()
+        )
+        return {
+            "pending": count,
+            "failing": failing,
+            "oldest_seconds": (
+                (datetime.utcnow() - oldest).total_seconds() if oldest else 0
+            ),
+        }
+
+    # --- Private Helper Methods ---
+
+    @staticmethod
+    def _broker_room(batch_size: int) -> int:
+        """
+        Messages the default queue can take before reaching
+        OUTBOX_MAX_QUEUE_DEPTH, or 0 if the broker cannot be reached. Without
+        a limit the broker is not probed: publishing errors are retried anyway.
+        """
+        max_depth = current_app.config.get("OUTBOX_MAX_QUEUE_DEPTH", 0)
+        if not max_depth:
+            return batch_size
+        try:
+            depth = OutboxService._queue_depth(celery_app.conf.task_default_queue)
+        except Exception as e:
+            logger.warning(f"Outbox: broker unavailable, not dispatching: {e}")
+            return 0
+        room = max_depth - depth
+        if room <= 0:
+            logger.warning(
+                f"Outbox: broker queue holds {depth} messages "
+                f"(limit {max_depth}); holding back."
+            )
+        return room
+
+    @staticmethod
+    def _queue_depth(queue: str) -> int:
+        """
+        Messages waiting in `queue`. A queue that does not exist, such as a
+        drained Redis queue whose list key is gone, fails the passive declare
+        with NOT_FOUND and holds nothing.
+        """
+        with celery_app.connection_for_write() as connection:
+            try:
+                return connection.default_channel.queue_declare(
+                    queue=queue, passive=True
+                ).message_count
+            except connection.channel_errors:
+                return 0
+
+    @staticmethod
+    def _schedule_retry(messages, now, error) -> None:
+        logger.error(
+            f"Outbox: could not publish {len(messages)} messages, will retry: {error}"
+        )
+        for message in messages:
+            message.attempts += 1
+            delay = min(RETRY_DELAY * 2 ** (message.attempts - 1), MAX_RETRY_DELAY)
+            message.available_at = now + timedelta(seconds=delay)
+            message.last_error = str(error)[:1000]
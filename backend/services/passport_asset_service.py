@@ -0,0 +1,211 @@
+"""
+Service layer for rendering the digital assets of serialized item passports.
+
+Creating a stock batch only inserts database rows; the HTML page, PDF and QR
+code of every passport are rendered afterwards by Celery workers, in chunks,
+so the product row is never locked while files are produced. Each passport
+records its asset paths (or the error that prevented them), which is also what
+batch progress is computed from.
+"""
+
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote
+
+import qrcode
+from flask import current_app, render_template
+from sqlalchemy import func, update
+from sqlalchemy.orm import joinedload
+
+from ..database import db
+from ..models import ProductPassport, SerializedItem
+from ..utils.pdf_renderer import get_browser_pool
+
+# Passports rendered per Celery task.
+ASSET_CHUNK_SIZE = 50
+
+
+class PassportAssetService:
+    """
+    Renders passport assets in chunks and reports per-batch progress.
+    """
+
+    @staticmethod
+    def enqueue_batch(batch_id: str, passport_ids: list):
+        """Queues asset rendering for a freshly created batch. Call after the commit."""
+        from ..tasks import generate_passport_assets_task
+
+        chunk_size = current_app.config.get(
+            "PASSPORT_ASSET_CHUNK_SIZE", ASSET_CHUNK_SIZE
+        )
+        for start in range(0, len(passport_ids), chunk_size):
+            chunk = [str(pid) for pid in passport_ids[start : start + chunk_size]]
+            generate_passport_assets_task.delay(batch_id, chunk)
+
+    @staticmethod
+    def render_chunk(passport_ids: list) -> int:
+        """
+        Renders the HTML, PDF and QR code of the given passports and records
+        their paths. Passports that already have assets are skipped, so a
+        retried chunk only redoes what is missing. Returns the number rendered.
+        """
+        passport_ids = [uuid.UUID(str(pid)) for pid in passport_ids]
+        passports = (
+            ProductPassport.query.options(
+                joinedload(ProductPassport.serialized_item).joinedload(
+                    SerializedItem.product
+                )
+            )
+            .filter(
+                ProductPassport.id.in_(passport_ids),
+                ProductPassport.assets_generated_at.is_(None),
+            )
+            .all()
+        )
+        if not passports:
+            return 0
+
+        directories = PassportAssetService._storage_directories()
+        pages = {}
+        for passport in passports:
+            item = passport.serialized_item
+            url = PassportAssetService.get_passport_url(item.uid)
+            pages[passport.id] = render_template(
+                "non-email/product_passport.html", item=item, passport_url=url
+            )
+
+        # PDFs render concurrently, one per pooled browser.
+        pool = get_browser_pool()
+        with ThreadPoolExecutor(max_workers=pool.size) as executor:
+            pdf_jobs = {
+                passport_id: executor.submit(pool.render_pdf, html)
+                for passport_id, html in pages.items()
+            }
+
+            updates = []
+            for passport in passports:
+                try:
+                    updates.append(
+                        PassportAssetService._write_assets(
+                            passport,
+                            pages[passport.id],
+                            pdf_jobs[passport.id].result(),
+                            directories,
+                        )
+                    )
+                except Exception as e:
+                    current_app.logger.error(
+                        f"Failed to render assets for passport {passport.id}: {e}",
+                        exc_info=True,
+                    )
+                    updates.append({"id": passport.id, "asset_error": str(e)})
+
+        db.session.execute(update(ProductPassport), updates)
+        db.session.commit()
+        return sum(1 for row in updates if "asset_error" not in row)
+
+    @staticmethod
+    def get_batch_progress(batch_id: str) -> dict:
+        """Returns how many passports of a batch have their assets rendered."""
+        total, completed, failed = (
+            db.session.query(
+                func.count(ProductPassport.id),
+                func.count(ProductPassport.assets_generated_at),
+                func.count(ProductPassport.asset_error),
+            )
+            .join(
+                SerializedItem, SerializedItem.id == ProductPassport.serialized_item_id
+            )
+            .filter(SerializedItem.batch_id == batch_id)
+            .one()
+        )
+        pending = total - completed - failed
+        if not total:
+            status = "unknown"
+        elif pending:
+            status = "in_progress"
+        else:
+            status = "failed" if failed else "completed"
+        return {
+            "batch_id": batch_id,
+            "total": total,
+            "completed": completed,
+            "failed": failed,
+            "pending": pending,
+            "status": status,
+        }
+
+    @staticmethod
+    def get_passport_url(uid: str) -> str:
+        """
+        Public URL of an item's passport, as encoded in its QR code. It is
+        served by `passport_bp.get_public_passport_page`.
+        """
+        base_url = current_app.config["BASE_URL"].rstrip("/")
+        return f"{base_url}/api/passport/item/{quote(uid, safe='')}"
+
+    @staticmethod
+    def get_passport_page(uid: str):
+        """
+        Returns the HTML passport page of an item, or None if the item has no
+        passport. The rendered file is served once it exists; until then the
+        page is rendered on the fly.
+        """
+        item = (
+            SerializedItem.query.options(
+                joinedload(SerializedItem.passport),
+                joinedload(SerializedItem.product),
+            )
+            .filter_by(uid=uid)
+            .first()
+        )
+        if item is None or item.passport is None:
+            return None
+        path = item.passport.html_file_path
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        return render_template(
+            "non-email/product_passport.html",
+            item=item,
+            passport_url=PassportAssetService.get_passport_url(uid),
+        )
+
+    # --- Internal helpers ---
+
+    @staticmethod
+    def _storage_directories():
+        directories = (
+            current_app.config["PASSPORT_HTML_STORAGE_PATH"],
+            current_app.config["PASSPORT_PDF_STORAGE_PATH"],
+            current_app.config["QR_CODE_STORAGE_PATH"],
+        )
+        for directory in directories:
+            os.makedirs(directory, exist_ok=True)
+        return directories
+
+    @staticmethod
+    def _write_assets(passport, html, pdf, directories) -> dict:
+        """Writes one passport's files and returns the row update recording them."""
+        html_dir, pdf_dir, qr_dir = directories
+        uid = passport.serialized_item.uid
+        html_path = os.path.join(html_dir, f"{uid}.html")
+        pdf_path = os.path.join(pdf_dir, f"{uid}.pdf")
+        qr_path = os.path.join(qr_dir, f"{uid}.png")
+
+        with open(html_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        with open(pdf_path, "wb") as f:
+            f.write(pdf)
+        qrcode.make(PassportAssetService.get_passport_url(uid)).save(qr_path)
+
+        return {
+            "id": passport.id,
+            "html_file_path": html_path,
+            "pdf_file_path": pdf_path,
+            "qr_code_file_path": qr_path,
+            "assets_generated_at": datetime.utcnow(),
+            "asset_error": None,
+        }
@@ -1,12 +1,12 @@
 import os
 
 from flask import current_app, render_template
-from playwright.sync_api import sync_playwright
 
 from backend.database import db
 from backend.models.passport_models import ProductPassport
 from backend.models.product_models import Product
 
+from ..utils.pdf_renderer import render_pdf
 from .exceptions import NotFoundException, ServiceError
 from .monitoring_service import MonitoringService
 
@@ -47,41 +47,27 @@ class PassportService:
             # 3. Render an HTML template with the context
             html_string = render_template(template_name, **context)
 
-            # 4. Use a library  to convert the HTML to PDF
-            with sync_playwright() as p:
-                # Launch a headless Chromium browser instance.
-                # The first time this runs, it might feel slow as it starts the browser process.
-                browser = p.chromium.launch()
-
-                # Create a new page (like a new tab).
-                page = browser.new_page()
-
-                # Set the content of the page to your HTML string.
-                # Playwright's browser engine will render this exactly like Chrome would.
-                page.set_content(html_string)
-
-                # Generate the PDF from the rendered page.
-                # This returns the PDF content as bytes, which we store in the `pdf_file` variable.
-                # This is efficient as it all happens in memory without writing temporary files.
-                page.pdf(
-                    format="A4",  # Standard page size
-                    print_background=True,  # Ensures CSS backgrounds are included
-                    margin={
-                        "top": "20mm",
-                        "bottom": "20mm",
-                        "left": "15mm",
-                        "right": "15mm",
-                    },
-                )
-
-                # Close the browser instance to free up resources.
-                browser.close()
-
-            # 5. Save the PDF (e.g., to a cloud storage bucket) and update the passport record
-            filename = f"passports/passport-{passport.id}-{passport.product.sku}.pdf"
-            # cloud_storage.save(pdf_file, filename) # Real implementation
-
-            passport.pdf_url = filename
+            # 4. Convert the HTML to PDF with the worker's pooled headless browser.
+            # The browser stays running between documents, so only the first
+            # PDF rendered by a worker pays the Chromium startup cost.
+            pdf = render_pdf(
+                html_string,
+                margin={
+                    "top": "20mm",
+                    "bottom": "20mm",
+                    "left": "15mm",
+                    "right": "15mm",
+                },
+            )
+
+            # 5. Save the PDF and record its path on the passport
+            pdf_dir = current_app.config["PASSPORT_PDF_STORAGE_PATH"]
+            os.makedirs(pdf_dir, exist_ok=True)
+            filename = os.path.join(pdf_dir, f"passport-{passport.id}.pdf")
+            with open(filename, "wb") as f:
+                f.write(pdf)
+
+            passport.pdf_file_path = filename
             # Assuming a status field exists on the passport model to track generation
             if hasattr(passport, "status"):
                 passport.status = "generated"
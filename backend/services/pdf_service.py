@@ -5,7 +5,8 @@ import os
 from datetime import datetime
 
 from flask import current_app, render_template
-from playwright.sync_api import sync_playwright
+
+from ..utils.pdf_renderer import render_pdf
 
 
 class PDFService:
@@ -40,12 +41,9 @@ class PDFService:
             file_name = f"invoice_{order.id}_{datetime.utcnow().timestamp()}.pdf"
             file_path = os.path.join(pdf_folder, file_name)
 
-            with sync_playwright() as p:
-                browser = p.chromium.launch()
-                page = browser.new_page()
-                page.set_content(html_string)
-                page.pdf(path=file_path, format="A4", print_background=True)
-                browser.close()
+            # Rendered by this worker's pooled browser; no Chromium launch per PDF.
+            with open(file_path, "wb") as fh:
+                fh.write(render_pdf(html_string))
 
             self.logger.info(f"Successfully generated invoice: {file_path}")
             return file_path
@@ -74,12 +72,9 @@ class PDFService:
             file_name = f"passport_{sku}_{int(datetime.utcnow().timestamp())}.pdf"
             file_path = os.path.join(pdf_folder, file_name)
 
-            with sync_playwright() as p:
-                browser = p.chromium.launch()
-                page = browser.new_page()
-                page.set_content(html_string)
-                page.pdf(path=file_path, format="A4", print_background=True)
-                browser.close()
+            # Rendered by this worker's pooled browser; no Chromium launch per PDF.
+            with open(file_path, "wb") as fh:
+                fh.write(render_pdf(html_string))
 
             self.logger.info(f"Successfully generated passport PDF: {file_path}")
             return file_path
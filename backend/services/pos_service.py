@@ -7,8 +7,7 @@ import logging
 from backend.database import db
 
 from ..models import Order, OrderItem, Product, User, db
-from .exceptions import InsufficientStockException
-from .inventory_service import InventoryService
+from .inventory_service import InventoryService, quantities_by_product
 from .order_service import OrderService
 from .pdf_service import PDFService
 
@@ -29,10 +28,9 @@ class POSService:
     def process_pos_sale(self, sale_data):
         """
         Processes a Point-of-Sale transaction.
-        - Validates inventory
+        - Takes the stock of all items at once
         - Creates an order
         - Processes payment (mocked)
-        - Adjusts inventory
         - Generates a receipt (mocked)
         """
         customer_id = sale_data.get("customer_id")
@@ -40,23 +38,28 @@ class POSService:
             "items", []
         )  # Expects a list of {'product_id': x, 'quantity': y}
 
-        # Step 1: Validate that there is enough stock for all items in the sale.
-        for item_data in items:
-            if not self.inventory_service.check_stock(
-                item_data["product_id"], item_data["quantity"]
-            ):
-                product = Product.query.get(item_data["product_id"])
-                raise InsufficientStockException(
-                    f"Not enough stock for product: {product.name}"
-                )
+        # Step 1: Lock and take the stock of every item at once. Nothing is
+        # committed until the order is, so a failed payment puts it back.
+        self.inventory_service.reserve_many(
+            quantities_by_product(
+                (item_data["product_id"], item_data["quantity"]) for item_data in items
+            ),
+            reason="POS Sale",
+        )
 
         # Step 2: Calculate total and create the Order object.
         User.query.get(customer_id) if customer_id else None
 
+        products = {
+            product.id: product
+            for product in Product.query.filter(
+                Product.id.in_([item_data["product_id"] for item_data in items])
+            )
+        }
         total_amount = 0
         order_items = []
         for item_data in items:
-            product = Product.query.get(item_data["product_id"])
+            product = products[item_data["product_id"]]
             quantity = item_data["quantity"]
             item_total = product.price * quantity
             total_amount += item_total
@@ -78,19 +81,15 @@ class POSService:
         )
 
         if not payment_successful:
+            db.session.rollback()
             return {"success": False, "error": "Payment processing failed."}
 
+        # The order and the stock decrements are committed together.
         new_order.payment_status = "PAID"
         db.session.add(new_order)
         db.session.commit()
 
-        # Step 4: Adjust inventory levels now that the sale is confirmed.
-        for item_data in items:
-            self.inventory_service.decrease_stock(
-                item_data["product_id"], item_data["quantity"]
-            )
-
-        # Step 5: Generate a receipt for the customer.
+        # Step 4: Generate a receipt for the customer.
         # This is a mock; it would ideally generate a PDF or send a digital receipt.
         receipt_url = self.pdf_service.generate_receipt_for_order(new_order.id)
 
@@ -0,0 +1,334 @@
+"""
+Service layer for the in-process product search index.
+
+Each worker holds a read-only `SearchIndex` in memory. Indexes are published
+as gzipped snapshots in Redis, one key per version, next to the current
+version number, so every host reads the same snapshot. Workers notice a new
+version on their next search, load its snapshot and swap it in: searches never
+take a lock and never wait for a write.
+
+New products and writes to indexed data (a product's name, description, base
+SKU or tags, its variants' SKUs, a tag's name) are picked up by ORM events,
+whichever code path makes them. The changed product IDs are added to the
+outbox in the same transaction, and the `tasks.update_search_index` Celery
+task applies them to a copy of the latest snapshot and publishes the result.
+Publishing is serialized by a Redis lock, so concurrent updates never
+overwrite each other.
+"""
+
+import logging
+import threading
+
+from flask import current_app
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session, selectinload
+
+from ..extensions import db, redis_client
+from ..models.product_models import Product, ProductVariant, Tag, product_tags
+from ..utils.cache_helpers import (
+    get_product_search_snapshot_key,
+    get_product_search_version_key,
+)
+from ..utils.search_index import SearchIndex
+from .outbox_service import OutboxService
+
+logger = logging.getLogger(__name__)
+
+# Product attributes whose changes alter its search document.
+INDEXED_PRODUCT_FIELDS = ("name", "description", "base_sku", "is_deleted", "tags")
+
+# Seconds a replaced snapshot is kept for workers still loading it.
+SNAPSHOT_GRACE_SECONDS = 300
+PUBLISH_LOCK_KEY = "product_search:publish_lock"
+# Seconds before a publish lock held by a dead worker is released; longer
+# than a full rebuild.
+PUBLISH_LOCK_TIMEOUT = 600
+
+
+class ProductSearchService:
+    """
+    Builds, publishes and queries the product search index.
+    """
+
+    _index = None
+    _version = None
+    # Serializes snapshot loads within the process; searches never take it.
+    _load_lock = threading.Lock()
+
+    @staticmethod
+    def search(query: str, limit: int = 10) -> list[int]:
+        """Returns the IDs of the best matching products, most relevant first."""
+        return ProductSearchService._get_index().search(query, limit=limit)
+
+    @staticmethod
+    def index_product(product_id: int):
+        """
+        Queues the re-indexing of a product in the current transaction.
+        Soft-deleted products are dropped from the index. Does not commit.
+        """
+        ProductSearchService._enqueue_update([product_id])
+
+    @staticmethod
+    def remove_product(product_id: int):
+        """Queues the removal of a product in the current transaction. Does not commit."""
+        ProductSearchService._enqueue_update([], [product_id])
+
+    @staticmethod
+    def update_products(product_ids, removed_ids=()):
+        """
+        Re-indexes `product_ids` and drops `removed_ids` in a copy of the
+        latest snapshot, then publishes it. Run by `tasks.update_search_index`.
+        """
+        with ProductSearchService._publish_lock():
+            version, index = ProductSearchService._fetch_snapshot()
+            if index is None:
+                index = ProductSearchService._build_from_db()
+            else:
+                documents = ProductSearchService._load_documents(
+                    db.session, product_ids
+                )
+                for product_id, document in documents.items():
+                    if document is None:
+                        index.remove(product_id)
+                    else:
+                        index.add(product_id, document)
+            for product_id in removed_ids:
+                index.remove(product_id)
+            ProductSearchService._publish(index, version)
+        return index
+
+    @staticmethod
+    def rebuild():
+        """Rebuilds the whole index from the database and publishes it."""
+        with ProductSearchService._publish_lock():
+            version = ProductSearchService._current_version()
+            index = ProductSearchService._build_from_db()
+            ProductSearchService._publish(index, version)
+        current_app.logger.info(
+            f"Product search index rebuilt with {len(index)} products."
+        )
+        return index
+
+    # --- Internal helpers ---
+
+    @staticmethod
+    def _build_from_db():
+        index = SearchIndex()
+        products = (
+            db.session.query(Product)
+            .options(selectinload(Product.tags), selectinload(Product.variants))
+            .filter(Product.is_deleted.is_(False))
+            .yield_per(500)
+        )
+        for product in products:
+            index.add(product.id, ProductSearchService._document(product))
+        return index
+
+    @staticmethod
+    def _document(product) -> dict:
+        return ProductSearchService._make_document(
+            product.name,
+            product.description,
+            [product.base_sku] + [variant.sku for variant in product.variants],
+            [tag.name for tag in product.tags],
+        )
+
+    @staticmethod
+    def _make_document(name, description, skus, tag_names) -> dict:
+        return {
+            "name": name,
+            "sku": " ".join(sku for sku in skus if sku),
+            "tags": " ".join(tag_names),
+            "description": description or "",
+        }
+
+    @staticmethod
+    def _load_documents(session, product_ids) -> dict:
+        """
+        Builds the documents of `product_ids` with Core queries, which leave
+        the session's objects untouched. Missing or soft-deleted products map
+        to None.
+        """
+        connection = session.connection()
+        products = Product.__table__
+        variants = ProductVariant.__table__
+        product_ids = list(product_ids)
+        rows = connection.execute(
+            select(
+                products.c.id,
+                products.c.name,
+                products.c.description,
+                products.c.base_sku,
+            ).where(products.c.id.in_(product_ids), products.c.is_deleted.is_(False))
+        ).all()
+        skus = {row.id: [row.base_sku] for row in rows}
+        for product_id, sku in connection.execute(
+            select(variants.c.product_id, variants.c.sku).where(
+                variants.c.product_id.in_(list(skus))
+            )
+        ):
+            skus[product_id].append(sku)
+        tag_names = {row.id: [] for row in rows}
+        for product_id, name in connection.execute(
+            select(product_tags.c.product_id, Tag.__table__.c.name)
+            .join(Tag.__table__, Tag.__table__.c.id == product_tags.c.tag_id)
+            .where(product_tags.c.product_id.in_(list(tag_names)))
+        ):
+            tag_names[product_id].append(name)
+
+        documents = dict.fromkeys(product_ids)
+        for row in rows:
+            documents[row.id] = ProductSearchService._make_document(
+                row.name, row.description, skus[row.id], tag_names[row.id]
+            )
+        return documents
+
+    @staticmethod
+    def _enqueue_update(product_ids, removed_ids=()):
+        OutboxService.enqueue(
+            "tasks.update_search_index", sorted(product_ids), sorted(removed_ids)
+        )
+
+    @staticmethod
+    def _get_index():
+        """
+        Returns this worker's index, loading the latest snapshot when a newer
+        version was published. While one thread loads it, the others keep
+        searching the previous index. Without any snapshot, the index is built
+        from the database and published.
+        """
+        index = ProductSearchService._index
+        version = ProductSearchService._current_version()
+        if index is not None and version == ProductSearchService._version:
+            return index
+        if not ProductSearchService._load_lock.acquire(blocking=index is None):
+            return index
+        try:
+            version, loaded = ProductSearchService._fetch_snapshot()
+            if loaded is None:
+                with ProductSearchService._publish_lock():
+                    # Another worker may have published while this one waited.
+                    version, loaded = ProductSearchService._fetch_snapshot()
+                    if loaded is None:
+                        current_app.logger.info(
+                            "No product search snapshot found; building one."
+                        )
+                        loaded = ProductSearchService._build_from_db()
+                        version = ProductSearchService._publish(loaded, version)
+            ProductSearchService._index = loaded
+            ProductSearchService._version = version
+            return loaded
+        finally:
+            ProductSearchService._load_lock.release()
+
+    @staticmethod
+    def _current_version():
+        version = redis_client.get(get_product_search_version_key())
+        return int(version) if version is not None else None
+
+    @staticmethod
+    def _fetch_snapshot():
+        """
+        Returns (version, index) for the latest published snapshot; the index
+        is None if there is none, or it expired or has an old format.
+        """
+        version = ProductSearchService._current_version()
+        if version is None:
+            return None, None
+        data = redis_client.get(get_product_search_snapshot_key(version))
+        return version, SearchIndex.loads(data) if data is not None else None
+
+    @staticmethod
+    def _publish(index, previous_version) -> int:
+        """
+        Stores the snapshot of `index` under the next version and makes it
+        current. Callers hold the publish lock. Returns the new version.
+        """
+        version = (previous_version or 0) + 1
+        pipe = redis_client.pipeline()
+        pipe.set(get_product_search_snapshot_key(version), index.dumps())
+        pipe.set(get_product_search_version_key(), version)
+        if previous_version is not None:
+            pipe.expire(
+                get_product_search_snapshot_key(previous_version),
+                SNAPSHOT_GRACE_SECONDS,
+            )
+        pipe.execute()
+        return version
+
+    @staticmethod
+    def _publish_lock():
+        return redis_client.lock(PUBLISH_LOCK_KEY, timeout=PUBLISH_LOCK_TIMEOUT)
+
+
+# --- Index maintenance on writes ---
+
+
+def _pending(session, key):
+    return session.info.setdefault(key, set())
+
+
+@event.listens_for(Product, "after_insert")
+def _product_inserted(mapper, connection, target):
+    _pending(object_session(target), "search_product_ids").add(target.id)
+
+
+@event.listens_for(Product, "after_update")
+def _product_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(
+        state.attrs[field].history.has_changes() for field in INDEXED_PRODUCT_FIELDS
+    ):
+        _pending(object_session(target), "search_product_ids").add(target.id)
+
+
+@event.listens_for(ProductVariant, "after_insert")
+@event.listens_for(ProductVariant, "after_delete")
+def _variant_added_or_deleted(mapper, connection, target):
+    _pending(object_session(target), "search_product_ids").add(target.product_id)
+
+
+@event.listens_for(ProductVariant, "after_update")
+def _variant_updated(mapper, connection, target):
+    if inspect(target).attrs.sku.history.has_changes():
+        _pending(object_session(target), "search_product_ids").add(target.product_id)
+
+
+@event.listens_for(ProductVariant.product_id, "set", active_history=True)
+def _variant_moved(target, value, oldvalue, initiator):
+    # A variant moved to another product changes both documents.
+    session = object_session(target)
+    if session is not None and isinstance(oldvalue, int) and oldvalue != value:
+        _pending(session, "search_product_ids").update({oldvalue, value})
+
+
+@event.listens_for(Tag, "after_update")
+def _tag_renamed(mapper, connection, target):
+    if inspect(target).attrs.name.history.has_changes():
+        _pending(object_session(target), "search_tag_ids").add(target.id)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _enqueue_pending_updates(session, flush_context):
+    product_ids = session.info.pop("search_product_ids", set())
+    tag_ids = session.info.pop("search_tag_ids", set())
+    if tag_ids:
+        product_ids.update(
+            session.connection()
+            .execute(
+                select(product_tags.c.product_id).where(
+                    product_tags.c.tag_id.in_(list(tag_ids))
+                )
+            )
+            .scalars()
+        )
+    product_ids.discard(None)
+    if product_ids:
+        # Committed, or rolled back, with the writes that changed the products.
+        ProductSearchService._enqueue_update(product_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_updates(session):
+    for key in ("search_product_ids", "search_tag_ids"):
+        session.info.pop(key, None)
@@ -1,87 +1,72 @@
 # backend/Services/product_service.py
-from sqlalchemy import func
+import json
+from decimal import Decimal
+
+from sqlalchemy import event, func, inspect
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm import Session, joinedload, object_session, selectinload
 
-from backend.extensions import cache, db
+from backend.extensions import cache, db, tiered_cache
 from backend.models import Category, Collection, Product
 from backend.models.b2b_loyalty_models import LoyaltyTier
 from backend.models.order_models import OrderItem
-from backend.models.product_models import ProductVariant, Stock
+from backend.models.product_models import ProductImage, ProductVariant, Stock
 from backend.services.audit_log_service import AuditLogService
+from backend.services.catalog_visibility_service import CatalogVisibilityService
+from backend.services.co_purchase_service import CoPurchaseService
 from backend.services.exceptions import (
     DuplicateProductError,
     InvalidAPIRequestError,
     NotFoundException,
-    ProductNotFoundError,
     ServiceError,
     ValidationException,
 )
 from backend.services.monitoring_service import MonitoringService
+from backend.services.product_search_service import ProductSearchService
 from backend.utils.cache_helpers import (
+    PRODUCTS_TAG,
+    bump_cache_tags,
     clear_product_cache,
-    get_product_by_id_key,
     get_product_by_slug_key,
-    get_product_list_key,
+    get_product_payload_key,
+    get_tag_generation_key,
+    get_tag_generations,
+    product_tag,
 )
 from backend.utils.input_sanitizer import InputSanitizer
+from backend.utils.pagination import keyset_paginate
+
+# Upper bound on search-index matches applied as a listing filter.
+SEARCH_FILTER_LIMIT = 1000
+
+# Payloads are invalidated by tag generation bumps; the timeout only bounds memory.
+PRODUCT_PAYLOAD_TIMEOUT = 86400
 
 
 class ProductService:
     def __init__(self, logger):
         self.logger = logger
 
-    def get_all_products(self, user=None, filters=None, page=1, per_page=20):
-        """Retrieves all products from the database, with caching."""
-        cache_key = get_product_list_key()
-        products = cache.get(cache_key)
-        if products is None:
-            products = (
-                Product.query.options(joinedload(Product.category))
-                .order_by(Product.name)
-                .all()
-            )
-            cache.set(cache_key, products, timeout=3600)  # Cache for 1 hour
+    def get_all_products_paginated(
+        self,
+        user=None,
+        filters=None,
+        page=1,
+        per_page=20,
+        cursor=None,
+        visible_only=True,
+    ):
+        """
+        Retrieves the products visible to `user`, filtered and paginated.
+        Admin listings pass `visible_only=False` to see the whole catalog.
 
-        # Start with base query
+        Passing a `cursor` (an empty string for the first page) switches from
+        OFFSET pagination to keyset pagination and returns a `CursorPage`.
+        """
         query = Product.query.options(joinedload(Product.category))
-
-        # --- User-based Filtering (Visibility & Tier Restrictions) ---
-        if user:
-            # Filter by B2C/B2B visibility
-            if hasattr(user, "is_b2b") and user.is_b2b:
-                query = query.filter(Product.is_b2b_visible)
-            else:
-                query = query.filter(Product.is_b2c_visible)
-
-            # Handle tier-specific restrictions
-            products_with_restrictions = (
-                db.session.query(Product.id).join("restricted_to_tiers").distinct()
-            )
-
-            if hasattr(user, "loyalty") and user.loyalty:
-                # User has loyalty info, so they can see non-restricted items
-                # OR items restricted to their specific tier.
-                query = query.filter(
-                    ~Product.id.in_(products_with_restrictions)
-                    | (
-                        Product.id.in_(
-                            db.session.query(Product.id)
-                            .join("restricted_to_tiers")
-                            .filter(LoyaltyTier.id == user.loyalty.tier_id)
-                        )
-                    )
-                )
-            else:
-                # User has no loyalty info, they can only see non-restricted items
-                query = query.filter(~Product.id.in_(products_with_restrictions))
-        else:
-            # For non-logged-in users, show only public B2C products with no tier restrictions
-            query = query.filter(Product.is_b2c_visible)
-            products_with_restrictions = (
-                db.session.query(Product.id).join("restricted_to_tiers").distinct()
-            )
-            query = query.filter(~Product.id.in_(products_with_restrictions))
+        if visible_only:
+            # --- User-based Filtering (Visibility & Tier Restrictions) ---
+            query = query.filter(CatalogVisibilityService.visibility_filter(user))
 
         # --- Standard Filtering ---
         if filters:
@@ -100,30 +85,92 @@ class ProductService:
                 query = query.filter(Product.is_active == filters["is_active"])
 
             if filters.get("search"):
-                search_term = f"%{filters['search']}%"
-                query = query.filter(
-                    db.or_(
-                        Product.name.ilike(search_term),
-                        Product.description.ilike(search_term),
-                    )
+                matching_ids = ProductSearchService.search(
+                    filters["search"], limit=SEARCH_FILTER_LIMIT
                 )
+                query = query.filter(Product.id.in_(matching_ids))
 
+        if cursor is not None:
+            # IDs grow with creation time, so newest-first keysets on the
+            # primary key alone.
+            return keyset_paginate(
+                query, Product.id, Product.id, cursor=cursor, per_page=per_page
+            )
         return query.order_by(Product.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
 
     @staticmethod
-    def get_product_by_slug_cached(slug):
-        """Retrieves a single product by its slug, with caching."""
-        cache_key = get_product_by_slug_key(slug)
-        product = cache.get(cache_key)
-        if product is None:
-            product = Product.query.filter_by(slug=slug).first()
-            if product:
-                cache.set(cache_key, product, timeout=3600)
-                # Also cache by ID for consistency
-                cache.set(get_product_by_id_key(product.id), product, timeout=3600)
-        return product
+    def get_product_payload_json(product_id: int, view="public"):
+        """
+        Returns the serialized JSON bytes of a product in the given customer
+        view ("public", "b2b", or "detail" for the `ProductSchema` output of
+        the product page), or None if the product does not exist.
+
+        Payloads are cached together with the generations of the `products`
+        and `product:<id>` tags they were built under; generations and payload
+        are fetched together, from process memory or in a single round trip,
+        and a stale payload is rebuilt.
+        """
+        tags = (PRODUCTS_TAG, product_tag(product_id))
+        payload_key = get_product_payload_key(product_id, view)
+        *generations, cached = tiered_cache.get_many(
+            *[get_tag_generation_key(tag) for tag in tags], payload_key
+        )
+        if None in generations:
+            generations = get_tag_generations(*tags)
+        if cached is not None and cached["generations"] == generations:
+            return cached["json"]
+
+        product = Product.query.options(
+            joinedload(Product.category),
+            joinedload(Product.collection),
+            selectinload(Product.images),
+            selectinload(Product.tags),
+            selectinload(Product.variants).joinedload(ProductVariant.stock),
+        ).get(product_id)
+        if not product:
+            return None
+
+        if view == "detail":
+            from backend.schemas import ProductSchema
+
+            payload = ProductSchema().dump(product)
+        else:
+            payload = product.to_dict(view=view)
+        payload_json = json.dumps(payload, default=str).encode()
+        tiered_cache.set(
+            payload_key,
+            {"generations": generations, "json": payload_json},
+            timeout=PRODUCT_PAYLOAD_TIMEOUT,
+        )
+        return payload_json
+
+    @staticmethod
+    def get_product_payload(product_id: int, view="public"):
+        """Returns the cached serialized product as a dict, or None."""
+        payload_json = ProductService.get_product_payload_json(product_id, view)
+        return json.loads(payload_json) if payload_json is not None else None
+
+    @staticmethod
+    def get_product_by_slug_cached(slug, view="detail"):
+        """
+        Returns the serialized JSON bytes of a product by its slug, or None.
+        The slug is resolved to an ID through a long-lived mapping, then the
+        versioned payload is served without loading the ORM object.
+        """
+        slug_key = get_product_by_slug_key(slug)
+        product_id = cache.get(slug_key)
+        if product_id is None:
+            product_id = (
+                db.session.query(Product.id)
+                .filter_by(slug=slug, is_deleted=False)
+                .scalar()
+            )
+            if product_id is None:
+                return None
+            cache.set(slug_key, product_id, timeout=PRODUCT_PAYLOAD_TIMEOUT)
+        return ProductService.get_product_payload_json(product_id, view)
 
     @staticmethod
     def get_all_products():
@@ -141,38 +188,19 @@ class ProductService:
         """
         Get a single product by ID, handling serialization, visibility, and B2B pricing.
         """
-        # Eager load all relevant relationships
-        product = Product.query.options(
-            selectinload(Product.variants).selectinload(ProductVariant.stock),
-            joinedload(Product.category),
-            selectinload(Product.reviews),
-            selectinload(Product.tags),
-            selectinload(Product.restricted_to_tiers),
-        ).get(product_id)
-
-        if not product:
-            raise NotFoundException(f"Product with ID {product_id} not found")
-
-        # --- Visibility Check ---
+        # --- Visibility & Tier Restriction Check ---
+        # Answered from the precomputed visibility index before touching the
+        # product row, so hidden products cost no query at all.
         is_b2b_user = hasattr(user, "is_b2b") and user.is_b2b
-        if is_b2b_user and not product.is_b2b_visible:
+        if not CatalogVisibilityService.is_visible(product_id, user):
             raise NotFoundException(f"Product with ID {product_id} not found")
-        if not is_b2b_user and not product.is_b2c_visible:
-            raise NotFoundException(f"Product with ID {product_id} not found")
-
-        # --- Tier Restriction Check ---
-        if product.restricted_to_tiers:
-            if not user or not hasattr(user, "loyalty") or not user.loyalty:
-                raise NotFoundException(f"Product with ID {product_id} not found")
-
-            user_tier_id = user.loyalty.tier_id
-            allowed_tier_ids = {tier.id for tier in product.restricted_to_tiers}
-            if user_tier_id not in allowed_tier_ids:
-                raise NotFoundException(f"Product with ID {product_id} not found")
 
         # --- Serialization and Price Calculation ---
+        # The serialized view comes from the versioned payload cache.
         view = "b2b" if is_b2b_user else "public"
-        product_data = product.to_dict(view=view)
+        product_data = ProductService.get_product_payload(product_id, view=view)
+        if product_data is None:
+            raise NotFoundException(f"Product with ID {product_id} not found")
 
         # Calculate B2B-specific price if applicable
         if is_b2b_user:
@@ -180,31 +208,54 @@ class ProductService:
             if user.loyalty and user.loyalty.tier:
                 tier_discount = user.loyalty.tier.discount
 
-            b2b_price = product.price * (1 - tier_discount / 100)
-            product_data["b2c_price"] = product.price
+            price = Decimal(product_data["price"])
+            b2b_price = price * (1 - Decimal(tier_discount) / 100)
+            product_data["b2c_price"] = price
             product_data["b2b_price"] = b2b_price
 
         return product_data
 
     @staticmethod
     def search_products(query, limit=10):
-        """Searches for products by name or SKU for autocomplete."""
-        search_term = f"%{query.lower()}%"
-        return (
-            Product.query.filter(
-                (func.lower(Product.name).like(search_term))
-                | (func.lower(Product.sku).like(search_term))
-            )
-            .limit(limit)
-            .all()
-        )
+        """
+        Searches for products by name, SKU, tags or description for
+        autocomplete, using the in-process search index. Results are ordered
+        by relevance.
+        """
+        product_ids = ProductSearchService.search(query, limit=limit)
+        if not product_ids:
+            return []
+        products = {
+            product.id: product
+            for product in Product.query.filter(Product.id.in_(product_ids)).all()
+        }
+        return [products[pid] for pid in product_ids if pid in products]
 
     @staticmethod
     def get_product_recommendations(product_id, limit=5):
         """
         Gets product recommendations based on co-purchase history.
         "Customers who bought this also bought..."
+
+        Served from the precomputed co-purchase matrix; the live aggregation
+        below is only used until the first matrix has been built.
         """
+        recommended_product_ids = CoPurchaseService.get_neighbours(product_id, limit)
+        if recommended_product_ids is None:
+            recommended_product_ids = ProductService._query_co_purchases(
+                product_id, limit
+            )
+        if not recommended_product_ids:
+            return []
+
+        # Fetch the full product objects, keeping the recommendation order
+        products = Product.query.filter(Product.id.in_(recommended_product_ids)).all()
+        rank = {pid: i for i, pid in enumerate(recommended_product_ids)}
+        return sorted(products, key=lambda product: rank[product.id])
+
+    @staticmethod
+    def _query_co_purchases(product_id, limit):
+        """Ranks co-purchased products with a GROUP BY over all order items."""
         # Find orders that contain the target product
         subquery = (
             db.session.query(OrderItem.order_id)
@@ -227,13 +278,7 @@ class ProductService:
             .limit(limit)
             .all()
         )
-
-        recommended_product_ids = [rec.product_id for rec in recommendations]
-        if not recommended_product_ids:
-            return []
-
-        # Fetch the full product objects for the recommended IDs
-        return Product.query.filter(Product.id.in_(recommended_product_ids)).all()
+        return [rec.product_id for rec in recommendations]
 
     @staticmethod
     def _generate_sku(base_sku, attributes):
@@ -304,6 +349,7 @@ class ProductService:
                 new_product.variants.append(new_variant)
 
             db.session.commit()
+            CatalogVisibilityService.refresh_product(new_product.id)
             MonitoringService.log_info(
                 f"Created new product '{new_product.name}' with {len(new_product.variants)} variants.",
                 "ProductService",
@@ -416,7 +462,8 @@ class ProductService:
         )
 
         db.session.commit()
-        clear_product_cache()
+        clear_product_cache(product_id=new_product.id)
+        CatalogVisibilityService.refresh_product(new_product.id)
         return new_product
 
     @staticmethod
@@ -527,6 +574,34 @@ class ProductService:
                 }
                 product.pairing_suggestions = data["pairing_suggestions"]
 
+            # --- VISIBILITY RULES ---
+            visibility_changed = False
+            for field in ("is_b2c_visible", "is_b2b_visible"):
+                if field in data and bool(data[field]) != getattr(product, field):
+                    changes[field] = {
+                        "old": getattr(product, field),
+                        "new": bool(data[field]),
+                    }
+                    setattr(product, field, bool(data[field]))
+                    visibility_changed = True
+
+            if "restricted_to_tier_ids" in data:
+                old_tier_ids = sorted(
+                    str(tier.id) for tier in product.restricted_to_tiers
+                )
+                new_tier_ids = sorted(
+                    str(tier_id) for tier_id in data["restricted_to_tier_ids"]
+                )
+                if new_tier_ids != old_tier_ids:
+                    changes["restricted_to_tier_ids"] = {
+                        "old": old_tier_ids,
+                        "new": new_tier_ids,
+                    }
+                    product.restricted_to_tiers = LoyaltyTier.query.filter(
+                        LoyaltyTier.id.in_(data["restricted_to_tier_ids"])
+                    ).all()
+                    visibility_changed = True
+
             if changes:
                 AuditLogService.log_action(
                     "PRODUCT_UPDATED",
@@ -544,6 +619,8 @@ class ProductService:
                 and original_slug != product.slug
             ):
                 clear_product_cache(slug=product.slug)
+            if visibility_changed:
+                CatalogVisibilityService.refresh_product(product.id)
 
             MonitoringService.log_info(
                 f"Product updated successfully: {product.name} (ID: {product.id})",
@@ -578,11 +655,13 @@ class ProductService:
             AuditLogService.log_action(
                 "PRODUCT_DELETED", target_id=product.id, details={"name": product.name}
             )
+            ProductSearchService.remove_product(product_id)
 
             db.session.commit()
 
             # Invalidate all caches related to this product
             clear_product_cache(product_id=product_id, slug=product_slug)
+            CatalogVisibilityService.refresh_product(product_id)
 
             MonitoringService.log_info(
                 f"Product soft deleted: {product.name} (ID: {product.id})",
@@ -598,19 +677,6 @@ class ProductService:
             )
             raise ValidationException(f"Failed to delete product: {str(e)}")
 
-    @staticmethod
-    def get_product_by_id(product_id):
-        """
-        Fetches a product by its ID.
-
-        Raises:
-            ProductNotFoundError: If no product with the given ID is found.
-        """
-        product = Product.query.get(product_id)
-        if not product:
-            raise ProductNotFoundError(f"Product with id {product_id} not found.")
-        return product
-
     @staticmethod
     def get_low_stock_products(threshold: int = 10):
         """Get products with low stock levels."""
@@ -632,3 +698,54 @@ class ProductService:
             .having(db.func.count(OrderItem.id) <= threshold)
             .all()
         )
+
+
+# --- Payload invalidation ---
+# Payloads embed the product's image URLs, its variants (SKUs and prices) and
+# its category and collection names, which are also written outside this
+# service (e.g. by the generic admin resource routes). Those writes are
+# collected per session and their tags bumped once the transaction commits.
+
+
+def _pending_tags(session):
+    return session.info.setdefault("product_cache_tags", set())
+
+
+@event.listens_for(ProductImage, "after_insert")
+@event.listens_for(ProductImage, "after_update")
+@event.listens_for(ProductImage, "after_delete")
+@event.listens_for(ProductVariant, "after_insert")
+@event.listens_for(ProductVariant, "after_update")
+@event.listens_for(ProductVariant, "after_delete")
+def _product_child_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        return
+    # An image or variant moved to another product changes both payloads.
+    history = inspect(target).attrs.product_id.history
+    for product_id in {target.product_id, *history.deleted}:
+        if product_id is not None:
+            _pending_tags(session).add(product_tag(product_id))
+
+
+@event.listens_for(Category, "after_update")
+@event.listens_for(Category, "after_delete")
+@event.listens_for(Collection, "after_update")
+@event.listens_for(Collection, "after_delete")
+def _product_grouping_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        # Renames are rare and reach every product of the group.
+        _pending_tags(session).add(PRODUCTS_TAG)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_pending_product_tags(session):
+    tags = session.info.pop("product_cache_tags", None)
+    if tags:
+        bump_cache_tags(*tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_product_tags(session):
+    session.info.pop("product_cache_tags", None)
@@ -0,0 +1,340 @@
+"""
+B2B quick orders: an order placed from a list of SKUs and quantities, posted
+as JSON or uploaded as a CSV file with one "sku,quantity" line per item.
+
+All SKUs of an order are resolved with one query, which also locks their
+`Stock` rows in id order: two quick orders sharing SKUs always lock them in
+the same order, whatever the order of their lines, and cannot deadlock.
+Order items and stock decrements are written with one executemany each.
+
+Uploads are copied to QUICK_ORDER_UPLOAD_DIR and the Celery task receives the
+upload id, not the file's content, which would otherwise travel through the
+broker. The task reads the file as a stream, so a 10k-line order is never
+held in memory as text, and reports all invalid lines rather than the first.
+Only the user who uploaded a file can see the state of its task.
+"""
+
+import csv
+import logging
+import os
+import re
+import shutil
+import uuid
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy import any_, bindparam, insert, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..database import db
+from ..extensions import cache
+from ..models import Order, OrderItem, OrderStatusEnum
+from ..models.address_models import Address
+from ..models.product_models import ProductVariant, Stock
+from .exceptions import NotFoundException, ValidationException
+from .outbox_service import OutboxService
+
+logger = logging.getLogger(__name__)
+
+# Line errors returned to the client; the total is always reported.
+MAX_REPORTED_ERRORS = 100
+# Seconds the owner of an upload's task is remembered, as long as Celery
+# keeps task results by default.
+UPLOAD_OWNER_TIMEOUT = 24 * 3600
+_UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def read_quick_order_csv(stream):
+    """
+    Parses a quick-order CSV from a binary stream, line by line. A first line
+    without a numeric quantity is taken as a header. Lines naming the same SKU
+    are added up.
+
+    Returns:
+        (quantities, line_numbers, errors): {sku: quantity}, {sku: first line
+        naming it} and a list of {"line", "error"} for invalid lines.
+
+    Raises:
+        ValidationException: If the file is not UTF-8 text or not CSV; the
+            payload gives the line at fault.
+    """
+    reader = csv.reader(_decode_lines(stream))
+    items = (
+        (reader.line_num, row[0] if row else "", row[1] if len(row) > 1 else "")
+        for row in reader
+        if any(cell.strip() for cell in row)
+    )
+    try:
+        return _collect_items(items, header=True)
+    except csv.Error as e:
+        raise _file_error(reader.line_num, f"Invalid CSV: {e}.") from e
+
+
+def _decode_lines(stream):
+    # Lines are decoded one by one, so an invalid byte is reported at its line.
+    for line_number, raw in enumerate(stream, start=1):
+        try:
+            yield raw.decode("utf-8-sig" if line_number == 1 else "utf-8")
+        except UnicodeDecodeError as e:
+            raise _file_error(
+                line_number, "The file must be UTF-8 encoded text."
+            ) from e
+
+
+def read_quick_order_items(items):
+    """`read_quick_order_csv` for the JSON list of {"sku", "quantity"} items."""
+    rows = (
+        (number, item.get("sku"), item.get("quantity"))
+        if isinstance(item, dict)
+        else (number, None, None)
+        for number, item in enumerate(items, start=1)
+    )
+    return _collect_items(rows)
+
+
+def _collect_items(rows, header=False):
+    quantities = {}
+    line_numbers = {}
+    errors = []
+    for line_number, sku, quantity in rows:
+        sku = sku.strip() if isinstance(sku, str) else None
+        if isinstance(quantity, str):
+            quantity = int(quantity) if quantity.strip().isdigit() else None
+        elif isinstance(quantity, bool) or not isinstance(quantity, int):
+            quantity = None
+        if header and line_number == 1 and quantity is None:
+            continue
+        if not sku:
+            errors.append({"line": line_number, "error": "Missing SKU."})
+        elif quantity is None or quantity <= 0:
+            errors.append(
+                {
+                    "line": line_number,
+                    "sku": sku,
+                    "error": "Quantity must be a positive integer.",
+                }
+            )
+        else:
+            quantities[sku] = quantities.get(sku, 0) + quantity
+            line_numbers.setdefault(sku, line_number)
+    return quantities, line_numbers, errors
+
+
+class QuickOrderService:
+    @staticmethod
+    def create_order(
+        user_id, quantities: dict[str, int], line_numbers=None, shipping_address_id=None
+    ) -> Order:
+        """
+        Creates and commits an order for `quantities` ({sku: quantity}), taking
+        the stock of each variant.
+
+        Raises:
+            ValidationException: If a SKU is unknown or lacks stock; the
+                payload lists every such line under "errors".
+        """
+        if not quantities:
+            raise ValidationException("No valid items to order.")
+        line_numbers = line_numbers or {}
+        address_id = QuickOrderService._shipping_address_id(
+            user_id, shipping_address_id
+        )
+
+        rows = (
+            db.session.query(
+                ProductVariant.sku,
+                ProductVariant.product_id,
+                ProductVariant.price,
+                Stock.id.label("stock_id"),
+                Stock.quantity,
+            )
+            .join(Stock, Stock.variant_id == ProductVariant.id)
+            .filter(_sku_in(list(quantities)), ProductVariant.is_deleted.is_(False))
+            .order_by(Stock.id)
+            .with_for_update(of=Stock)
+            .all()
+        )
+        variants = {row.sku: row for row in rows}
+
+        errors = []
+        for sku, quantity in quantities.items():
+            row = variants.get(sku)
+            if row is None:
+                error = "Unknown SKU."
+            elif row.quantity < quantity:
+                error = f"Insufficient stock: {row.quantity} available."
+            else:
+                continue
+            errors.append({"line": line_numbers.get(sku), "sku": sku, "error": error})
+        if errors:
+            db.session.rollback()
+            errors.sort(key=lambda e: e["line"] or 0)
+            raise ValidationException(
+                "Some lines of the quick order cannot be fulfilled.",
+                payload=_errors_payload(errors),
+            )
+
+        total = sum(
+            (Decimal(variants[sku].price) * qty for sku, qty in quantities.items()),
+            Decimal("0"),
+        )
+        order = Order(
+            user_id=user_id,
+            shipping_address_id=address_id,
+            billing_address_id=address_id,
+            order_status=OrderStatusEnum.PROCESSING,
+            total_amount=total,
+        )
+        db.session.add(order)
+        db.session.flush()
+
+        db.session.execute(
+            insert(OrderItem),
+            [
+                {
+                    "order_id": order.id,
+                    "product_id": variants[sku].product_id,
+                    "quantity": quantity,
+                    "price_at_purchase": variants[sku].price,
+                }
+                for sku, quantity in quantities.items()
+            ],
+        )
+        table = Stock.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam("stock_id"))
+            .values(quantity=table.c.quantity - bindparam("amount")),
+            [
+                {"stock_id": variants[sku].stock_id, "amount": quantity}
+                for sku, quantity in quantities.items()
+            ],
+        )
+        # The confirmation email, with its invoice PDF, once the order is committed.
+        OutboxService.enqueue(
+            "tasks.send_checkout_confirmation",
+            str(order.id),
+            dedup_key=f"order-confirmation:{order.id}",
+        )
+        db.session.commit()
+        logger.info(
+            f"Quick order {order.id} created for user {user_id}: "
+            f"{len(quantities)} SKUs, total {total}."
+        )
+        return order
+
+    # --- CSV uploads ---
+
+    @staticmethod
+    def get_upload_dir() -> str:
+        upload_dir = current_app.config.get("QUICK_ORDER_UPLOAD_DIR") or os.path.join(
+            current_app.config["UPLOAD_FOLDER"], "quick_orders"
+        )
+        os.makedirs(upload_dir, exist_ok=True)
+        return upload_dir
+
+    @staticmethod
+    def store_upload(stream) -> str:
+        """Copies an uploaded CSV to the upload directory; returns its id."""
+        upload_id = uuid.uuid4().hex
+        path = QuickOrderService._upload_path(upload_id)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(stream, f, 1024 * 1024)
+        return upload_id
+
+    @staticmethod
+    def create_order_from_upload(
+        user_id, upload_id: str, shipping_address_id=None, keep_for_retry=False
+    ) -> dict:
+        """
+        Creates the order of a stored upload, then removes the file.
+
+        Args:
+            keep_for_retry: Leave the file in place on a database error, for
+                the task to retry. Any other outcome removes it.
+
+        Returns:
+            {"order_id", "total"} on success, otherwise the "message" and
+            "errors" of the rejected order.
+        """
+        path = QuickOrderService._upload_path(upload_id)
+        if not os.path.exists(path):
+            raise NotFoundException(f"Quick order upload {upload_id} not found.")
+        remove = True
+        try:
+            with open(path, "rb") as f:
+                quantities, line_numbers, errors = read_quick_order_csv(f)
+            if errors:
+                raise ValidationException(
+                    "The file has invalid lines.", payload=_errors_payload(errors)
+                )
+            order = QuickOrderService.create_order(
+                user_id, quantities, line_numbers, shipping_address_id
+            )
+            return {"order_id": str(order.id), "total": str(order.total_amount)}
+        except ValidationException as e:
+            return e.to_dict()
+        except SQLAlchemyError:
+            remove = not keep_for_retry
+            raise
+        finally:
+            if remove:
+                os.remove(path)
+
+    @staticmethod
+    def set_task_owner(task_id: str, user_id) -> None:
+        """Records the user who submitted an upload's task."""
+        cache.set(_task_owner_key(task_id), str(user_id), timeout=UPLOAD_OWNER_TIMEOUT)
+
+    @staticmethod
+    def is_task_owner(task_id: str, user_id) -> bool:
+        """Whether `user_id` submitted the task; unknown tasks have no owner."""
+        owner = cache.get(_task_owner_key(task_id))
+        return owner is not None and owner == str(user_id)
+
+    # --- Private Helper Methods ---
+
+    @staticmethod
+    def _upload_path(upload_id: str) -> str:
+        if not _UPLOAD_ID_RE.match(upload_id or ""):
+            raise ValidationException("Invalid upload id.")
+        return os.path.join(QuickOrderService.get_upload_dir(), f"{upload_id}.csv")
+
+    @staticmethod
+    def _shipping_address_id(user_id, address_id=None):
+        query = db.session.query(Address.id).filter(Address.user_id == user_id)
+        if address_id is not None:
+            query = query.filter(Address.id == address_id)
+        else:
+            query = query.filter(Address.is_default_shipping.is_(True))
+        found = query.scalar()
+        if found is None:
+            raise ValidationException(
+                "A shipping address is required for quick orders."
+            )
+        return found
+
+
+def _sku_in(skus):
+    if db.session.get_bind().dialect.name == "postgresql":
+        # sku = ANY(:skus): one array parameter rather than one per SKU.
+        return ProductVariant.sku == any_(
+            bindparam("skus", skus, type_=ARRAY(db.String))
+        )
+    return ProductVariant.sku.in_(skus)
+
+
+def _errors_payload(errors):
+    return {"errors": errors[:MAX_REPORTED_ERRORS], "error_count": len(errors)}
+
+
+def _file_error(line_number, error):
+    return ValidationException(
+        "The file cannot be read.",
+        payload=_errors_payload([{"line": line_number, "error": error}]),
+    )
+
+
+def _task_owner_key(task_id):
+    return f"quick_order_task_owner:{task_id}"
@@ -1,23 +1,51 @@
+import enum
 import logging
+import threading
+from typing import NamedTuple
+
+from flask import current_app, g, has_app_context
 
 from backend.database import db
-from backend.models.user_models import User, UserRole
+from backend.extensions import tiered_cache
+from backend.models.user_models import Role, User, UserRole
 from backend.services.exceptions import (
     NotFoundException,
     ValidationException,
 )
+from backend.utils.cache_helpers import get_user_roles_key
 
 logger = logging.getLogger(__name__)
 security_logger = logging.getLogger("security")
 
+DEFAULT_ROLES_CACHE_TIMEOUT = 300
+
+
+class PermissionGrant(NamedTuple):
+    """A user's roles and permissions, compiled to bitsets."""
+
+    roles: int
+    permissions: int
+
 
 class RBACService:
     """
     Role-Based Access Control Service.
     Manages user roles and permissions in the system.
+
+    Checks are compiled: every role and permission name gets a bit (names are
+    case-insensitive, so "ADMIN", "Admin" and RoleType.ADMIN are one role),
+    and a user's roles resolve to a `PermissionGrant` whose checks are single
+    bit tests. A user's role names are cached in Redis (with a short-lived
+    copy in each worker) and memoized for the current request; the compiled
+    grant of each distinct role combination is memoized per process. Bits are
+    only ever meaningful inside one process and are never stored.
     """
 
     def __init__(self):
+        self._bits = {}
+        self._bit_counts = {"role": 0, "permission": 0}
+        self._bits_lock = threading.Lock()
+        self._compiled_grants = {}
         # Maps role name to a set of permissions
         self._role_permissions = {
             "Admin": {
@@ -70,37 +98,128 @@ class RBACService:
             "RBACService initialized with default roles and permissions."
         )
 
+    # --- Compiled permission checks ---
+
+    def _bit(self, kind, name):
+        """Returns the bit of a role or permission name, allocating it on first use."""
+        if isinstance(name, enum.Enum):
+            name = name.value
+        key = (kind, str(name).casefold())
+        bit = self._bits.get(key)
+        if bit is None:
+            with self._bits_lock:
+                bit = self._bits.get(key)
+                if bit is None:
+                    bit = self._bits[key] = 1 << self._bit_counts[kind]
+                    self._bit_counts[kind] += 1
+        return bit
+
+    def role_mask(self, *role_names):
+        """Bitmask of the given roles, e.g. to precompute a decorator's check."""
+        mask = 0
+        for name in role_names:
+            mask |= self._bit("role", name)
+        return mask
+
+    def permission_mask(self, *permissions):
+        """Bitmask of the given permissions."""
+        mask = 0
+        for permission in permissions:
+            mask |= self._bit("permission", permission)
+        return mask
+
+    def _compile(self, role_names):
+        """Compiles a set of role names to a grant, once per distinct set."""
+        role_names = frozenset(role_names)
+        grant = self._compiled_grants.get(role_names)
+        if grant is None:
+            permissions = set()
+            for role in role_names:
+                permissions |= self._get_role_permissions_from_storage(role)
+            grant = PermissionGrant(
+                roles=self.role_mask(*role_names),
+                permissions=self.permission_mask(*permissions),
+            )
+            self._compiled_grants[role_names] = grant
+        return grant
+
+    def _policy_changed(self):
+        # Role bits never change; only grants depend on the permission table.
+        self._compiled_grants = {}
+
+    def get_grant(self, user_id):
+        """
+        Returns the compiled `PermissionGrant` of a user. Resolved at most once
+        per request; otherwise served from the cache without touching the users
+        table.
+        """
+        memo = g.setdefault("_rbac_grants", {}) if has_app_context() else {}
+        grant = memo.get(user_id)
+        if grant is None:
+            grant = memo[user_id] = self._compile(self._get_cached_roles(user_id))
+        return grant
+
+    def invalidate_user(self, user_id):
+        """Drops the cached roles of a user, e.g. after their roles changed."""
+        tiered_cache.delete(get_user_roles_key(user_id))
+        if has_app_context():
+            g.setdefault("_rbac_grants", {}).pop(user_id, None)
+
+    def _get_cached_roles(self, user_id):
+        key = get_user_roles_key(user_id)
+        roles = tiered_cache.get(key)
+        if roles is None:
+            roles = self._get_user_roles_from_db(user_id)
+            if roles is None:
+                # Lookup failed: deny for now, but do not cache the empty set.
+                return ()
+            roles = tuple(sorted(roles))
+            tiered_cache.set(
+                key,
+                roles,
+                timeout=current_app.config.get(
+                    "RBAC_ROLES_CACHE_TIMEOUT", DEFAULT_ROLES_CACHE_TIMEOUT
+                ),
+            )
+        return roles
+
     def _get_user_roles_from_db(self, user_id):
         """
         Fetch user roles from the database.
-        Returns a set of role names.
+        Returns a set of role names, or None if the lookup failed.
         """
         try:
-            user = User.query.get(user_id)
-            if not user:
-                return set()
-
-            # Get roles from the user's role relationship
-            if hasattr(user, "roles") and user.roles:
-                return {role.name for role in user.roles}
-            elif hasattr(user, "role") and user.role:
-                # If user has a single role field
-                return {
-                    user.role.name if hasattr(user.role, "name") else str(user.role)
-                }
-            else:
-                return set()
-
+            rows = (
+                db.session.query(Role.name)
+                .join(UserRole, UserRole.role_id == Role.id)
+                .filter(UserRole.user_id == user_id)
+                .all()
+            )
+            return {
+                name.value if isinstance(name, enum.Enum) else str(name)
+                for (name,) in rows
+            }
         except Exception as e:
             logger.error(f"Error fetching roles for user {user_id}: {str(e)}")
-            return set()
+            return None
 
     def _get_role_permissions_from_storage(self, role_name):
         """
-        Get permissions for a specific role.
+        Get permissions for a specific role (case-insensitive).
         Returns a set of permission strings.
         """
-        return self._role_permissions.get(role_name, set())
+        permissions = self._role_permissions.get(role_name)
+        if permissions is None:
+            folded = role_name.casefold()
+            permissions = next(
+                (
+                    perms
+                    for name, perms in self._role_permissions.items()
+                    if name.casefold() == folded
+                ),
+                set(),
+            )
+        return permissions
 
     def add_user(self, user_id):
         """Adds a user to the RBAC system, initially with no roles."""
@@ -140,6 +259,7 @@ class RBACService:
                 if role not in user.roles:
                     user.roles.append(role)
                     db.session.commit()
+                    self.invalidate_user(user_id)
                     security_logger.info(
                         f"Assigned role '{role_name}' to user '{user_id}'."
                     )
@@ -148,6 +268,7 @@ class RBACService:
                 # If user has a single role field
                 user.role = role
                 db.session.commit()
+                self.invalidate_user(user_id)
                 security_logger.info(
                     f"Assigned role '{role_name}' to user '{user_id}'."
                 )
@@ -178,6 +299,7 @@ class RBACService:
             if hasattr(user, "roles") and role in user.roles:
                 user.roles.remove(role)
                 db.session.commit()
+                self.invalidate_user(user_id)
                 security_logger.info(
                     f"Removed role '{role_name}' from user '{user_id}'."
                 )
@@ -197,31 +319,40 @@ class RBACService:
 
     def get_user_roles(self, user_id):
         """Retrieves all roles assigned to a user."""
-        return list(self._get_user_roles_from_db(user_id))
+        return list(self._get_cached_roles(user_id))
 
     def user_has_role(self, user_id, role_name):
         """Checks if a user has a specific role."""
-        return role_name in self._get_user_roles_from_db(user_id)
+        return bool(self.get_grant(user_id).roles & self._bit("role", role_name))
+
+    def user_has_any_role(self, user_id, role_mask):
+        """Checks a user against a mask from `role_mask()`: any role matches."""
+        return bool(self.get_grant(user_id).roles & role_mask)
 
     def user_has_permission(self, user_id, permission):
         """
         Checks if a user has a specific permission via any of their roles.
         This aggregates permissions from all roles the user has.
         """
-        user_roles = self._get_user_roles_from_db(user_id)
-        for role in user_roles:
-            if permission in self._get_role_permissions_from_storage(role):
-                return True
-        return False
+        return bool(
+            self.get_grant(user_id).permissions & self._bit("permission", permission)
+        )
 
     def user_has_permissions(self, user_id, *required_permissions):
         """
         Checks if a user has ALL of the specified permissions.
         """
-        for perm in required_permissions:
-            if not self.user_has_permission(user_id, perm):
-                return False
-        return True
+        mask = self.permission_mask(*required_permissions)
+        return self.get_grant(user_id).permissions & mask == mask
+
+    def get_missing_permissions(self, user_id, *required_permissions):
+        """Returns the required permissions the user lacks."""
+        granted = self.get_grant(user_id).permissions
+        return [
+            permission
+            for permission in required_permissions
+            if not granted & self._bit("permission", permission)
+        ]
 
     def user_is_staff(self, user_id):
         """
@@ -260,6 +391,7 @@ class RBACService:
             raise ValidationException(f"Role '{role_name}' already exists")
 
         self._role_permissions[role_name] = set(permissions)
+        self._policy_changed()
         security_logger.info(
             f"Created new role '{role_name}' with permissions: {permissions}"
         )
@@ -271,6 +403,7 @@ class RBACService:
             raise NotFoundException(f"Role '{role_name}' not found")
 
         self._role_permissions[role_name] = set(permissions)
+        self._policy_changed()
         security_logger.info(
             f"Updated permissions for role '{role_name}': {permissions}"
         )
@@ -286,6 +419,7 @@ class RBACService:
             raise ValidationException(f"Cannot delete critical role '{role_name}'")
 
         del self._role_permissions[role_name]
+        self._policy_changed()
         security_logger.warning(f"Deleted role '{role_name}'")
         return True
 
@@ -0,0 +1,168 @@
+"""
+Vectorized batch engine for personalized product recommendations.
+
+`RecommendationService.get_recommendations_for_user` answers one user with
+several queries. For admin bulk views and email campaigns, this engine loads
+the catalog and best-seller counts once, fetches the purchase history of a
+whole chunk of users with two grouped queries, and scores every (user, product)
+pair of the chunk in a single NumPy pass.
+
+Scoring follows the per-user algorithm: products from the categories a user
+buys most come first, the rest is filled with best-sellers, and products the
+user already bought are excluded.
+"""
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import func
+
+from ..models import Order, OrderItem, Product, db
+
+# Users are scored in chunks so the dense score matrix stays around
+# USER_CHUNK_SIZE x catalog size floats, and IN lists stay reasonably short.
+USER_CHUNK_SIZE = 1000
+
+
+class BulkRecommendationEngine:
+    """
+    Scores recommendations for many users at once.
+
+    Build one engine per batch: the catalog and best-seller counts are loaded
+    on construction and reused for every user passed to `recommend`.
+    """
+
+    def __init__(self):
+        catalog = (
+            db.session.query(Product.id, Product.category_id)
+            .filter(Product.is_deleted.is_(False))
+            .order_by(Product.id)
+            .all()
+        )
+        self.product_ids = np.array([row.id for row in catalog], dtype=np.int64)
+        self._product_position = {pid: i for i, pid in enumerate(self.product_ids)}
+
+        # Uncategorized products never match a preferred category, like the
+        # `category_id IN (...)` filter of the per-user algorithm.
+        # They share the last column, which is zeroed before scoring.
+        category_ids = sorted({row.category_id for row in catalog} - {None})
+        self._category_position = {cid: i for i, cid in enumerate(category_ids)}
+        self._category_position[None] = len(category_ids)
+        self.product_categories = np.array(
+            [self._category_position[row.category_id] for row in catalog],
+            dtype=np.int64,
+        )
+
+        sales = np.zeros(len(self.product_ids), dtype=np.float64)
+        for product_id, order_count in (
+            db.session.query(OrderItem.product_id, func.count(OrderItem.product_id))
+            .group_by(OrderItem.product_id)
+            .all()
+        ):
+            position = self._product_position.get(product_id)
+            if position is not None:
+                sales[position] = order_count
+
+        # Popularity in [0, 1) breaks ties inside a category and ranks the
+        # best-seller fill. Products that never sold score 0: they can still
+        # be recommended from a preferred category, but are not fillers.
+        self.popularity = sales / (sales.max() + 1) if len(sales) else sales
+        self.never_sold = sales == 0
+
+    def recommend(self, user_ids, limit=5) -> dict:
+        """
+        Returns {user_id: [product_id, ...]} with up to `limit` products each,
+        best first. Users without purchases get the best-sellers.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        results = {}
+        for start in range(0, len(user_ids), USER_CHUNK_SIZE):
+            chunk = user_ids[start : start + USER_CHUNK_SIZE]
+            results.update(self._recommend_chunk(chunk, limit))
+        return results
+
+    def serialize(self, recommendations: dict) -> dict:
+        """
+        Replaces product IDs with `Product.to_dict()` payloads, loading and
+        serializing each distinct product only once.
+        """
+        wanted = list({pid for pids in recommendations.values() for pid in pids})
+        payloads = {}
+        for start in range(0, len(wanted), USER_CHUNK_SIZE):
+            ids = wanted[start : start + USER_CHUNK_SIZE]
+            for product in Product.query.filter(Product.id.in_(ids)).all():
+                payloads[product.id] = product.to_dict()
+        return {
+            user_id: [payloads[pid] for pid in pids if pid in payloads]
+            for user_id, pids in recommendations.items()
+        }
+
+    # --- Internal helpers ---
+
+    def _recommend_chunk(self, user_ids, limit):
+        n_products = len(self.product_ids)
+        if not n_products:
+            return {user_id: [] for user_id in user_ids}
+        user_position = {user_id: i for i, user_id in enumerate(user_ids)}
+
+        category_counts = self._user_matrix(
+            user_position,
+            db.session.query(
+                Order.user_id, Product.category_id, func.count(Product.category_id)
+            )
+            .join(OrderItem, OrderItem.product_id == Product.id)
+            .join(Order, Order.id == OrderItem.order_id)
+            .filter(Order.user_id.in_(user_ids))
+            .group_by(Order.user_id, Product.category_id),
+            self._category_position,
+        )
+
+        purchased = self._user_matrix(
+            user_position,
+            db.session.query(Order.user_id, OrderItem.product_id, func.count())
+            .join(Order, Order.id == OrderItem.order_id)
+            .filter(Order.user_id.in_(user_ids))
+            .group_by(Order.user_id, OrderItem.product_id),
+            self._product_position,
+        )
+
+        # Category preference dominates (integer counts), popularity breaks
+        # ties and ranks the best-seller fill.
+        preferences = category_counts.toarray().astype(np.float64)
+        preferences[:, -1] = 0
+        category_scores = preferences[:, self.product_categories]
+        scores = category_scores + self.popularity
+        scores[(category_scores == 0) & self.never_sold] = -np.inf
+        scores[purchased.nonzero()] = -np.inf
+
+        k = min(limit, n_products)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        return {
+            user_id: [
+                int(self.product_ids[position])
+                for position, score in zip(top[i], top_scores[i], strict=True)
+                if score != -np.inf
+            ]
+            for i, user_id in enumerate(user_ids)
+        }
+
+    @staticmethod
+    def _user_matrix(user_position, rows, column_position):
+        """Builds a sparse users x columns count matrix from (user, key, count) rows."""
+        data, row_idx, col_idx = [], [], []
+        for user_id, key, count in rows:
+            column = column_position.get(key)
+            if column is None:
+                # e.g. a product deleted since it was ordered
+                continue
+            row_idx.append(user_position[user_id])
+            col_idx.append(column)
+            data.append(count)
+        return sparse.csr_matrix(
+            (data, (row_idx, col_idx)),
+            shape=(len(user_position), len(column_position)),
+        )
@@ -3,9 +3,15 @@
 from sqlalchemy import func
 
 from ..models import Order, OrderItem, Product, User, db
-from ..services.exceptions import NotFoundException, ServiceError
+from ..services.exceptions import (
+    NotFoundException,
+    ServiceError,
+    ValidationException,
+)
 from ..services.monitoring_service import MonitoringService
 from ..utils.input_sanitizer import InputSanitizer
+from ..utils.pagination import keyset_paginate
+from .recommendation_engine import USER_CHUNK_SIZE, BulkRecommendationEngine
 
 
 class RecommendationService:
@@ -133,66 +139,65 @@ class RecommendationService:
         }
 
     @staticmethod
-    def get_all_customer_recommendations(limit_per_user=5, page=1, per_page=50):
+    def get_all_customer_recommendations(
+        limit_per_user=5, page=1, per_page=50, cursor=None, with_total=False
+    ):
         """
         Get recommendations for all customers with pagination.
         This is for admin bulk view operations.
+
+        Passing a `cursor` (an empty string for the first page) walks users by
+        ID with keyset pagination instead of OFFSET, and only counts them when
+        `with_total` is set.
         """
         try:
             # Get all active users with pagination
             users_query = User.query.filter(User.is_active)
-            total_users = users_query.count()
-
-            users = users_query.offset((page - 1) * per_page).limit(per_page).all()
+            if cursor is not None:
+                users_page = keyset_paginate(
+                    users_query,
+                    User.id,
+                    User.id,
+                    cursor=cursor,
+                    per_page=per_page,
+                    descending=False,
+                    with_total=with_total,
+                )
+                users = users_page.items
+            else:
+                total_users = users_query.count()
+                users = users_query.offset((page - 1) * per_page).limit(per_page).all()
+
+            # Score the whole page in one pass instead of querying per user.
+            engine = BulkRecommendationEngine()
+            recommendations = engine.serialize(
+                engine.recommend([user.id for user in users], limit_per_user)
+            )
 
             all_recommendations = []
-
             for user in users:
-                try:
-                    user_recommendations = (
-                        RecommendationService.get_recommendations_for_user(
-                            user.id, limit_per_user
-                        )
-                    )
+                user_recommendations = recommendations.get(user.id, [])
+                all_recommendations.append(
+                    {
+                        "user_id": user.id,
+                        "user_email": user.email,
+                        "user_name": f"{user.first_name} {user.last_name}".strip(),
+                        "registration_date": user.created_at.isoformat()
+                        if user.created_at
+                        else None,
+                        "last_login": user.last_login.isoformat()
+                        if hasattr(user, "last_login") and user.last_login
+                        else None,
+                        "recommendations": user_recommendations,
+                        "recommendation_count": len(user_recommendations),
+                    }
+                )
 
-                    all_recommendations.append(
-                        {
-                            "user_id": user.id,
-                            "user_email": user.email,
-                            "user_name": f"{user.first_name} {user.last_name}".strip(),
-                            "registration_date": user.created_at.isoformat()
-                            if user.created_at
-                            else None,
-                            "last_login": user.last_login.isoformat()
-                            if hasattr(user, "last_login") and user.last_login
-                            else None,
-                            "recommendations": user_recommendations,
-                            "recommendation_count": len(user_recommendations),
-                        }
-                    )
-                except Exception as e:
-                    # Log error but continue with other users
-                    MonitoringService.log_error(
-                        f"Error generating recommendations for user {user.id}: {str(e)}",
-                        "RecommendationService",
-                        exc_info=True,
-                    )
-                    all_recommendations.append(
-                        {
-                            "user_id": user.id,
-                            "user_email": user.email,
-                            "user_name": f"{user.first_name} {user.last_name}".strip(),
-                            "registration_date": user.created_at.isoformat()
-                            if user.created_at
-                            else None,
-                            "last_login": user.last_login.isoformat()
-                            if hasattr(user, "last_login") and user.last_login
-                            else None,
-                            "recommendations": [],
-                            "recommendation_count": 0,
-                            "error": "Failed to generate recommendations",
-                        }
-                    )
+            if cursor is not None:
+                return {
+                    "recommendations": all_recommendations,
+                    "pagination": users_page.to_dict(),
+                }
 
             return {
                 "recommendations": all_recommendations,
@@ -206,6 +211,9 @@ class RecommendationService:
                 },
             }
 
+        except ValidationException:
+            # An invalid cursor is a client error, not a generation failure.
+            raise
         except Exception as e:
             MonitoringService.log_error(
                 f"Error generating bulk recommendations: {str(e)}",
@@ -271,36 +279,49 @@ class RecommendationService:
         """
         Generate recommendations for multiple users at once.
         Useful for bulk operations like email campaigns.
+
+        Users are loaded and scored in batches by `BulkRecommendationEngine`,
+        so the cost grows with the number of batches, not of users.
         """
         try:
+            engine = BulkRecommendationEngine()
             results = []
 
-            for user_id in user_ids:
-                try:
-                    user_recommendations = (
-                        RecommendationService.get_admin_recommendations_for_user(
-                            user_id, limit_per_user
+            for start in range(0, len(user_ids), USER_CHUNK_SIZE):
+                chunk = user_ids[start : start + USER_CHUNK_SIZE]
+                users = {
+                    user.id: user
+                    for user in User.query.filter(User.id.in_(chunk)).all()
+                }
+                recommendations = engine.serialize(
+                    engine.recommend(list(users), limit_per_user)
+                )
+
+                for user_id in chunk:
+                    user = users.get(user_id)
+                    if user is None:
+                        results.append(
+                            {
+                                "user_id": user_id,
+                                "status": "error",
+                                "error": "User not found",
+                            }
                         )
-                    )
+                        continue
+                    user_recommendations = recommendations[user_id]
                     results.append(
                         {
                             "user_id": user_id,
                             "status": "success",
-                            "data": user_recommendations,
+                            "data": {
+                                "user_id": user_id,
+                                "user_email": user.email,
+                                "user_name": f"{user.first_name} {user.last_name}".strip(),
+                                "recommendations": user_recommendations,
+                                "recommendation_count": len(user_recommendations),
+                            },
                         }
                     )
-                except NotFoundException:
-                    results.append(
-                        {
-                            "user_id": user_id,
-                            "status": "error",
-                            "error": "User not found",
-                        }
-                    )
-                except Exception as e:
-                    results.append(
-                        {"user_id": user_id, "status": "error", "error": str(e)}
-                    )
 
             return {
                 "results": results,
@@ -6,8 +6,9 @@ to provide functionalities like listing and revoking active sessions.
 
 from flask import current_app
 
-from ...extensions import db
-from ...models import PersistentSession, User
+from ..extensions import db
+from ..models import PersistentSession, User
+from ..utils.pagination import keyset_paginate
 
 
 class SessionService:
@@ -20,19 +21,31 @@ class SessionService:
     """
 
     @staticmethod
-    def get_all_active_sessions(page=1, per_page=20):
+    def get_all_active_sessions(page=1, per_page=20, cursor=None, with_total=False):
         """
         Retrieves a paginated list of all active user sessions.
+
+        Passing a `cursor` (an empty string for the first page) uses keyset
+        pagination over (last_seen, id) and returns a `CursorPage`.
         """
         current_app.logger.info("Fetching all active sessions.")
 
         # This query assumes a 'PersistentSession' model that tracks active sessions.
         # It joins with the User model to get user details.
-        sessions_page = (
-            PersistentSession.query.join(User)
-            .filter(PersistentSession.is_active)
-            .order_by(PersistentSession.last_seen.desc())
-            .paginate(page=page, per_page=per_page, error_out=False)
+        query = PersistentSession.query.join(User).filter(PersistentSession.is_active)
+
+        if cursor is not None:
+            return keyset_paginate(
+                query,
+                PersistentSession.last_seen,
+                PersistentSession.id,
+                cursor=cursor,
+                per_page=per_page,
+                with_total=with_total,
+            )
+
+        sessions_page = query.order_by(PersistentSession.last_seen.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
         )
 
         return sessions_page
@@ -6,7 +6,7 @@ import logging
 
 from flask import current_app
 
-from ..extensions import cache, db
+from ..extensions import db, tiered_cache
 from ..models.utility_models import Setting
 from ..utils.cache_helpers import clear_site_settings_cache, get_site_settings_key
 from ..utils.decorators import roles_required
@@ -24,18 +24,18 @@ class SiteSettingsService:
     def get_all_settings_cached():
         """
         Retrieves all site settings as a dictionary, using cache.
-        Settings are long-lived in cache as they change infrequently.
+        Settings are long-lived in cache as they change infrequently, and are
+        served from process memory on most requests.
         """
-        cache_key = get_site_settings_key()
-        settings = cache.get(cache_key)
-        if settings is None:
+
+        def load_settings():
             current_app.logger.debug("Cache miss for site settings. Fetching from DB.")
-            settings_models = Setting.query.all()
-            settings = {s.key: s.value for s in settings_models}
-            cache.set(cache_key, settings, timeout=86400)  # Cache for 24 hours
-        else:
-            current_app.logger.debug("Cache hit for site settings.")
-        return settings
+            return {s.key: s.value for s in Setting.query.all()}
+
+        # Cache for 24 hours
+        return tiered_cache.get_or_set(
+            get_site_settings_key(), load_settings, timeout=86400
+        )
 
     @staticmethod
     def get_setting(key: str, default=None):
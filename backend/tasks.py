@@ -64,6 +64,31 @@ def generate_invoice_pdf_task(self, invoice_id):
         self.retry(exc=exc)
 
 
+@celery_app.task(
+    name="tasks.generate_passport_assets",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=60,
+)
+def generate_passport_assets_task(self, batch_id, passport_ids):
+    """Renders the HTML, PDF and QR code of one chunk of a stock batch's passports."""
+    from .services.passport_asset_service import PassportAssetService
+
+    logger.info(
+        f"Rendering assets for {len(passport_ids)} passports of batch {batch_id}."
+    )
+    try:
+        rendered = PassportAssetService.render_chunk(passport_ids)
+        logger.info(f"Rendered {rendered} passports of batch {batch_id}.")
+        return rendered
+    except Exception as exc:
+        logger.error(
+            f"Error rendering passport assets for batch {batch_id}: {exc}",
+            exc_info=True,
+        )
+        self.retry(exc=exc)
+
+
 @celery_app.task(name="tasks.send_back_in_stock_notifications")
 def send_back_in_stock_notifications_task(user_ids, product_id):
     """Sends notification emails to a list of users for a specific product."""
@@ -94,6 +119,22 @@ def send_b2b_order_confirmation_email_task(order_id):
     return f"Order confirmation email task queued for order ID: {order_id}"
 
 
+@celery_app.task(name="tasks.send_checkout_confirmation")
+def send_checkout_confirmation_task(order_id):
+    """Sends the confirmation email of an order placed through checkout."""
+    from .services.checkout_service import CheckoutService
+
+    CheckoutService(logger).send_order_confirmation(order_id)
+
+
+@celery_app.task(name="tasks.complete_referral")
+def complete_referral_task(user_id):
+    """Completes the pending referral of a user who placed their first order."""
+    from .services.referral_service import ReferralService
+
+    return ReferralService.complete_referral(user_id)
+
+
 # ** FIX: Add the missing task definition **
 @celery_app.task(name="tasks.send_order_status_update")
 def send_order_status_update_task(order_id, new_status):
@@ -116,23 +157,57 @@ def send_order_status_update_task(order_id, new_status):
     max_retries=3,
     default_retry_delay=60,
 )
-def process_b2b_quick_order_task(self, b2b_user_id, file_content_str):
+def process_b2b_quick_order_task(
+    self, b2b_user_id, upload_id, shipping_address_id=None
+):
     """
-    Processes a B2B quick order from a CSV file content string.
+    Creates a B2B quick order from an uploaded CSV, passed by the id of its
+    stored file (see services/quick_order_service.py). Returns the order, or
+    the invalid lines, for the upload status endpoint.
     """
-    from .services.b2b_service import B2BService
+    from sqlalchemy.exc import SQLAlchemyError
+
+    from .services.quick_order_service import QuickOrderService
 
     logger.info(f"Starting B2B quick order processing for user {b2b_user_id}.")
     try:
-        b2b_service = B2BService()
-        b2b_service.create_order_from_csv(b2b_user_id, file_content_str)
-    except Exception as exc:
+        result = QuickOrderService.create_order_from_upload(
+            b2b_user_id,
+            upload_id,
+            shipping_address_id,
+            keep_for_retry=self.request.retries < self.max_retries,
+        )
+    except SQLAlchemyError as exc:
         logger.error(
             f"Failed to process B2B quick order for user {b2b_user_id}: {exc}",
             exc_info=True,
         )
-        # Here you might want to notify the user of the final failure
-        self.retry(exc=exc)
+        # The upload is kept for the retries, and removed after the last one.
+        raise self.retry(exc=exc) from exc
+    return {"user_id": b2b_user_id, **result}
+
+
+@celery_app.task(
+    name="tasks.update_search_index",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=30,
+)
+def update_search_index_task(self, product_ids, removed_ids=()):
+    """
+    Applies product writes to the product search index and publishes a new
+    snapshot (see services/product_search_service.py).
+    """
+    from .services.product_search_service import ProductSearchService
+
+    try:
+        ProductSearchService.update_products(product_ids, removed_ids)
+    except Exception as exc:
+        logger.error(
+            f"Failed to update the search index for products {product_ids}: {exc}",
+            exc_info=True,
+        )
+        raise self.retry(exc=exc) from exc
 
 
 # ==============================================================================
@@ -143,7 +218,11 @@ def process_b2b_quick_order_task(self, b2b_user_id, file_content_str):
 
 @celery_app.task(name="tasks.clear_application_cache", bind=True)
 def clear_application_cache_task(self):
-    """A periodic task to clear the entire Flask cache."""
+    """
+    Clears the entire Flask cache. No longer scheduled: invalidation is done by
+    tag generation bumps, and a full flush causes a miss storm on the database.
+    Kept for manual, operator-triggered use only.
+    """
     logger.info("Starting scheduled cache clearing task.")
     try:
         with current_app.app_context():
@@ -155,6 +234,57 @@ def clear_application_cache_task(self):
         raise  # Re-raise to have Celery mark it as failed
 
 
+@celery_app.task(name="tasks.update_co_purchase_matrix", bind=True)
+def update_co_purchase_matrix_task(self, full=False):
+    """
+    Folds orders placed since the last run into the "customers also bought"
+    matrix and publishes a new snapshot. Pass `full=True` to rebuild it.
+    """
+    from .services.co_purchase_service import CoPurchaseService
+
+    logger.info("Starting scheduled co-purchase matrix update.")
+    try:
+        matrix = CoPurchaseService.update(full=full)
+        return f"Co-purchase matrix covers {matrix.n_orders} orders."
+    except Exception as e:
+        logger.error(f"Failed to update co-purchase matrix: {e}", exc_info=True)
+        raise
+
+
+@celery_app.task(name="tasks.reconcile_hot_stock", bind=True)
+def reconcile_hot_stock_task(self):
+    """
+    Releases expired hot stock holds, writes the stock reserved in Redis for
+    hot products back to the database and corrects any drift of the Redis
+    counters.
+    """
+    from .services.hot_stock_service import HotStockService
+
+    try:
+        result = HotStockService.reconcile()
+        if result["units"] or result["expired"] or result["drift"]:
+            logger.info(f"Reconciled hot stock: {result}")
+        return result
+    except Exception as e:
+        logger.error(f"Failed to reconcile hot stock: {e}", exc_info=True)
+        raise
+
+
+@celery_app.task(name="tasks.expire_inventory_reservations", bind=True)
+def expire_inventory_reservations_task(self):
+    """
+    Deletes expired cart reservations and returns their units to
+    `Inventory.available_quantity`.
+    """
+    from .services.inventory_service import InventoryService
+
+    try:
+        return InventoryService().expire_reservations()
+    except Exception as e:
+        logger.error(f"Failed to expire inventory reservations: {e}", exc_info=True)
+        raise
+
+
 @celery_app.task(name="tasks.update_all_user_tiers", bind=True)
 def update_all_user_tiers_task(self):
     """
@@ -2,46 +2,148 @@
 Centralized Caching Utility
 
 This module provides functions for generating cache keys and clearing caches for different parts of the application. This helps to keep caching logic consistent and avoids scattering cache management code across services and routes.
+
+Invalidation is generational: every key is namespaced by the current generation of one or more tags (e.g. `blog`, `product:42`). Bumping a tag's generation makes every key built under the old generation unreachable at once, and the orphaned entries simply age out through their timeouts. No key listing, pattern deletes or full flushes are needed.
 """
 
-from ..extensions import cache
+import time
+
+from ..extensions import cache, tiered_cache
+
+# --- Cache Tags ---
+
+PRODUCTS_TAG = "products"
+BLOG_TAG = "blog"
+SETTINGS_TAG = "settings"
+DELIVERY_TAG = "delivery"
+
+# Seconds a tag generation is kept. Longer than any entry built under a tag
+# lives (a day at most), so generations only expire once nothing uses them;
+# one expiring early merely orphans its entries, as the next is reseeded.
+TAG_GENERATION_TIMEOUT = 7 * 86400
+
+
+def product_tag(product_id):
+    """Tag covering every cache entry derived from a single product."""
+    return f"product:{product_id}"
+
+
+def tier_tag(tier_id):
+    """Tag covering every cache entry derived from a single loyalty tier."""
+    return f"tier:{tier_id}"
 
-# --- Key Generation Functions ---
 
+def cart_tag(user_id):
+    """Tag versioning a user's cart: bumped by every change to its contents."""
+    return f"cart:{user_id}"
 
-def get_product_list_key():
-    """Cache key for the list of all products."""
-    return "product_list"
+
+def get_tag_generation_key(tag):
+    """Cache key holding the current generation of a tag."""
+    return f"cache_gen:{tag}"
+
+
+def get_tag_generations(*tags):
+    """
+    Returns the current generation of each tag, fetched in one round trip.
+
+    A missing generation (never bumped, expired or evicted) is seeded from
+    the clock rather than 0, so a reset can never resurrect entries from an
+    older generation that are still in the cache.
+
+    Generations are read on nearly every cached lookup, so they are served
+    from the per-process tier; `bump_cache_tags` invalidates it everywhere.
+    """
+    keys = [get_tag_generation_key(tag) for tag in tags]
+    generations = tiered_cache.get_many(*keys) if keys else []
+    for i, generation in enumerate(generations):
+        if generation is None:
+            seed = time.time_ns() // 1000
+            # Only one worker wins the seed; everyone else reads the winner's.
+            if not cache.add(keys[i], seed, timeout=TAG_GENERATION_TIMEOUT):
+                seed = cache.get(keys[i]) or seed
+            generations[i] = seed
+    return generations
+
+
+def tagged_key(base_key, *tags):
+    """Namespaces `base_key` by the current generations of `tags`."""
+    generations = get_tag_generations(*tags)
+    suffix = ",".join(
+        f"{tag}={gen}" for tag, gen in zip(tags, generations, strict=True)
+    )
+    return f"{base_key}|{suffix}"
+
+
+def bump_cache_tags(*tags):
+    """Invalidates every cache entry built under any of `tags`."""
+    for tag in tags:
+        get_tag_generations(tag)
+        cache.inc(get_tag_generation_key(tag))
+    tiered_cache.invalidate(*(get_tag_generation_key(tag) for tag in tags))
+
+
+# --- Key Generation Functions ---
 
 
 def get_product_by_slug_key(slug):
-    """Cache key for a single product fetched by its slug."""
+    """Cache key mapping a product slug to its ID."""
     return f"product:slug:{slug}"
 
 
-def get_product_by_id_key(product_id):
-    """Cache key for a single product fetched by its ID."""
-    return f"product:id:{product_id}"
+def get_product_payload_key(product_id, view):
+    """Cache key for a product's serialized JSON payload in a given view."""
+    return f"product:payload:{product_id}:{view}"
+
+
+def get_catalog_visibility_key(audience, tier_id=None):
+    """Redis key for the visible product IDs of one (audience, loyalty tier) pair."""
+    return f"catalog_visibility:{audience}:{tier_id or 'none'}"
+
+
+def get_product_search_version_key():
+    """Redis key for the version of the latest product search index snapshot."""
+    return "product_search:version"
+
+
+def get_product_search_snapshot_key(version):
+    """Redis key for the product search index snapshot of a given version."""
+    return f"product_search:snapshot:{version}"
+
+
+def get_co_purchase_version_key():
+    """Cache key for the version of the latest co-purchase matrix snapshot."""
+    return "co_purchase:version"
+
+
+def get_user_roles_key(user_id):
+    """Cache key for the role names of a user, read by the RBAC service."""
+    return f"rbac:roles:{user_id}"
+
+
+def get_cart_snapshot_key(user_id):
+    """Cache key for the priced snapshot of a user's cart, per cart version."""
+    return tagged_key(f"cart:snapshot:{user_id}", cart_tag(user_id))
 
 
 def get_blog_post_list_key():
     """Cache key for the list of all blog posts."""
-    return "blog_post_list"
+    return tagged_key("blog_post_list", BLOG_TAG)
 
 
 def get_blog_post_by_slug_key(slug):
     """Cache key for a single blog post fetched by its slug."""
-    return f"blog:slug:{slug}"
+    return tagged_key(f"blog:slug:{slug}", BLOG_TAG)
 
 
 def get_site_settings_key():
     """Cache key for all site settings."""
-    return "site_settings"
+    return tagged_key("site_settings", SETTINGS_TAG)
 
 
 def get_delivery_methods_key():
     """Cache key for all active delivery methods."""
-    return "delivery_methods"
+    return tagged_key("delivery_methods", DELIVERY_TAG)
 
 
 # --- Cache Invalidation Functions ---
@@ -51,37 +153,43 @@ def clear_product_cache(product_id=None, slug=None):
     """
     Clears product-related caches.
 
-    - Deletes the cache for the full product list.
-    - If product_id is provided, deletes the cache for that specific product ID.
-    - If slug is provided, deletes the cache for that specific product slug.
+    - If product_id is provided, bumps the `product:<id>` tag so every cached
+      view of that product is treated as stale.
+    - If slug is provided, deletes the slug-to-ID mapping for that slug.
+    - Without either, bumps the catalog-wide `products` tag.
     """
-    # Invalidate the main product list
-    cache.delete(get_product_list_key())
-
-    # Invalidate specific product entries
     if product_id:
-        cache.delete(get_product_by_id_key(product_id))
+        bump_cache_tags(product_tag(product_id))
     if slug:
         cache.delete(get_product_by_slug_key(slug))
+    if not product_id and not slug:
+        bump_cache_tags(PRODUCTS_TAG)
 
 
 def clear_blog_cache(slug=None):
     """
-    Clears blog-related caches.
-
-    - Deletes the cache for the full blog post list.
-    - If slug is provided, deletes the cache for that specific blog post slug.
+    Clears blog-related caches by bumping the `blog` tag, which covers the
+    post list and every post fetched by slug. `slug` is accepted for
+    call-site compatibility.
     """
-    cache.delete(get_blog_post_list_key())
-    if slug:
-        cache.delete(get_blog_post_by_slug_key(slug))
+    bump_cache_tags(BLOG_TAG)
 
 
 def clear_site_settings_cache():
     """Clears the site settings cache."""
-    cache.delete(get_site_settings_key())
+    bump_cache_tags(SETTINGS_TAG)
 
 
 def clear_delivery_methods_cache():
     """Clears the delivery methods cache."""
-    cache.delete(get_delivery_methods_key())
+    bump_cache_tags(DELIVERY_TAG)
+
+
+def clear_tier_cache(tier_id):
+    """Clears caches derived from a loyalty tier."""
+    bump_cache_tags(tier_tag(tier_id))
+
+
+def clear_cart_cache(user_id):
+    """Clears the priced snapshot of a user's cart after any change to it."""
+    bump_cache_tags(cart_tag(user_id))
@@ -0,0 +1,314 @@
+"""
+Sparse item-item co-purchase matrix for "customers also bought" recommendations.
+
+The matrix counts, for every pair of products, the number of orders containing
+both; its diagonal holds the number of orders containing each product. It is
+built from baskets (the product IDs of one order) and can absorb new baskets
+incrementally. From the counts, the top-k neighbours of every product are
+precomputed under the chosen normalization, so serving a recommendation is a
+binary search and an array slice.
+
+Snapshots are directories of `.npy` files that are opened with `mmap_mode="r"`:
+every worker shares the same pages through the OS page cache instead of holding
+its own copy. Like `search_index`, this module has no database or Flask
+dependency; see `backend.services.co_purchase_service` for how it is fed.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import uuid
+
+import numpy as np
+from scipy import sparse
+
+NORMALIZATIONS = ("count", "cosine", "lift")
+
+SNAPSHOT_FORMAT_VERSION = 1
+CURRENT_POINTER = "CURRENT"
+
+_ARRAYS = (
+    "product_ids",
+    "indptr",
+    "indices",
+    "data",
+    "topk_indptr",
+    "topk_indices",
+    "topk_scores",
+)
+
+
+class CoPurchaseMatrix:
+    """
+    Symmetric co-occurrence counts over a sorted array of product IDs, plus
+    the precomputed top-k neighbours of each product.
+
+    Instances are immutable: `add_baskets` and `with_neighbours` return new
+    matrices.
+    """
+
+    def __init__(
+        self,
+        product_ids,
+        counts,
+        n_orders=0,
+        watermark=None,
+        topk=None,
+        normalization="cosine",
+    ):
+        self.product_ids = product_ids
+        self.counts = counts
+        self.n_orders = n_orders
+        self.watermark = watermark
+        self.normalization = normalization
+        if topk is None:
+            topk = (np.zeros(len(product_ids) + 1, dtype=np.int64), [], [])
+        self.topk_indptr, self.topk_indices, self.topk_scores = topk
+
+    @classmethod
+    def empty(cls, normalization="cosine"):
+        return cls(
+            np.zeros(0, dtype=np.int64),
+            sparse.csr_matrix((0, 0), dtype=np.int32),
+            normalization=normalization,
+        )
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    # --- Building ---
+
+    def add_baskets(self, baskets, watermark=None):
+        """
+        Returns a new matrix with the co-occurrences of `baskets` added.
+
+        Args:
+            baskets: Iterable of iterables of product IDs, one per order.
+                Duplicate products within a basket are counted once.
+            watermark: Position of the last order included, stored as-is.
+        """
+        rows, cols = [], []
+        n_baskets = 0
+        for basket in baskets:
+            for product_id in basket:
+                rows.append(n_baskets)
+                cols.append(product_id)
+            n_baskets += 1
+        if not n_baskets:
+            return self._replace(watermark=watermark or self.watermark)
+
+        batch_ids = np.asarray(cols, dtype=np.int64)
+        product_ids = np.union1d(self.product_ids, batch_ids)
+
+        # Order x product incidence matrix; B.T @ B counts the co-occurrences.
+        incidence = sparse.csr_matrix(
+            (
+                np.ones(len(batch_ids), dtype=np.int32),
+                (np.asarray(rows), np.searchsorted(product_ids, batch_ids)),
+            ),
+            shape=(n_baskets, len(product_ids)),
+        )
+        incidence.sum_duplicates()
+        incidence.data[:] = 1
+        counts = (incidence.T @ incidence).tocsr()
+
+        if len(self.product_ids):
+            # Re-index the existing counts into the (possibly larger) ID space.
+            old = self.counts.tocoo()
+            positions = np.searchsorted(product_ids, self.product_ids)
+            counts = counts + sparse.csr_matrix(
+                (old.data, (positions[old.row], positions[old.col])),
+                shape=counts.shape,
+            )
+
+        return self._replace(
+            product_ids=product_ids,
+            counts=counts.astype(np.int32).tocsr(),
+            n_orders=self.n_orders + n_baskets,
+            watermark=watermark or self.watermark,
+            # Neighbours are stale now; see `with_neighbours`.
+            topk=None,
+        )
+
+    def with_neighbours(self, k=20, normalization=None, min_count=1):
+        """
+        Returns a copy with the top-`k` neighbours of each product precomputed.
+
+        Args:
+            k: Neighbours kept per product.
+            normalization: "count" (raw co-purchases), "cosine"
+                (c_ij / sqrt(n_i * n_j)) or "lift" (c_ij * N / (n_i * n_j)).
+            min_count: Pairs bought together fewer times are ignored, which
+                keeps lift from favouring one-off coincidences.
+        """
+        normalization = normalization or self.normalization
+        if normalization not in NORMALIZATIONS:
+            raise ValueError(f"Unknown normalization '{normalization}'.")
+
+        counts = self.counts.tocoo()
+        item_counts = self.counts.diagonal().astype(np.float64)
+        keep = (counts.row != counts.col) & (counts.data >= min_count)
+        row, col = counts.row[keep], counts.col[keep]
+        scores = counts.data[keep].astype(np.float64)
+        if normalization == "cosine":
+            scores /= np.sqrt(item_counts[row] * item_counts[col])
+        elif normalization == "lift":
+            scores *= self.n_orders / (item_counts[row] * item_counts[col])
+
+        similarity = sparse.csr_matrix((scores, (row, col)), shape=self.counts.shape)
+        similarity.sort_indices()
+
+        topk_indptr = np.zeros(len(self.product_ids) + 1, dtype=np.int64)
+        topk_indices, topk_scores = [], []
+        for i in range(len(self.product_ids)):
+            start, end = similarity.indptr[i], similarity.indptr[i + 1]
+            row_scores = similarity.data[start:end]
+            row_indices = similarity.indices[start:end]
+            if len(row_scores) > k:
+                best = np.argpartition(-row_scores, k)[:k]
+                row_scores, row_indices = row_scores[best], row_indices[best]
+            # Highest score first; ties broken by product ID for stable output.
+            order = np.lexsort((row_indices, -row_scores))
+            topk_indices.append(row_indices[order])
+            topk_scores.append(row_scores[order])
+            topk_indptr[i + 1] = topk_indptr[i] + len(order)
+
+        return self._replace(
+            normalization=normalization,
+            topk=(
+                topk_indptr,
+                _concat(topk_indices, np.int32),
+                _concat(topk_scores, np.float32),
+            ),
+        )
+
+    # --- Serving ---
+
+    def neighbours(self, product_id, k=5):
+        """Returns up to `k` (product_id, score) pairs, best match first."""
+        position = np.searchsorted(self.product_ids, product_id)
+        if (
+            position >= len(self.product_ids)
+            or self.product_ids[position] != product_id
+        ):
+            return []
+        start = self.topk_indptr[position]
+        end = min(self.topk_indptr[position + 1], start + k)
+        return [
+            (int(self.product_ids[index]), float(score))
+            for index, score in zip(
+                self.topk_indices[start:end],
+                self.topk_scores[start:end],
+                strict=True,
+            )
+        ]
+
+    # --- Snapshots ---
+
+    def save(self, path):
+        """
+        Writes a snapshot under directory `path` and atomically makes it the
+        current one. Older snapshots are removed; workers that still have them
+        memory-mapped keep reading them until they reload.
+        """
+        os.makedirs(path, exist_ok=True)
+        version = uuid.uuid4().hex
+        tmp_dir = tempfile.mkdtemp(dir=path, prefix=".tmp-")
+        try:
+            arrays = {
+                "product_ids": self.product_ids,
+                "indptr": self.counts.indptr,
+                "indices": self.counts.indices,
+                "data": self.counts.data,
+                "topk_indptr": self.topk_indptr,
+                "topk_indices": self.topk_indices,
+                "topk_scores": self.topk_scores,
+            }
+            for name, values in arrays.items():
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), np.asarray(values))
+            with open(os.path.join(tmp_dir, "meta.json"), "w") as fh:
+                json.dump(
+                    {
+                        "version": SNAPSHOT_FORMAT_VERSION,
+                        "n_orders": self.n_orders,
+                        "watermark": self.watermark,
+                        "normalization": self.normalization,
+                    },
+                    fh,
+                )
+            os.replace(tmp_dir, os.path.join(path, version))
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        fd, pointer_tmp = tempfile.mkstemp(dir=path, prefix=".tmp-")
+        with os.fdopen(fd, "w") as fh:
+            fh.write(version)
+        os.replace(pointer_tmp, os.path.join(path, CURRENT_POINTER))
+
+        for entry in os.listdir(path):
+            if entry not in (version, CURRENT_POINTER) and not entry.startswith(
+                ".tmp-"
+            ):
+                shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+        return version
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Opens the current snapshot under `path`, memory-mapped by default.
+        Returns None if there is no snapshot or it has an incompatible format.
+        """
+        try:
+            with open(os.path.join(path, CURRENT_POINTER)) as fh:
+                snapshot = os.path.join(path, fh.read().strip())
+            with open(os.path.join(snapshot, "meta.json")) as fh:
+                meta = json.load(fh)
+        except FileNotFoundError:
+            return None
+        if meta.get("version") != SNAPSHOT_FORMAT_VERSION:
+            return None
+
+        arrays = {
+            name: np.load(
+                os.path.join(snapshot, f"{name}.npy"),
+                mmap_mode="r" if mmap else None,
+            )
+            for name in _ARRAYS
+        }
+        size = len(arrays["product_ids"])
+        counts = sparse.csr_matrix(
+            (arrays["data"], arrays["indices"], arrays["indptr"]),
+            shape=(size, size),
+        )
+        return cls(
+            arrays["product_ids"],
+            counts,
+            n_orders=meta["n_orders"],
+            watermark=meta["watermark"],
+            normalization=meta["normalization"],
+            topk=(
+                arrays["topk_indptr"],
+                arrays["topk_indices"],
+                arrays["topk_scores"],
+            ),
+        )
+
+    # --- Internal helpers ---
+
+    def _replace(self, **changes):
+        fields = {
+            "product_ids": self.product_ids,
+            "counts": self.counts,
+            "n_orders": self.n_orders,
+            "watermark": self.watermark,
+            "normalization": self.normalization,
+            "topk": (self.topk_indptr, self.topk_indices, self.topk_scores),
+        }
+        fields.update(changes)
+        return CoPurchaseMatrix(**fields)
+
+
+def _concat(chunks, dtype):
+    return np.concatenate(chunks).astype(dtype) if chunks else np.zeros(0, dtype)
@@ -0,0 +1,156 @@
+"""
+Content-addressed file storage with lazily generated image derivatives.
+
+Blobs are stored under their SHA-256 digest, so uploading the same file twice
+stores it once, and a digest-based URL can never point at different bytes:
+responses can be cached forever (`immutable`). Image derivatives (thumbnail,
+card, zoom, full size; JPEG, WebP or AVIF) are rendered on first request and
+cached on disk next to the blob.
+
+Layout under the store root:
+    ab/cd/abcd...ef             original blob
+    ab/cd/abcd...ef.d/card.webp derivative, created on demand
+"""
+
+import functools
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+from PIL import Image, ImageOps, features
+
+# Derivative name -> bounding box in pixels (None keeps the original size).
+DERIVATIVES = {
+    "thumb": (200, 200),
+    "card": (600, 600),
+    "zoom": (2000, 2000),
+    "full": None,
+}
+
+# Output format -> (Pillow format, MIME type, save options)
+FORMATS = {
+    "jpg": ("JPEG", "image/jpeg", {"quality": 85, "optimize": True}),
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "avif": ("AVIF", "image/avif", {"quality": 60}),
+}
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+_CHUNK_SIZE = 1024 * 1024
+
+# Decoded bitmaps dominate render memory (a 24 MP photo is ~70 MB as RGB), so
+# only this many derivatives are rendered at once per process.
+MAX_CONCURRENT_RENDERS = 2
+_render_slots = threading.BoundedSemaphore(MAX_CONCURRENT_RENDERS)
+
+
+class ContentStore:
+    """Stores blobs by SHA-256 digest and renders image derivatives on demand."""
+
+    def __init__(self, root):
+        self.root = root
+
+    @staticmethod
+    def is_digest(value) -> bool:
+        return bool(value and _DIGEST_RE.match(value))
+
+    @staticmethod
+    @functools.cache
+    def supported_formats() -> tuple[str, ...]:
+        """Output formats this Pillow build can encode (AVIF needs libavif)."""
+        return tuple(fmt for fmt in FORMATS if fmt != "avif" or features.check("avif"))
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.blob_path(digest))
+
+    def put(self, stream) -> tuple[str, int, bool]:
+        """
+        Streams `stream` into the store while hashing it.
+
+        Returns:
+            (digest, size in bytes, whether the blob was newly stored). When
+            the content is already present, the new copy is discarded.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                while chunk := stream.read(_CHUNK_SIZE):
+                    digest.update(chunk)
+                    fh.write(chunk)
+                    size += len(chunk)
+            hexdigest = digest.hexdigest()
+            path = self.blob_path(hexdigest)
+            if os.path.exists(path):
+                os.unlink(tmp_path)
+                return hexdigest, size, False
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            return hexdigest, size, True
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def delete(self, digest: str):
+        """Removes a blob and all of its derivatives."""
+        path = self.blob_path(digest)
+        shutil.rmtree(f"{path}.d", ignore_errors=True)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def derivative_path(self, digest: str, name: str, fmt: str) -> str:
+        """
+        Returns the path of an image derivative, rendering it first if needed.
+
+        Raises:
+            KeyError: For an unknown derivative name or format.
+            FileNotFoundError: If the blob does not exist.
+        """
+        if name not in DERIVATIVES or fmt not in self.supported_formats():
+            raise KeyError(f"Unknown derivative '{name}.{fmt}'.")
+        path = os.path.join(f"{self.blob_path(digest)}.d", f"{name}.{fmt}")
+        if not os.path.exists(path):
+            with _render_slots:
+                # Another request may have rendered it while we waited.
+                if not os.path.exists(path):
+                    self._render(digest, name, fmt, path)
+        return path
+
+    # --- Internal helpers ---
+
+    def _render(self, digest, name, fmt, path):
+        pil_format, _, options = FORMATS[fmt]
+        with Image.open(self.blob_path(digest)) as img:
+            if DERIVATIVES[name]:
+                # Shrink before anything else decodes the full bitmap:
+                # thumbnail() lets JPEGs decode at 1/2, 1/4 or 1/8 scale
+                # (draft) and reduces other formats by box averaging first.
+                # The boxes are square, so EXIF rotation does not change them.
+                img.thumbnail(DERIVATIVES[name], Image.Resampling.LANCZOS)
+            # Re-encoding from decoded pixels also drops metadata and any
+            # payload smuggled into the original file.
+            img = ImageOps.exif_transpose(img)
+            if pil_format == "JPEG" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            elif img.mode not in ("RGB", "RGBA", "L", "LA"):
+                img = img.convert("RGBA")
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    img.save(fh, format=pil_format, **options)
+                # Concurrent renders of the same derivative are identical, so
+                # whichever rename lands last is as good as the first.
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
@@ -12,6 +12,7 @@ from sqlalchemy.orm import joinedload
 
 from backend.models.user_models import User
 from backend.services.audit_log_service import AuditLogService
+from backend.services.rbac_service import rbac_service
 from backend.utils.csrf_protection import CSRFProtection
 
 from ..extensions import cache, db
@@ -561,14 +562,13 @@ def roles_required(*roles: str) -> Callable:
     """
 
     def wrapper(f: Callable) -> Callable:
+        # Compiled once: the check is then a single bit test.
+        allowed_roles = rbac_service.role_mask("Admin", *roles)
+
         @wraps(f)
         @login_required
         def decorated_function(*args: Any, **kwargs: Any) -> Any:
-            if g.user.is_admin:
-                return _execute_and_log_action(f, *args, **kwargs)
-
-            user_roles = {role.name for role in g.user.roles}
-            if not user_roles.intersection(roles):
+            if not rbac_service.user_has_any_role(g.user.id, allowed_roles):
                 AuditLogService.log_action(
                     user_id=g.user.id,
                     action=f"FAILED_ROLE_ACCESS: {f.__name__}",
@@ -590,15 +590,20 @@ def permissions_required(*permission_names: str) -> Callable:
     """
 
     def decorator(f: Callable) -> Callable:
+        admin_role = rbac_service.role_mask("Admin")
+        required = rbac_service.permission_mask(*permission_names)
+
         @wraps(f)
         @login_required
         def decorated_function(*args: Any, **kwargs: Any) -> Any:
-            if g.user.is_admin:
-                return _execute_and_log_action(f, *args, **kwargs)
-
-            user_permissions = g.user.get_permissions()
-            if not set(permission_names).issubset(user_permissions):
-                missing_perms = set(permission_names) - user_permissions
+            grant = rbac_service.get_grant(g.user.id)
+            if (
+                not grant.roles & admin_role
+                and grant.permissions & required != required
+            ):
+                missing_perms = rbac_service.get_missing_permissions(
+                    g.user.id, *permission_names
+                )
                 AuditLogService.log_action(
                     user_id=g.user.id,
                     action=f"FAILED_PERMISSION_ACCESS: {f.__name__}",
@@ -615,6 +620,10 @@ def permissions_required(*permission_names: str) -> Callable:
     return decorator
 
 
+# Singular alias; `@permission_required()` without names only requires a login.
+permission_required = permissions_required
+
+
 def b2b_admin_required(f: Callable) -> Callable:
     """
     Checks if a user is an admin within their B2B company.
@@ -1,3 +1,5 @@
+import hashlib
+import hmac
 from typing import Any
 
 # backend/utils/encryption.py
@@ -81,3 +83,50 @@ def decrypt_data(encrypted_data: str | None) -> str | None:
         # If decryption fails, it could be legacy data or an error.
         # Return the original data or handle as per your policy.
         return encrypted_data
+
+
+def normalize_email(email: str | None) -> str | None:
+    """
+    Normalizes an email address so equivalent spellings share one blind index.
+
+    Args:
+        email: The raw email address
+
+    Returns:
+        The stripped, lower-cased email, or None if input was None
+    """
+    if email is None:
+        return None
+    return str(email).strip().lower()
+
+
+def blind_index(value: Any) -> str | None:
+    """
+    Computes a deterministic keyed HMAC-SHA256 of the given value.
+
+    Fernet ciphertext is randomized, so encrypted columns cannot be used for
+    equality lookups. The blind index is stored next to the ciphertext and
+    indexed instead; without the key it reveals nothing about the plaintext.
+
+    Args:
+        value: The (already normalized) value to index
+
+    Returns:
+        Hex digest of the HMAC, or None if input was None
+
+    Raises:
+        ValueError: If BLIND_INDEX_KEY is not configured
+    """
+    if value is None:
+        return None
+    key = current_app.config.get("BLIND_INDEX_KEY")
+    if not key:
+        raise ValueError("BLIND_INDEX_KEY not set in config")
+    return hmac.new(key.encode(), str(value).encode(), hashlib.sha256).hexdigest()
+
+
+def email_blind_index(email: str | None) -> str | None:
+    """
+    Returns the blind index used to look up users by email.
+    """
+    return blind_index(normalize_email(email))
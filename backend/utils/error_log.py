@@ -0,0 +1,273 @@
+"""
+Store of recent ERROR and CRITICAL log records, for the admin monitoring pages.
+
+`ErrorLogHandler` runs on the logging listener thread (see `loggers.py`) and
+adds each error to a bounded ring buffer in Redis shared by all workers:
+
+    error_log:entries                              hash, id -> JSON record
+    error_log:index                                sorted sets of ids, scored
+    error_log:index:level:<LEVEL>                  by the record's time
+    error_log:index:logger:<name>
+    error_log:index:level:<LEVEL>:logger:<name>
+
+Every combination of the level and logger filters maps to one sorted set, so
+a filtered, time-bounded page is a ZREVRANGEBYSCORE plus an HMGET, and its
+total a ZCOUNT, whatever the size of the buffer. Once the buffer holds more
+than ERROR_LOG_MAX_ENTRIES records the oldest are trimmed, a batch at a time.
+
+When Redis cannot be read, `read_error_log_files` scans the JSON log files
+from their end with `reverse_lines`, which reads fixed-size blocks backwards
+and stops as soon as the requested page is complete.
+"""
+
+import itertools
+import json
+import logging
+import math
+import os
+import time
+from datetime import datetime
+
+from redis.exceptions import RedisError
+
+from backend.extensions import redis_client
+
+KEY_PREFIX = "error_log"
+DEFAULT_MAX_ENTRIES = 5000
+# Trimming starts once the buffer exceeds its size by this share.
+TRIM_SLACK = 0.1
+# Seconds the handler stops writing after Redis failed.
+RETRY_INTERVAL = 30
+BLOCK_SIZE = 64 * 1024
+
+LEVELS = ("ERROR", "CRITICAL")
+
+_ids = itertools.count()
+
+
+class ErrorLogStore:
+    """
+    The Redis ring buffer of error records.
+
+    Args:
+        redis: Redis client; defaults to the app's `redis_client`.
+        key_prefix: Prefix of the Redis keys.
+        max_entries: Number of records kept.
+    """
+
+    def __init__(
+        self, redis=None, key_prefix=KEY_PREFIX, max_entries=DEFAULT_MAX_ENTRIES
+    ):
+        self._redis = redis if redis is not None else redis_client
+        self.key_prefix = key_prefix
+        self.max_entries = max_entries
+
+    @property
+    def entries_key(self):
+        return f"{self.key_prefix}:entries"
+
+    def index_key(self, level=None, logger_name=None):
+        key = f"{self.key_prefix}:index"
+        if level:
+            key += f":level:{level}"
+        if logger_name:
+            key += f":logger:{logger_name}"
+        return key
+
+    def _index_keys(self, level, logger_name):
+        return [
+            self.index_key(),
+            self.index_key(level=level),
+            self.index_key(logger_name=logger_name),
+            self.index_key(level, logger_name),
+        ]
+
+    def add(self, created, level, logger_name, payload):
+        """Adds a formatted record logged at `created` (epoch seconds)."""
+        entry_id = f"{created:.6f}:{os.getpid()}:{next(_ids)}"
+        pipe = self._redis.pipeline()
+        pipe.hset(self.entries_key, entry_id, payload)
+        for key in self._index_keys(level, logger_name):
+            pipe.zadd(key, {entry_id: created})
+        pipe.zcard(self.index_key())
+        size = pipe.execute()[-1]
+        if size > self.max_entries * (1 + TRIM_SLACK):
+            self.trim()
+
+    def trim(self):
+        """Removes the oldest records beyond `max_entries`."""
+        excess = self._redis.zcard(self.index_key()) - self.max_entries
+        if excess <= 0:
+            return
+        ids = self._redis.zrange(self.index_key(), 0, excess - 1)
+        payloads = self._redis.hmget(self.entries_key, ids)
+        pipe = self._redis.pipeline()
+        for entry_id, payload in zip(ids, payloads, strict=True):
+            keys = [self.index_key()]
+            if payload is not None:
+                record = json.loads(payload)
+                keys = self._index_keys(record.get("level"), record.get("logger"))
+            for key in keys:
+                pipe.zrem(key, entry_id)
+        pipe.hdel(self.entries_key, *ids)
+        pipe.execute()
+
+    def query(
+        self,
+        level=None,
+        logger_name=None,
+        since=None,
+        until=None,
+        page=1,
+        per_page=50,
+    ):
+        """
+        Returns a page of records, newest first, optionally filtered by level,
+        logger and time range (epoch seconds, inclusive).
+        """
+        key = self.index_key(level, logger_name)
+        high = "+inf" if until is None else until
+        low = "-inf" if since is None else since
+        offset = (page - 1) * per_page
+
+        pipe = self._redis.pipeline()
+        pipe.zrevrangebyscore(key, high, low, start=offset, num=per_page)
+        pipe.zcount(key, low, high)
+        ids, total = pipe.execute()
+        payloads = self._redis.hmget(self.entries_key, ids) if ids else []
+        items = [json.loads(payload) for payload in payloads if payload is not None]
+        return _page(items, page, per_page, total, "redis")
+
+    def clear(self):
+        keys = list(self._redis.scan_iter(f"{self.key_prefix}:*"))
+        if keys:
+            self._redis.delete(*keys)
+
+
+error_log_store = ErrorLogStore()
+
+
+class ErrorLogHandler(logging.Handler):
+    """
+    Adds records to an `ErrorLogStore`. While Redis is failing, records are
+    only written to the log files, and the store is retried after
+    RETRY_INTERVAL seconds.
+    """
+
+    def __init__(self, store=None, level=logging.ERROR):
+        super().__init__(level)
+        self.store = store if store is not None else error_log_store
+        self._retry_at = 0.0
+
+    def emit(self, record):
+        if time.monotonic() < self._retry_at:
+            return
+        try:
+            self.store.add(
+                record.created, record.levelname, record.name, self.format(record)
+            )
+        except (RedisError, OSError, AttributeError):
+            # AttributeError: the Flask-Redis client is not initialised yet.
+            self._retry_at = time.monotonic() + RETRY_INTERVAL
+        except Exception:
+            self.handleError(record)
+
+
+# --- Log files ---
+
+
+def reverse_lines(path, block_size=BLOCK_SIZE):
+    """Yields the lines of a file from the last one to the first."""
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        remainder = b""
+        while position > 0:
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + remainder).split(b"\n")
+            # The first piece may start in the block before this one.
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode("utf-8", errors="replace")
+        if remainder.strip():
+            yield remainder.decode("utf-8", errors="replace")
+
+
+def _parse_line(line):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        # A line from before the switch to JSON logs.
+        level = next((level for level in LEVELS if level in line), None)
+        return {"level": level, "message": line.strip()} if level else None
+    return record if isinstance(record, dict) else None
+
+
+def _timestamp(record):
+    try:
+        return datetime.fromisoformat(record["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def read_error_log_files(
+    path,
+    level=None,
+    logger_name=None,
+    since=None,
+    until=None,
+    page=1,
+    per_page=50,
+    backup_count=5,
+):
+    """
+    `ErrorLogStore.query` over the log file and its rotated backups, reading
+    them from the end. The total is unknown, so `has_more` tells whether
+    another page exists.
+    """
+    offset = (page - 1) * per_page
+    matched = 0
+    items = []
+    if not path:
+        return _page(items, page, per_page, None, "file")
+    paths = [path] + [f"{path}.{n}" for n in range(1, backup_count + 1)]
+    for file_path in paths:
+        if not os.path.exists(file_path):
+            continue
+        for line in reverse_lines(file_path):
+            record = _parse_line(line)
+            if record is None or record.get("level") not in LEVELS:
+                continue
+            if level and record.get("level") != level:
+                continue
+            if logger_name and record.get("logger") != logger_name:
+                continue
+            created = _timestamp(record)
+            if created is not None:
+                if until is not None and created > until:
+                    continue
+                if since is not None and created < since:
+                    # Older files only hold older records.
+                    return _page(items, page, per_page, None, "file")
+            matched += 1
+            if matched > offset + per_page:
+                result = _page(items, page, per_page, None, "file")
+                result["has_more"] = True
+                return result
+            if matched > offset:
+                items.append(record)
+    return _page(items, page, per_page, None, "file")
+
+
+def _page(items, page, per_page, total, source):
+    return {
+        "items": items,
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "pages": math.ceil(total / per_page) if total is not None else None,
+        "has_more": total is not None and page * per_page < total,
+        "source": source,
+    }
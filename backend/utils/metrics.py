@@ -0,0 +1,226 @@
+"""
+Prometheus metrics for HTTP requests, SQL, caching and Celery tasks.
+
+Everything is registered on the default registry and exposed by `/metrics`
+(see `metrics/routes.py`). Gunicorn workers and Celery processes each keep
+their own samples, so in production set PROMETHEUS_MULTIPROC_DIR to an empty
+directory shared by all of them before they start; `/metrics` then aggregates
+every process. Gunicorn's `child_exit` hook should call
+`prometheus_client.multiprocess.mark_process_dead(worker.pid)`.
+
+HTTP metrics are labelled with the matched URL rule (e.g.
+"/api/products/<slug>"), never the raw path, so the number of series is bounded
+by the number of routes rather than by the number of products or UUIDs.
+
+Per request, the number of SQL statements, the time spent in SQL and the time
+spent serializing JSON are accumulated on `g` and observed once the response
+is ready. Cache lookups are counted by key family ("product:payload" for
+"product:payload:42:b2c") and tier (the worker's local LRU or Redis).
+"""
+
+import time
+
+from celery import signals
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from flask_caching import Cache
+from prometheus_client import Counter, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_LATENCY = Histogram(
+    "request_latency_seconds", "Request latency", ["method", "endpoint"]
+)
+REQUEST_COUNT = Counter(
+    "request_count", "Request count", ["method", "endpoint", "http_status"]
+)
+REQUEST_DB_STATEMENTS = Histogram(
+    "request_db_statements",
+    "SQL statements executed per request",
+    ["endpoint"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "request_db_seconds", "Time spent executing SQL per request", ["endpoint"]
+)
+REQUEST_SERIALIZATION_SECONDS = Histogram(
+    "request_serialization_seconds",
+    "Time spent serializing JSON responses per request",
+    ["endpoint"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Cache lookups by key family, tier and result",
+    ["family", "tier", "result"],
+)
+
+CELERY_TASK_RUNTIME = Histogram(
+    "celery_task_runtime_seconds", "Celery task run time", ["task", "state"]
+)
+CELERY_TASK_QUEUE_WAIT = Histogram(
+    "celery_task_queue_wait_seconds",
+    "Time between publishing a Celery task and a worker starting it",
+    ["task"],
+)
+CELERY_TASK_RETRIES = Counter(
+    "celery_task_retries_total", "Celery task retries", ["task"]
+)
+CELERY_TASK_FAILURES = Counter(
+    "celery_task_failures_total", "Celery tasks that raised", ["task"]
+)
+
+
+def route_label():
+    """The URL rule of the current request, or a fixed label when none matched."""
+    rule = request.url_rule
+    return rule.rule if rule is not None else UNMATCHED_ROUTE
+
+
+def _request_stats():
+    if has_request_context():
+        return g.get("_request_metrics")
+    return None
+
+
+# --- HTTP requests ---
+
+
+def start_request():
+    g._request_metrics = {
+        "started": time.perf_counter(),
+        "db_statements": 0,
+        "db_seconds": 0.0,
+        "serialization_seconds": 0.0,
+    }
+
+
+def finish_request(response):
+    stats = g.pop("_request_metrics", None)
+    route = route_label()
+    REQUEST_COUNT.labels(request.method, route, response.status_code).inc()
+    if stats is None:
+        return
+    REQUEST_LATENCY.labels(request.method, route).observe(
+        time.perf_counter() - stats["started"]
+    )
+    REQUEST_DB_STATEMENTS.labels(route).observe(stats["db_statements"])
+    REQUEST_DB_SECONDS.labels(route).observe(stats["db_seconds"])
+    REQUEST_SERIALIZATION_SECONDS.labels(route).observe(stats["serialization_seconds"])
+
+
+class InstrumentedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, timing `dumps` into the request's metrics."""
+
+    def dumps(self, obj, **kwargs):
+        stats = _request_stats()
+        if stats is None:
+            return super().dumps(obj, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            stats["serialization_seconds"] += time.perf_counter() - started
+
+
+# --- SQL ---
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_metrics_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("_metrics_query_start")
+    if not starts:
+        return
+    started = starts.pop()
+    stats = _request_stats()
+    if stats is not None:
+        stats["db_statements"] += 1
+        stats["db_seconds"] += time.perf_counter() - started
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute.
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("_metrics_query_start"):
+        connection.info["_metrics_query_start"].pop()
+
+
+# --- Cache ---
+
+
+def key_family(key):
+    """
+    Groups cache keys for labelling: the first segment, plus the second one
+    when it names a kind of entry ("product:payload:42" -> "product:payload").
+    """
+    parts = str(key).split("|", 1)[0].split(":")
+    if len(parts) > 2 and parts[1].isidentifier():
+        return f"{parts[0]}:{parts[1]}"
+    return parts[0]
+
+
+def record_cache_lookup(key, tier, hit):
+    CACHE_LOOKUPS.labels(key_family(key), tier, "hit" if hit else "miss").inc()
+
+
+class InstrumentedCache(Cache):
+    """Flask-Caching `Cache` counting hits and misses of direct lookups."""
+
+    def get(self, key, *args, **kwargs):
+        value = super().get(key, *args, **kwargs)
+        record_cache_lookup(key, "redis", value is not None)
+        return value
+
+    def get_many(self, *keys):
+        values = super().get_many(*keys)
+        for key, value in zip(keys, values, strict=True):
+            record_cache_lookup(key, "redis", value is not None)
+        return values
+
+
+# --- Celery ---
+
+_task_started = {}
+
+
+@signals.before_task_publish.connect
+def _stamp_published_at(headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault("published_at", time.time())
+
+
+@signals.task_prerun.connect
+def _task_prerun(task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+    published_at = getattr(task.request, "published_at", None)
+    if published_at:
+        CELERY_TASK_QUEUE_WAIT.labels(task.name).observe(
+            max(0.0, time.time() - published_at)
+        )
+
+
+@signals.task_postrun.connect
+def _task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_RUNTIME.labels(task.name, state or "UNKNOWN").observe(
+            time.perf_counter() - started
+        )
+
+
+@signals.task_retry.connect
+def _task_retry(sender=None, **kwargs):
+    CELERY_TASK_RETRIES.labels(sender.name).inc()
+
+
+@signals.task_failure.connect
+def _task_failure(sender=None, **kwargs):
+    CELERY_TASK_FAILURES.labels(sender.name).inc()
@@ -0,0 +1,177 @@
+"""
+Keyset (cursor) pagination helpers.
+
+OFFSET pagination makes the database walk and discard every row before the
+requested page, and `paginate()` issues a COUNT(*) on top. Keyset pagination
+instead remembers the (sort key, id) of the last row served and asks for the
+rows strictly after it, so every page costs the same as the first one.
+
+Cursors are opaque, signed tokens: clients pass back the `next_cursor` of the
+previous response and cannot forge positions or inject filter values.
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+from flask import current_app, request
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import and_, or_
+
+from ..services.exceptions import ValidationException
+
+CURSOR_SALT = "keyset-pagination-cursor"
+
+
+class CursorPage:
+    """
+    A single page of keyset-paginated results.
+
+    `total` is only populated when an exact count was explicitly requested.
+    """
+
+    def __init__(self, items, per_page, next_cursor=None, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def to_dict(self):
+        """Pagination metadata for API responses."""
+        return {
+            "per_page": self.per_page,
+            "next_cursor": self.next_cursor,
+            "has_next": self.has_next,
+            "total": self.total,
+        }
+
+
+def get_cursor_arg():
+    """
+    Returns the `cursor` query parameter, or None if cursor mode was not
+    requested. An empty `?cursor=` opts in and requests the first page.
+    """
+    return request.args.get("cursor")
+
+
+def wants_exact_total():
+    """True if the client asked for an exact total alongside a cursor page."""
+    return request.args.get("total", "").lower() in ("1", "true", "exact")
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.config["SECRET_KEY"], salt=CURSOR_SALT)
+
+
+def _dump_value(value):
+    """Encodes a sort key value into a JSON-safe tagged pair."""
+    if isinstance(value, datetime):
+        return ["dt", value.isoformat()]
+    if isinstance(value, date):
+        return ["d", value.isoformat()]
+    if isinstance(value, Decimal):
+        return ["dec", str(value)]
+    if isinstance(value, UUID):
+        return ["uuid", str(value)]
+    if hasattr(value, "value") and not isinstance(value, (int, float, str)):
+        # Enum members are compared by their stored value.
+        return ["raw", value.value]
+    return ["raw", value]
+
+
+def _load_value(tagged):
+    kind, value = tagged
+    if value is None:
+        return None
+    if kind == "dt":
+        return datetime.fromisoformat(value)
+    if kind == "d":
+        return date.fromisoformat(value)
+    if kind == "dec":
+        return Decimal(value)
+    if kind == "uuid":
+        return UUID(value)
+    return value
+
+
+def encode_cursor(sort_value, row_id):
+    """Signs the position of the last row of a page."""
+    return _serializer().dumps([_dump_value(sort_value), _dump_value(row_id)])
+
+
+def decode_cursor(token):
+    """
+    Verifies and decodes a cursor produced by `encode_cursor`.
+
+    Raises:
+        ValidationException: If the cursor was tampered with or is malformed.
+    """
+    try:
+        sort_value, row_id = _serializer().loads(token)
+        return _load_value(sort_value), _load_value(row_id)
+    except (BadSignature, TypeError, ValueError) as e:
+        raise ValidationException("Invalid pagination cursor.") from e
+
+
+def keyset_paginate(
+    query,
+    sort_column,
+    id_column,
+    cursor=None,
+    per_page=20,
+    descending=True,
+    with_total=False,
+):
+    """
+    Returns a `CursorPage` of `query` ordered by (`sort_column`, `id_column`).
+
+    Any ORDER BY already on `query` is replaced, since the cursor is only
+    meaningful for the ordering it was produced with. `id_column` must be
+    unique so that rows sharing a sort key are neither skipped nor repeated,
+    and `sort_column` should be NOT NULL, since NULLs never compare as
+    greater or smaller than the cursor position.
+
+    Args:
+        query: The filtered SQLAlchemy query to paginate.
+        sort_column: Column (or mapped attribute) to sort by.
+        id_column: Unique tie-breaker column, usually the primary key.
+        cursor: The `next_cursor` of the previous page; None or "" for page 1.
+        per_page: Maximum number of items per page.
+        descending: Sort direction for both columns.
+        with_total: Also run a COUNT(*) over the filtered query.
+    """
+    total = query.order_by(None).count() if with_total else None
+
+    if cursor:
+        last_sort, last_id = decode_cursor(cursor)
+        if descending:
+            after = or_(
+                sort_column < last_sort,
+                and_(sort_column == last_sort, id_column < last_id),
+            )
+        else:
+            after = or_(
+                sort_column > last_sort,
+                and_(sort_column == last_sort, id_column > last_id),
+            )
+        query = query.filter(after)
+
+    if descending:
+        query = query.order_by(None).order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(None).order_by(sort_column.asc(), id_column.asc())
+
+    # Fetch one extra row to learn whether another page exists without a COUNT.
+    rows = query.limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(
+            getattr(last, sort_column.key), getattr(last, id_column.key)
+        )
+    return CursorPage(items, per_page, next_cursor=next_cursor, total=total)
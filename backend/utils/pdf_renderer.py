@@ -0,0 +1,261 @@
+"""
+Pooled headless Chromium renderer for HTML-to-PDF conversion.
+
+Launching Chromium costs hundreds of milliseconds and a large memory spike, so
+instead of one `sync_playwright()` + `chromium.launch()` per document, each
+process keeps a small pool of long-lived browsers. Playwright's sync API must
+be used from the thread that started it, so every browser is owned by its own
+worker thread; callers enqueue HTML and wait for the PDF bytes. The pool size
+caps how many documents render concurrently.
+
+Pages are reused between documents and recycled after a number of renders;
+a browser that crashed or disconnected is relaunched and the job retried once.
+
+Usage:
+    from backend.utils.pdf_renderer import render_pdf
+
+    pdf_bytes = render_pdf(html_string, margin={"top": "20mm"})
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from flask import current_app, has_app_context
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_RENDER_TIMEOUT = 60
+DEFAULT_PAGE_MAX_USES = 50
+DEFAULT_BROWSER_MAX_USES = 500
+
+DEFAULT_PDF_OPTIONS = {"format": "A4", "print_background": True}
+
+PDF_QUEUE_WAIT = Histogram(
+    "pdf_render_queue_wait_seconds",
+    "Time a PDF job waited for a free browser",
+)
+PDF_RENDER_TIME = Histogram(
+    "pdf_render_seconds",
+    "Time spent rendering a PDF in the browser",
+)
+PDF_RENDER_FAILURES = Counter(
+    "pdf_render_failures_total",
+    "PDF jobs that failed after retrying",
+)
+PDF_BROWSER_RESTARTS = Counter(
+    "pdf_browser_restarts_total",
+    "Browsers relaunched after a crash or recycling",
+    ["reason"],
+)
+PDF_QUEUE_DEPTH = Gauge(
+    "pdf_render_queue_depth",
+    "PDF jobs waiting for a browser",
+    multiprocess_mode="livesum",
+)
+
+_STOP = object()
+
+
+class PDFRenderError(Exception):
+    """Raised when a document could not be rendered."""
+
+
+class _Job:
+    def __init__(self, html, options):
+        self.html = html
+        self.options = options
+        self.enqueued_at = time.monotonic()
+        self.future = Future()
+
+
+class _BrowserWorker(threading.Thread):
+    """Owns one Playwright instance and browser, and renders jobs from the queue."""
+
+    def __init__(self, pool, index):
+        super().__init__(name=f"pdf-renderer-{index}", daemon=True)
+        self.pool = pool
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._page = None
+        self._page_uses = 0
+        self._browser_uses = 0
+
+    def run(self):
+        from playwright.sync_api import sync_playwright
+
+        try:
+            with sync_playwright() as playwright:
+                self._playwright = playwright
+                self._serve()
+                self._close_browser()
+        except Exception as e:
+            # Without a driver nothing can render; fail jobs instead of hanging.
+            logger.error(f"PDF renderer thread {self.name} stopped: {e}", exc_info=True)
+            self._serve(error=PDFRenderError(f"PDF renderer unavailable: {e}"))
+
+    def _serve(self, error=None):
+        while True:
+            job = self.pool.jobs.get()
+            if job is _STOP:
+                return
+            PDF_QUEUE_DEPTH.dec()
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            PDF_QUEUE_WAIT.observe(time.monotonic() - job.enqueued_at)
+            try:
+                if error is not None:
+                    raise error
+                job.future.set_result(self._render_with_retry(job))
+            except Exception as e:
+                PDF_RENDER_FAILURES.inc()
+                job.future.set_exception(e)
+
+    def _render_with_retry(self, job):
+        try:
+            return self._render(job)
+        except Exception as e:
+            # A crashed or disconnected browser fails every job; relaunch it.
+            logger.warning(f"PDF render failed, relaunching browser: {e}")
+            PDF_BROWSER_RESTARTS.labels(reason="crash").inc()
+            self._close_browser()
+            return self._render(job)
+
+    def _render(self, job):
+        page = self._get_page()
+        started = time.monotonic()
+        page.set_content(job.html)
+        pdf = page.pdf(**job.options)
+        PDF_RENDER_TIME.observe(time.monotonic() - started)
+
+        self._page_uses += 1
+        self._browser_uses += 1
+        if self._browser_uses >= self.pool.browser_max_uses:
+            # Long-lived Chromium processes slowly grow; start afresh now and then.
+            PDF_BROWSER_RESTARTS.labels(reason="recycle").inc()
+            self._close_browser()
+        elif self._page_uses >= self.pool.page_max_uses:
+            self._close_page()
+        return pdf
+
+    def _get_page(self):
+        if self._browser is None or not self._browser.is_connected():
+            self._close_browser()
+            self._browser = self._playwright.chromium.launch()
+            self._context = self._browser.new_context()
+            self._browser_uses = 0
+        if self._page is None or self._page.is_closed():
+            self._page = self._context.new_page()
+            self._page_uses = 0
+        return self._page
+
+    def _close_page(self):
+        if self._page is not None:
+            try:
+                self._page.close()
+            except Exception as e:
+                logger.debug(f"Ignoring error while closing PDF page: {e}")
+        self._page = None
+
+    def _close_browser(self):
+        self._close_page()
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception as e:
+                logger.debug(f"Ignoring error while closing browser: {e}")
+        self._browser = None
+        self._context = None
+
+
+class BrowserPool:
+    """A fixed number of browser worker threads fed from one job queue."""
+
+    def __init__(
+        self,
+        size=DEFAULT_POOL_SIZE,
+        render_timeout=DEFAULT_RENDER_TIMEOUT,
+        page_max_uses=DEFAULT_PAGE_MAX_USES,
+        browser_max_uses=DEFAULT_BROWSER_MAX_USES,
+    ):
+        self.size = size
+        self.render_timeout = render_timeout
+        self.page_max_uses = page_max_uses
+        self.browser_max_uses = browser_max_uses
+        self.jobs = queue.Queue()
+        self._workers = [_BrowserWorker(self, i) for i in range(size)]
+        for worker in self._workers:
+            worker.start()
+
+    def render_pdf(self, html: str, **options) -> bytes:
+        """
+        Renders `html` to PDF bytes. Keyword arguments are passed to
+        Playwright's `page.pdf()` and override the A4/background defaults.
+
+        Raises:
+            PDFRenderError: If rendering failed or timed out.
+        """
+        job = _Job(html, {**DEFAULT_PDF_OPTIONS, **options})
+        PDF_QUEUE_DEPTH.inc()
+        self.jobs.put(job)
+        try:
+            return job.future.result(timeout=self.render_timeout)
+        except FutureTimeoutError as e:
+            job.future.cancel()
+            raise PDFRenderError(
+                f"PDF rendering timed out after {self.render_timeout}s."
+            ) from e
+        except PDFRenderError:
+            raise
+        except Exception as e:
+            raise PDFRenderError(f"PDF rendering failed: {e}") from e
+
+    def close(self):
+        """Stops the workers and closes their browsers."""
+        for _ in self._workers:
+            self.jobs.put(_STOP)
+        for worker in self._workers:
+            worker.join(timeout=10)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """
+    Returns this process's browser pool, starting it on first use. The pool is
+    recreated after a fork, since browsers and threads do not survive it.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            config = current_app.config if has_app_context() else {}
+            _pool = BrowserPool(
+                size=config.get("PDF_BROWSER_POOL_SIZE", DEFAULT_POOL_SIZE),
+                render_timeout=config.get("PDF_RENDER_TIMEOUT", DEFAULT_RENDER_TIMEOUT),
+                page_max_uses=config.get("PDF_PAGE_MAX_USES", DEFAULT_PAGE_MAX_USES),
+                browser_max_uses=config.get(
+                    "PDF_BROWSER_MAX_USES", DEFAULT_BROWSER_MAX_USES
+                ),
+            )
+            _pool_pid = pid
+            atexit.register(_pool.close)
+    return _pool
+
+
+def render_pdf(html: str, **options) -> bytes:
+    """Renders `html` to PDF bytes with this process's browser pool."""
+    return get_browser_pool().render_pdf(html, **options)
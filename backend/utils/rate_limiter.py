@@ -1,33 +1,127 @@
+"""
+Rate limiting shared by every worker process.
+
+Two limiters are in use, and both keep their state in Redis so a limit holds
+across all Gunicorn workers instead of multiplying with their number:
+
+- `limiter` (Flask-Limiter, defined in `backend.extensions`) for the
+  `@limiter.limit("5 per minute")` decorators. It stores its moving windows in
+  Redis (`RATELIMIT_STORAGE_URI`), and keeps limiting in memory while Redis is
+  unreachable.
+- `rate_limiter`, for `@rate_limiter(limit=5, per=300)`. It implements GCRA
+  (the generic cell rate algorithm): a key stores a single "theoretical
+  arrival time", so a check is O(1) and is one atomic Lua script call, i.e. a
+  single Redis round trip. If Redis is unavailable it falls back to the same
+  algorithm in process memory.
+
+GCRA spaces requests `per / limit` seconds apart while allowing bursts of up
+to `limit` requests, which behaves like a sliding window without storing the
+timestamp of every request.
+"""
+
 import logging
+import threading
 import time
-from collections import defaultdict
 from collections.abc import Callable
 from functools import wraps
 from typing import Any
 
 from flask import Response, jsonify, request
+from redis.exceptions import RedisError
+
+from backend.extensions import limiter, redis_client
 
 # Set up logger for this module
 logger = logging.getLogger(__name__)
 
+KEY_PREFIX = "rate_limit:"
+# Seconds between repeated "falling back" warnings during a Redis outage.
+FALLBACK_WARNING_INTERVAL = 60
+
+# KEYS[1]: limiter key
+# ARGV[1]: emission interval (ms between requests at the sustained rate)
+# ARGV[2]: window (ms); the burst allowance is window / interval requests
+# ARGV[3]: optional current time (ms); defaults to the Redis server clock, so
+#          all workers share one clock regardless of host clock skew.
+# Returns {allowed (1/0), retry_after_ms}.
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+if not now then
+    local t = redis.call("TIME")
+    now = tonumber(t[1]) * 1000 + tonumber(t[2]) / 1000
+end
+
+local tat = tonumber(redis.call("GET", KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+
+local new_tat = tat + interval
+local allow_at = new_tat - window
+if allow_at > now then
+    return {0, math.ceil(allow_at - now)}
+end
+
+redis.call("SET", KEYS[1], string.format("%.3f", new_tat),
+           "PX", math.ceil(new_tat - now))
+return {1, 0}
+"""
+
+
+class LocalGCRA:
+    """
+    In-process GCRA, used when Redis cannot be reached. Limits are then per
+    process again, which is preferable to not limiting at all.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self):
+        self._tats: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def hit(self, key: str, interval: float, window: float, now: float):
+        with self._lock:
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                # Keys whose arrival time has passed hold no state worth keeping.
+                self._tats = {k: t for k, t in self._tats.items() if t > now}
+
+            tat = max(self._tats.get(key, now), now)
+            new_tat = tat + interval
+            allow_at = new_tat - window
+            if allow_at > now:
+                return False, allow_at - now
+            self._tats[key] = new_tat
+            return True, 0.0
+
 
 class RateLimiter:
     """
-    An in-memory rate limiter.
-
-    NOTE: This implementation is not suitable for production environments that use
-    multiple worker processes (like Gunicorn or uWSGI), as each worker would have
-    its own separate rate-limiting state. For production, a shared store like Redis
-    (as in the previous version) is recommended.
+    A GCRA rate limiter stored in Redis, with an in-process fallback.
+
+    Args:
+        redis: Redis client; defaults to the app's `redis_client`.
+        key_prefix: Prefix of the Redis keys.
+        clock: Optional callable returning the current time in seconds. By
+            default the Redis server clock is used (and `time.monotonic` for
+            the in-process fallback); a fixed clock makes tests deterministic.
     """
 
-    def __init__(self):
-        self.requests: dict[str, list[float]] = defaultdict(list)
-        self.blocked_ips: set[str] = set()
+    def __init__(self, redis=None, key_prefix: str = KEY_PREFIX, clock=None):
+        self._redis = redis if redis is not None else redis_client
+        self.key_prefix = key_prefix
+        self._clock = clock
+        self._script = None
+        self._local = LocalGCRA()
+        self._warned_at = None
 
-    def is_rate_limited(self, identifier: str, max_requests: int, window: int) -> bool:
+    def hit(self, identifier: str, max_requests: int, window: int):
         """
-        Check if an identifier is rate limited.
+        Records a request and checks it against the limit.
 
         Args:
             identifier: The identifier to check (usually an IP address).
@@ -35,24 +129,53 @@ class RateLimiter:
             window: Time window in seconds.
 
         Returns:
-            True if the identifier is rate limited, False otherwise.
+            (allowed, retry_after) where `retry_after` is the number of seconds
+            until the next request would be allowed (0 when allowed).
         """
-        now = time.time()
+        key = f"{self.key_prefix}{max_requests}/{window}:{identifier}"
+        window_ms = window * 1000
+        interval_ms = window_ms / max_requests
+        now = self._clock() if self._clock else None
+
+        try:
+            if self._script is None:
+                self._script = self._redis.register_script(GCRA_SCRIPT)
+            args = [interval_ms, window_ms]
+            if now is not None:
+                args.append(now * 1000)
+            allowed, retry_after_ms = self._script(keys=[key], args=args)
+            return bool(allowed), retry_after_ms / 1000
+        except (RedisError, OSError, AttributeError) as e:
+            # AttributeError: the Flask-Redis client is not initialised yet.
+            self._script = None
+            monotonic = time.monotonic()
+            if (
+                self._warned_at is None
+                or monotonic - self._warned_at > FALLBACK_WARNING_INTERVAL
+            ):
+                self._warned_at = monotonic
+                logger.warning(f"Rate limiter falling back to process memory: {e}")
+            if now is None:
+                now = time.monotonic()
+            allowed, retry_after_ms = self._local.hit(
+                key, interval_ms, window_ms, now * 1000
+            )
+            return allowed, retry_after_ms / 1000
 
-        # Clean old requests that are outside the current window
-        self.requests[identifier] = [
-            req_time
-            for req_time in self.requests[identifier]
-            if now - req_time < window
-        ]
+    def is_rate_limited(self, identifier: str, max_requests: int, window: int) -> bool:
+        """
+        Check if an identifier is rate limited, counting this request.
 
-        # Check if the request count exceeds the maximum allowed
-        if len(self.requests[identifier]) >= max_requests:
-            return True
+        Args:
+            identifier: The identifier to check (usually an IP address).
+            max_requests: Maximum number of requests allowed in the time window.
+            window: Time window in seconds.
 
-        # Record the current request timestamp
-        self.requests[identifier].append(now)
-        return False
+        Returns:
+            True if the identifier is rate limited, False otherwise.
+        """
+        allowed, _ = self.hit(identifier, max_requests, window)
+        return not allowed
 
     def __call__(self, limit: int, per: int) -> Callable:
         """
@@ -73,13 +196,18 @@ class RateLimiter:
                 # In a production environment behind a proxy, use 'X-Forwarded-For'.
                 identifier = request.headers.get("X-Forwarded-For", request.remote_addr)
 
-                if self.is_rate_limited(identifier, max_requests=limit, window=per):
+                allowed, retry_after = self.hit(
+                    f"{request.endpoint}:{identifier}", max_requests=limit, window=per
+                )
+                if not allowed:
                     logger.warning(
                         f"Rate limit exceeded for IP: {identifier} on endpoint: {request.path}"
                     )
-                    return jsonify(
+                    response = jsonify(
                         {"error": "Rate limit exceeded. Please try again later."}
-                    ), 429
+                    )
+                    response.headers["Retry-After"] = str(max(1, round(retry_after)))
+                    return response, 429
 
                 return f(*args, **kwargs)
 
@@ -90,3 +218,5 @@ class RateLimiter:
 
 # Create a single, importable instance of the RateLimiter
 rate_limiter = RateLimiter()
+
+__all__ = ["GCRA_SCRIPT", "LocalGCRA", "RateLimiter", "limiter", "rate_limiter"]
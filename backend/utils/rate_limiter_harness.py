@@ -0,0 +1,117 @@
+"""
+Local harness for `utils.rate_limiter`, runnable without a Redis server.
+
+Several `RateLimiter` instances stand in for Gunicorn workers and share one
+in-memory fake Redis server (`fakeredis`, which runs the real Lua script
+through `lupa`), driven by a fake clock. The harness checks that the limit is
+enforced across workers, refills at the configured rate, and that the
+in-process fallback takes the same decisions as the Redis script.
+
+Requires the development dependency `fakeredis[lua]`. Run it with:
+
+    flask check-rate-limiter
+"""
+
+import random
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from .rate_limiter import RateLimiter
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class UnavailableRedis:
+    """A Redis client whose every command fails, as during an outage."""
+
+    def register_script(self, script):
+        def run(keys=None, args=None):
+            raise RedisConnectionError("Redis is unavailable.")
+
+        return run
+
+
+def run_rate_limiter_harness(workers: int = 4, seed: int = 0) -> list[str]:
+    """
+    Runs every scenario and returns the failures (empty when all passed).
+    """
+    import fakeredis
+
+    failures = []
+
+    def check(condition, message):
+        if not condition:
+            failures.append(message)
+
+    def make_workers(clock):
+        server = fakeredis.FakeServer()
+        return [
+            RateLimiter(redis=fakeredis.FakeStrictRedis(server=server), clock=clock)
+            for _ in range(workers)
+        ]
+
+    # 1. A burst of `limit` requests is allowed across all workers, no more.
+    clock = FakeClock()
+    limiters = make_workers(clock)
+    results = [
+        limiters[i % workers].hit("1.2.3.4", max_requests=10, window=60)
+        for i in range(12)
+    ]
+    check(
+        [allowed for allowed, _ in results] == [True] * 10 + [False] * 2,
+        f"burst across workers: {results}",
+    )
+    retry_after = results[-1][1]
+    check(
+        5.9 <= retry_after <= 6.0,
+        f"retry_after should be one interval (6s), got {retry_after}",
+    )
+
+    # 2. Capacity refills at limit / window: one request per interval.
+    clock.advance(6)
+    check(limiters[0].hit("1.2.3.4", 10, 60)[0], "refill after one interval")
+    check(not limiters[1].hit("1.2.3.4", 10, 60)[0], "only one request refilled")
+
+    # 3. After a full idle window the whole burst is available again.
+    clock.advance(60)
+    check(
+        all(limiters[i % workers].hit("1.2.3.4", 10, 60)[0] for i in range(10)),
+        "full burst after an idle window",
+    )
+
+    # 4. Identifiers and limits do not share state.
+    check(limiters[0].hit("5.6.7.8", 10, 60)[0], "other identifier unaffected")
+    check(limiters[0].hit("1.2.3.4", 3, 1)[0], "other limit unaffected")
+
+    # 5. Without Redis the in-process fallback still limits.
+    fallback = RateLimiter(redis=UnavailableRedis(), clock=FakeClock())
+    results = [fallback.hit("1.2.3.4", 5, 10)[0] for _ in range(6)]
+    check(results == [True] * 5 + [False], f"in-process fallback: {results}")
+
+    # 6. The Lua script and the fallback agree on a random request pattern.
+    rng = random.Random(seed)  # noqa: S311 - reproducible test traffic
+    redis_clock, local_clock = FakeClock(), FakeClock()
+    redis_limiter = make_workers(redis_clock)[0]
+    local_limiter = RateLimiter(redis=UnavailableRedis(), clock=local_clock)
+    for step in range(500):
+        gap = rng.choice([0, 0, 0.1, 0.5, 1, 3])
+        redis_clock.advance(gap)
+        local_clock.advance(gap)
+        expected = local_limiter.hit("ip", 7, 5)[0]
+        actual = redis_limiter.hit("ip", 7, 5)[0]
+        if expected != actual:
+            failures.append(f"script and fallback disagree at request {step}")
+            break
+
+    return failures
@@ -0,0 +1,206 @@
+"""
+In-process trigram and prefix index for catalog search.
+
+The index is a plain data structure with no database or Flask dependency, so it
+can be built, snapshotted and queried from web workers, Celery tasks and CLI
+commands alike. See `backend.services.product_search_service` for how it is fed
+and kept in sync with the products table.
+"""
+
+import gzip
+import json
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+# Relative weight of a match in each indexed field.
+FIELD_WEIGHTS = {"name": 3.0, "sku": 3.0, "tags": 2.0, "description": 1.0}
+
+# Bonus added when a query word is a prefix of an indexed word (autocomplete).
+PREFIX_BONUS = 1.0
+
+# Candidates must share at least this fraction of the query's trigrams.
+MIN_TRIGRAM_SIMILARITY = 0.3
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_text(text) -> str:
+    """Lower-cases `text` and strips accents so 'Truvrā' matches 'truvra'."""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text) -> list[str]:
+    """Splits `text` into normalized alphanumeric words."""
+    return _WORD_RE.findall(normalize_text(text))
+
+
+def trigrams(word: str) -> set[str]:
+    """
+    Returns the padded trigrams of a word, following pg_trgm conventions:
+    'oil' -> {'  o', ' oi', 'oil', 'il '}.
+    """
+    padded = f"  {word} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """
+    Inverted index over trigrams and whole words, with weighted ranking.
+
+    Documents are dictionaries of field name to text. Scores combine the
+    weighted fraction of query trigrams a document contains with a bonus for
+    words that start with a query word, so both typo-tolerant search and
+    keystroke-by-keystroke autocomplete are served by the same structure.
+    """
+
+    def __init__(self):
+        self.documents = {}
+        # trigram -> {doc_id: best field weight containing it}
+        self._trigrams = defaultdict(dict)
+        # word -> {doc_id: best field weight containing it}
+        self._words = defaultdict(dict)
+        self._sorted_words = None
+
+    def __len__(self):
+        return len(self.documents)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.documents
+
+    def add(self, doc_id: int, fields: dict):
+        """Indexes (or re-indexes) a document."""
+        if doc_id in self.documents:
+            self.remove(doc_id)
+        self.documents[doc_id] = fields
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS.get(field, 1.0)
+            for word in tokenize(text):
+                self._add_posting(self._words[word], doc_id, weight)
+                for gram in trigrams(word):
+                    self._add_posting(self._trigrams[gram], doc_id, weight)
+        self._sorted_words = None
+
+    def remove(self, doc_id: int):
+        """Removes a document from the index, if present."""
+        fields = self.documents.pop(doc_id, None)
+        if fields is None:
+            return
+        for text in fields.values():
+            for word in tokenize(text):
+                self._discard_posting(self._words, word, doc_id)
+                for gram in trigrams(word):
+                    self._discard_posting(self._trigrams, gram, doc_id)
+        self._sorted_words = None
+
+    def search(self, query: str, limit: int = 10) -> list[int]:
+        """Returns up to `limit` document IDs, best match first."""
+        return [doc_id for doc_id, _ in self.search_with_scores(query, limit)]
+
+    def search_with_scores(self, query: str, limit: int = 10):
+        """Returns up to `limit` (doc_id, score) pairs, best match first."""
+        words = tokenize(query)
+        if not words:
+            return []
+
+        query_grams = set().union(*(trigrams(word) for word in words))
+        max_weight = max(FIELD_WEIGHTS.values())
+        scores = defaultdict(float)
+        hits = defaultdict(int)
+        for gram in query_grams:
+            for doc_id, weight in self._trigrams.get(gram, {}).items():
+                scores[doc_id] += weight / max_weight
+                hits[doc_id] += 1
+
+        threshold = MIN_TRIGRAM_SIMILARITY * len(query_grams)
+        ranked = {
+            doc_id: score / len(query_grams)
+            for doc_id, score in scores.items()
+            if hits[doc_id] >= threshold
+        }
+
+        for word in words:
+            for doc_id, weight in self._prefix_matches(word).items():
+                ranked[doc_id] = (
+                    ranked.get(doc_id, 0.0) + PREFIX_BONUS * weight / max_weight
+                )
+
+        # Ties are broken by ID so results are stable across workers.
+        return sorted(ranked.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    # --- Snapshots ---
+
+    def dumps(self) -> bytes:
+        """Returns a gzipped JSON snapshot of the index."""
+        payload = {
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "documents": {
+                str(doc_id): fields for doc_id, fields in self.documents.items()
+            },
+            "trigrams": {
+                gram: list(postings.items())
+                for gram, postings in self._trigrams.items()
+            },
+            "words": {
+                word: list(postings.items()) for word, postings in self._words.items()
+            },
+        }
+        return gzip.compress(json.dumps(payload, separators=(",", ":")).encode())
+
+    @classmethod
+    def loads(cls, data: bytes):
+        """
+        Loads a snapshot written by `dumps`. Returns None if it was written by
+        an incompatible version. The word list is sorted up front, so the
+        loaded index can be searched from several threads.
+        """
+        payload = json.loads(gzip.decompress(data))
+        if payload.get("version") != SNAPSHOT_FORMAT_VERSION:
+            return None
+
+        index = cls()
+        index.documents = {
+            int(doc_id): fields for doc_id, fields in payload["documents"].items()
+        }
+        for gram, postings in payload["trigrams"].items():
+            index._trigrams[gram] = dict(postings)
+        for word, postings in payload["words"].items():
+            index._words[word] = dict(postings)
+        index._sorted_words = sorted(index._words)
+        return index
+
+    # --- Internal helpers ---
+
+    @staticmethod
+    def _add_posting(postings: dict, doc_id: int, weight: float):
+        if weight > postings.get(doc_id, 0.0):
+            postings[doc_id] = weight
+
+    @staticmethod
+    def _discard_posting(index: dict, key: str, doc_id: int):
+        postings = index.get(key)
+        if postings is None:
+            return
+        postings.pop(doc_id, None)
+        if not postings:
+            del index[key]
+
+    def _prefix_matches(self, prefix: str) -> dict:
+        """Returns {doc_id: best weight} for documents with a word starting with `prefix`."""
+        if self._sorted_words is None:
+            self._sorted_words = sorted(self._words)
+        matches = {}
+        position = bisect_left(self._sorted_words, prefix)
+        while position < len(self._sorted_words) and self._sorted_words[
+            position
+        ].startswith(prefix):
+            for doc_id, weight in self._words[self._sorted_words[position]].items():
+                self._add_posting(matches, doc_id, weight)
+            position += 1
+        return matches
@@ -0,0 +1,272 @@
+"""
+SQL profiler for requests and Celery tasks.
+
+Every statement executed during a request or a task is recorded against it:
+the statement count, the total time, how often each statement *shape* ran and
+which statements were slow. A shape (fingerprint) is the SQL with parameters
+and literals replaced by `?` and IN lists collapsed, so the 40 lazy loads of
+`Order.items` in a loop share one fingerprint: a fingerprint repeated many
+times in one unit of work is an N+1 query.
+
+Units with findings (N+1 candidates or slow statements) are pushed to a capped
+Redis list shared by all workers, which admins read through
+`/api/admin/monitoring/sql-profiles`; slow statements are also logged. Only
+the *shape* of parameters (types, list sizes) is ever recorded, never values.
+
+Settings (see `config.py`):
+    SQL_PROFILER_ENABLED
+    SQL_PROFILER_SLOW_MS                statements slower than this are reported
+    SQL_PROFILER_N_PLUS_ONE_THRESHOLD   repeats of one fingerprint to report
+    SQL_PROFILER_BUFFER_SIZE            profiles kept in the ring buffer
+    SQL_PROFILER_FAIL_THRESHOLD         if set, raise NPlusOneQueryError once a
+                                        fingerprint repeats this often (tests)
+"""
+
+import contextvars
+import json
+import logging
+import re
+import time
+from collections import Counter
+from datetime import datetime
+
+from celery import signals
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from backend.extensions import redis_client
+
+logger = logging.getLogger("database")
+
+BUFFER_KEY = "sql_profiler:profiles"
+MAX_SLOW_STATEMENTS = 20
+MAX_FINDINGS = 20
+
+DEFAULT_SETTINGS = {
+    "SQL_PROFILER_ENABLED": True,
+    "SQL_PROFILER_SLOW_MS": 100,
+    "SQL_PROFILER_N_PLUS_ONE_THRESHOLD": 10,
+    "SQL_PROFILER_BUFFER_SIZE": 200,
+    "SQL_PROFILER_FAIL_THRESHOLD": None,
+}
+# Read once from the app config: Celery signals fire outside the app context.
+_settings = dict(DEFAULT_SETTINGS)
+
+_current_profile = contextvars.ContextVar("sql_profile", default=None)
+
+_PLACEHOLDER_RE = re.compile(
+    r"%\(\w+\)s|%s|\?|:\w+|\$\d+|\b\d+(?:\.\d+)?\b|'(?:''|[^'])*'"
+)
+_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class NPlusOneQueryError(Exception):
+    """Raised when SQL_PROFILER_FAIL_THRESHOLD is set and exceeded."""
+
+
+def fingerprint(statement):
+    """Normalizes a statement so executions differing only by values match."""
+    normalized = _WHITESPACE_RE.sub(" ", statement).strip()
+    normalized = _PLACEHOLDER_RE.sub("?", normalized)
+    return _LIST_RE.sub("(?...)", normalized)
+
+
+def parameters_shape(parameters, executemany=False):
+    """Describes parameters by type (and sequence length), without values."""
+    if executemany:
+        rows = list(parameters or [])
+        first = parameters_shape(rows[0]) if rows else None
+        return f"{len(rows)} x {first}"
+    if isinstance(parameters, dict):
+        return {key: _value_shape(value) for key, value in parameters.items()}
+    if isinstance(parameters, list | tuple):
+        return [_value_shape(value) for value in parameters]
+    return _value_shape(parameters)
+
+
+def _value_shape(value):
+    if isinstance(value, list | tuple | set):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+class QueryProfile:
+    """The statements of one request or task."""
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.started_at = datetime.utcnow()
+        self.statements = 0
+        self.duration = 0.0
+        self.counts = Counter()
+        self.durations = Counter()
+        self.slow = []
+
+    def record(self, statement, parameters, executemany, duration):
+        key = fingerprint(statement)
+        self.statements += 1
+        self.duration += duration
+        self.counts[key] += 1
+        self.durations[key] += duration
+
+        if duration * 1000 >= _settings["SQL_PROFILER_SLOW_MS"]:
+            shape = parameters_shape(parameters, executemany)
+            logger.warning(
+                f"Slow SQL ({duration * 1000:.1f} ms) in {self.kind} {self.name}: "
+                f"{key} params={shape}"
+            )
+            if len(self.slow) < MAX_SLOW_STATEMENTS:
+                self.slow.append(
+                    {
+                        "statement": key,
+                        "duration_ms": round(duration * 1000, 2),
+                        "params": shape,
+                    }
+                )
+
+        fail_threshold = _settings["SQL_PROFILER_FAIL_THRESHOLD"]
+        if fail_threshold and self.counts[key] == fail_threshold:
+            raise NPlusOneQueryError(
+                f"Statement ran {fail_threshold} times in {self.kind} {self.name}: {key}"
+            )
+
+    def n_plus_one(self):
+        threshold = _settings["SQL_PROFILER_N_PLUS_ONE_THRESHOLD"]
+        return [
+            {
+                "fingerprint": key,
+                "count": count,
+                "duration_ms": round(self.durations[key] * 1000, 2),
+            }
+            for key, count in self.counts.most_common(MAX_FINDINGS)
+            if count >= threshold
+        ]
+
+    def to_dict(self, n_plus_one=None):
+        return {
+            "kind": self.kind,
+            "name": self.name,
+            "started_at": self.started_at.isoformat(),
+            "statements": self.statements,
+            "duration_ms": round(self.duration * 1000, 2),
+            "distinct_statements": len(self.counts),
+            "n_plus_one": self.n_plus_one() if n_plus_one is None else n_plus_one,
+            "slow": self.slow,
+        }
+
+
+# --- Units of work ---
+
+
+def start_profile(kind, name):
+    """Starts profiling the current request or task; returns a reset token."""
+    if not _settings["SQL_PROFILER_ENABLED"]:
+        return None
+    return _current_profile.set(QueryProfile(kind, name))
+
+
+def finish_profile(token):
+    """Stops the current profile and stores it if it found anything."""
+    profile = _current_profile.get()
+    if token is not None:
+        _current_profile.reset(token)
+    if profile is None or not profile.statements:
+        return None
+
+    n_plus_one = profile.n_plus_one()
+    if n_plus_one or profile.slow:
+        for finding in n_plus_one:
+            logger.warning(
+                f"Possible N+1 in {profile.kind} {profile.name}: "
+                f"{finding['count']} x {finding['fingerprint']}"
+            )
+        _store(profile.to_dict(n_plus_one))
+    return profile
+
+
+def get_recent_profiles(limit=50):
+    """Returns the most recent profiles with findings, newest first."""
+    try:
+        rows = redis_client.lrange(BUFFER_KEY, 0, max(0, limit - 1))
+    except Exception as e:
+        logger.warning(f"Could not read SQL profiles: {e}")
+        return []
+    return [json.loads(row) for row in rows]
+
+
+def clear_profiles():
+    redis_client.delete(BUFFER_KEY)
+
+
+def _store(report):
+    try:
+        pipe = redis_client.pipeline()
+        pipe.lpush(BUFFER_KEY, json.dumps(report, default=str))
+        pipe.ltrim(BUFFER_KEY, 0, _settings["SQL_PROFILER_BUFFER_SIZE"] - 1)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"Could not store SQL profile: {e}")
+
+
+def init_app(app):
+    """Reads the settings and profiles every request of `app`."""
+    for name, default in DEFAULT_SETTINGS.items():
+        _settings[name] = app.config.get(name, default)
+    if not _settings["SQL_PROFILER_ENABLED"]:
+        return
+
+    def start_request_profile():
+        rule = request.url_rule
+        name = f"{request.method} {rule.rule if rule is not None else request.path}"
+        g._sql_profile_token = start_profile("request", name)
+
+    def finish_request_profile(exc):
+        finish_profile(g.pop("_sql_profile_token", None))
+
+    # First in, so session and permission checks are profiled too; finished on
+    # teardown, which also runs when the view raised.
+    app.before_request_funcs.setdefault(None, []).insert(0, start_request_profile)
+    app.teardown_request(finish_request_profile)
+
+
+# --- SQLAlchemy and Celery hooks ---
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("_profiler_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    starts = conn.info.get("_profiler_query_start")
+    if profile is None or not starts:
+        return
+    profile.record(
+        statement, parameters, executemany, time.perf_counter() - starts.pop()
+    )
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("_profiler_query_start"):
+        connection.info["_profiler_query_start"].pop()
+
+
+_task_tokens = {}
+
+
+@signals.task_prerun.connect
+def _profile_task(task_id=None, task=None, **kwargs):
+    _task_tokens[task_id] = start_profile("task", task.name)
+
+
+@signals.task_postrun.connect
+def _finish_task_profile(task_id=None, **kwargs):
+    finish_profile(_task_tokens.pop(task_id, None))
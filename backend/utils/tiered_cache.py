@@ -0,0 +1,338 @@
+"""
+Two-level cache: a bounded per-process LRU in front of the shared Redis cache.
+
+Hot keys (site settings, cache tag generations, catalog visibility, delivery
+methods, blog lists) are read many times per request. Serving them from
+process memory removes the Redis round trip; a short local timeout bounds
+staleness, and invalidations are fanned out to every worker over Redis
+pub/sub so writes are visible almost immediately.
+
+`get_or_set` additionally protects the database from stampedes when a hot key
+expires: only one caller per process, and one process cluster-wide, recomputes
+the value (single-flight), and values are refreshed probabilistically shortly
+*before* they expire (XFetch) so most expiries never produce a miss at all.
+
+Values are kept locally in their pickled form, so every hit hands out a fresh
+copy and callers can never mutate state shared with other requests.
+"""
+
+import json
+import logging
+import math
+import os
+import pickle  # noqa: S403
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from .metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_LOCAL_TIMEOUT = 5
+DEFAULT_CHANNEL = "tiered_cache:invalidate"
+
+# How long a recomputation may hold the cluster-wide single-flight lock, and
+# how long other callers wait for it when there is no stale value to serve.
+LOCK_TIMEOUT_MS = 10000
+LOCK_WAIT_SECONDS = 2.0
+LOCK_POLL_SECONDS = 0.05
+
+# Delay before resubscribing after the invalidation listener lost Redis,
+# doubling up to the maximum.
+LISTENER_RETRY_SECONDS = 1.0
+LISTENER_MAX_RETRY_SECONDS = 30.0
+
+
+class _LocalLRU:
+    """Thread-safe LRU of key -> (expires_at, pickled value)."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, blob = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return blob
+
+    def set(self, key, blob, timeout):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, blob)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class TieredCache:
+    """
+    Per-process LRU over a Flask-Caching backend, with pub/sub invalidation.
+
+    Plain `get`/`get_many`/`set` store values in Redis unchanged, so they
+    interoperate with keys written through `extensions.cache` directly (e.g.
+    counters bumped with `cache.inc`). `get_or_set` stores an envelope with
+    the recomputation cost and expiry needed for early refresh.
+    """
+
+    def __init__(self, cache=None, redis_client=None):
+        self.cache = cache
+        self.redis_client = redis_client
+        self.local_timeout = DEFAULT_LOCAL_TIMEOUT
+        self.channel = DEFAULT_CHANNEL
+        self._local = _LocalLRU(DEFAULT_MAX_ENTRIES)
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self._listener_pid = None
+
+    def init_app(self, app):
+        self.local_timeout = app.config.get(
+            "TIERED_CACHE_LOCAL_TIMEOUT", DEFAULT_LOCAL_TIMEOUT
+        )
+        self.channel = app.config.get("TIERED_CACHE_CHANNEL", DEFAULT_CHANNEL)
+        self._local = _LocalLRU(
+            app.config.get("TIERED_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+        )
+
+    # --- Plain reads and writes ---
+
+    def get(self, key):
+        """Returns the value for `key` from process memory or Redis, or None."""
+        return self.get_many(key)[0]
+
+    def get_many(self, *keys):
+        """Like `get` for several keys, with a single Redis round trip for misses."""
+        self._ensure_listener()
+        values = [None] * len(keys)
+        missing = []
+        for i, key in enumerate(keys):
+            blob = self._local.get(key)
+            record_cache_lookup(key, "local", blob is not None)
+            if blob is None:
+                missing.append(i)
+            else:
+                values[i] = pickle.loads(blob)  # noqa: S301
+
+        if missing:
+            remote = self.cache.get_many(*[keys[i] for i in missing])
+            for i, value in zip(missing, remote, strict=True):
+                values[i] = value
+                if value is not None:
+                    self._local.set(keys[i], pickle.dumps(value), self.local_timeout)
+        return values
+
+    def set(self, key, value, timeout=None):
+        """Writes `key` to Redis and drops stale copies in every worker."""
+        self.cache.set(key, value, timeout=timeout)
+        self.invalidate(key)
+
+    def delete(self, *keys):
+        """Deletes `keys` from Redis and from every worker's memory."""
+        self.cache.delete_many(*keys)
+        self.invalidate(*keys)
+
+    def invalidate(self, *keys):
+        """
+        Drops `keys` from the local tier of every worker, e.g. after the Redis
+        value was changed with `cache.inc`.
+        """
+        self._local.delete(*keys)
+        if self.redis_client is None:
+            return
+        try:
+            self.redis_client.publish(self.channel, json.dumps(list(keys)))
+        except Exception as e:
+            # Other workers converge once their local timeout elapses.
+            logger.warning(f"Tiered cache invalidation publish failed: {e}")
+
+    # --- Read-through with stampede protection ---
+
+    def get_or_set(self, key, loader, timeout, beta=1.0):
+        """
+        Returns the value for `key`, computing it with `loader()` on a miss.
+
+        Args:
+            key: Cache key.
+            loader: Zero-argument callable producing the value.
+            timeout: Redis timeout in seconds.
+            beta: XFetch aggressiveness; higher refreshes earlier, 0 disables it.
+        """
+        envelope = self.get(key)
+        if envelope is not None and not self._should_refresh(envelope, beta):
+            return envelope["value"]
+
+        # Single-flight within the process: concurrent callers share one load.
+        flight_lock = self._join_flight(key)
+        try:
+            if not flight_lock.acquire(blocking=envelope is None):
+                return envelope["value"]
+            try:
+                # Another thread may have refreshed the key while we waited.
+                fresh = self.cache.get(key)
+                if fresh is not None and not self._should_refresh(fresh, 0):
+                    self._local.set(key, pickle.dumps(fresh), self.local_timeout)
+                    return fresh["value"]
+                return self._load_cluster_wide(key, loader, timeout, stale=envelope)
+            finally:
+                flight_lock.release()
+        finally:
+            self._leave_flight(key)
+
+    # --- Internal helpers ---
+
+    @staticmethod
+    def _should_refresh(envelope, beta):
+        """XFetch: refresh early with a probability growing towards expiry."""
+        expires_at = envelope.get("expires_at")
+        if expires_at is None:
+            return False
+        jitter = (
+            envelope["delta"] * beta * -math.log(random.random() or 1e-12)  # noqa: S311
+            if beta
+            else 0
+        )
+        return time.time() + jitter >= expires_at
+
+    def _join_flight(self, key):
+        """
+        Returns the single-flight lock of `key`. Locks are counted per caller
+        and dropped by `_leave_flight` once no one holds or awaits them.
+        """
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = [threading.Lock(), 0]
+            flight[1] += 1
+            return flight[0]
+
+    def _leave_flight(self, key):
+        with self._flights_lock:
+            flight = self._flights[key]
+            flight[1] -= 1
+            if not flight[1]:
+                del self._flights[key]
+
+    def _load_cluster_wide(self, key, loader, timeout, stale=None):
+        """Recomputes `key`, letting only one process at a time hit the database."""
+        lock_key = f"tiered_cache:lock:{key}"
+        token = uuid.uuid4().hex
+        acquired = self._acquire(lock_key, token)
+        if not acquired:
+            if stale is not None:
+                return stale["value"]
+            deadline = time.monotonic() + LOCK_WAIT_SECONDS
+            while time.monotonic() < deadline:
+                time.sleep(LOCK_POLL_SECONDS)
+                envelope = self.cache.get(key)
+                if envelope is not None:
+                    self._local.set(key, pickle.dumps(envelope), self.local_timeout)
+                    return envelope["value"]
+            # The holder is slow or gone; compute rather than fail the request.
+
+        try:
+            started = time.time()
+            value = loader()
+            delta = time.time() - started
+            envelope = {
+                "value": value,
+                "delta": delta,
+                "expires_at": time.time() + timeout if timeout else None,
+            }
+            self.cache.set(key, envelope, timeout=timeout)
+            self.invalidate(key)
+            self._local.set(key, pickle.dumps(envelope), self.local_timeout)
+            return value
+        finally:
+            if acquired:
+                self._release(lock_key, token)
+
+    def _acquire(self, lock_key, token):
+        if self.redis_client is None:
+            return True
+        try:
+            return bool(
+                self.redis_client.set(lock_key, token, nx=True, px=LOCK_TIMEOUT_MS)
+            )
+        except Exception as e:
+            logger.warning(f"Tiered cache lock unavailable, loading directly: {e}")
+            return True
+
+    def _release(self, lock_key, token):
+        if self.redis_client is None:
+            return
+        try:
+            # Only delete the lock if we still own it.
+            if self.redis_client.get(lock_key) == token.encode():
+                self.redis_client.delete(lock_key)
+        except Exception as e:
+            logger.warning(f"Tiered cache lock release failed: {e}")
+
+    def _ensure_listener(self):
+        """Subscribes this process to invalidations (once per PID, fork-safe)."""
+        pid = os.getpid()
+        if self._listener_pid == pid or self.redis_client is None:
+            return
+        with self._flights_lock:
+            if self._listener_pid == pid:
+                return
+            self._listener_pid = pid
+            # Anything inherited from the parent process may already be stale.
+            self._local.clear()
+            threading.Thread(
+                target=self._listen, name="tiered-cache-invalidations", daemon=True
+            ).start()
+
+    def _listen(self):
+        """
+        Applies invalidations until the process exits, resubscribing whenever
+        the connection to Redis is lost.
+        """
+        delay = LISTENER_RETRY_SECONDS
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{self.channel: self._on_invalidate})
+                # Invalidations published while unsubscribed were missed.
+                self._local.clear()
+                delay = LISTENER_RETRY_SECONDS
+                while True:
+                    pubsub.get_message(timeout=1.0)
+            except Exception as e:
+                logger.warning(
+                    f"Tiered cache invalidation listener disconnected, "
+                    f"retrying in {delay:g}s: {e}"
+                )
+                time.sleep(delay)
+                delay = min(delay * 2, LISTENER_MAX_RETRY_SECONDS)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception as e:
+                        logger.debug(f"Closing the invalidation listener failed: {e}")
+
+    def _on_invalidate(self, message):
+        try:
+            self._local.delete(*json.loads(message["data"]))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Ignoring malformed tiered cache invalidation: {e}")
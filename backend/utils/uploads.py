@@ -0,0 +1,31 @@
+"""
+Request class that spools uploaded files to disk.
+
+Werkzeug keeps each multipart file part in memory until it passes a fixed
+500 KB threshold and then spills it to the system temp directory, which is
+often a RAM-backed tmpfs. This request class makes both configurable so an
+upload's body costs the worker a bounded buffer rather than its full size:
+
+    UPLOAD_SPOOL_THRESHOLD  bytes kept in memory per file before spilling
+    UPLOAD_SPOOL_DIR        disk-backed directory for spilled files
+"""
+
+from tempfile import SpooledTemporaryFile
+
+from flask import Request, current_app
+
+DEFAULT_SPOOL_THRESHOLD = 512 * 1024
+
+
+class SpoolingRequest(Request):
+    """Flask request whose uploaded files spill to a disk-backed directory."""
+
+    def _get_file_stream(
+        self, total_content_length, content_type, filename=None, content_length=None
+    ):
+        config = current_app.config
+        return SpooledTemporaryFile(
+            max_size=config.get("UPLOAD_SPOOL_THRESHOLD", DEFAULT_SPOOL_THRESHOLD),
+            mode="rb+",
+            dir=config.get("UPLOAD_SPOOL_DIR"),
+        )